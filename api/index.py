@@ -1,3 +1,8 @@
+import os
+
+# Serverless cold starts: defer langchain/openai imports and chain construction to first use
+os.environ.setdefault("LAZY_INIT", "1")
+
 from app import app  
 from mangum import Mangum
 
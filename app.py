@@ -1,26 +1,68 @@
 import os
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter, OrderedDict
+from contextlib import aclosing
+import asyncio
 import json
 import re
-import openai
+import time
+import weakref
+
+from catalogue import current_catalogue, live_catalogue
+from context_budget import count_tokens, encoding, truncate_to_tokens
+from extraction_cache import cache_from_env
+from fast_extraction import extractor_from_env
+from hobby_ranking import format_candidates
+from llm_gateway import (DeadlineExceeded, LLMUnavailable, deadline_scope, gateway_from_env, prompt_tokens,
+                         session_lock, within_deadline)
+from llm_provider import create_llm, route_stats
+from local_replies import local_extraction, local_question, local_suggestion, next_topic
+from metrics import MetricsMiddleware, record_degraded, record_error, record_transition, registry, span
+from model_routes import (INTENT_SCHEMA, ITEMS_SCHEMA, LIFESTYLE_SCHEMA, STRING_SCHEMA, drop_nulls, json_schema,
+                          router_from_env)
+from session_stats import stats_from_env
+from session_store import store_from_env
+from speculation import speculator_from_env
+from static_assets import ApiCompressionMiddleware, PrecompressedStaticFiles
+from ws_chat import serve_chat
 
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# With LAZY_INIT=1 (set by the serverless entry point) langchain/openai are imported and the
+# LLM and chains are built on first use or by warm_up(), not at import time
+LAZY_INIT = os.getenv("LAZY_INIT", "0") == "1"
 
+# Initialize LLM (see get_llm; LLM_PROVIDER=fake swaps in the offline stand-in)
+llm = None
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
+def get_llm():
+    global llm
+    if llm is None:
+        llm = create_llm(model="gpt-4o", temperature=0.7)
+    return llm
+
+# Model, temperature, max tokens and timeout per chain, from model_routes.json (see model_routes.py)
+model_router = router_from_env()
+ROUTE_NAMES = ("conversation", "fused", "summary", "extraction")
+# What the extraction and fused chains return; sent as the response format on structured-output routes
+EXTRACTED_FIELDS = {"interests": ITEMS_SCHEMA, "dislikes": ITEMS_SCHEMA, "lifestyle": LIFESTYLE_SCHEMA,
+                    "intent": INTENT_SCHEMA}
+EXTRACTION_SCHEMA = json_schema(EXTRACTED_FIELDS)
+FUSED_SCHEMA = json_schema({"reply": STRING_SCHEMA, **EXTRACTED_FIELDS}, always=("reply",))
+
+# "two_chain" runs extraction then reply generation; "fused" does both in one structured call
+RESPONSE_MODE = os.getenv("RESPONSE_MODE", "two_chain")
+
+# Default and maximum number of users a batch runs at once (see chat_batch)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+# How many ranked hobbies go into the suggestion prompt
+SUGGESTION_CANDIDATES = int(os.getenv("SUGGESTION_CANDIDATES", "3"))
 
 # Define system prompt
 SYSTEM_PROMPT = """
@@ -60,92 +102,551 @@ You are HobbyMentor, an AI hobby coach and conversational partner.
 - Stay curious and make the chat long and smooth.
 """
 
-# Define knowledge base
-HOBBY_KNOWLEDGE_BASE = {
-    "music": ["playing an instrument", "singing", "music production", "joining a choir"],
-    "outdoors": ["hiking", "camping", "bird watching", "gardening", "rock climbing"],
-    "creative": ["painting", "writing", "photography", "knitting", "pottery", "drawing"],
-    "social": ["board game nights", "book clubs", "volunteering", "dance classes"],
-    "solo": ["reading", "puzzle solving", "journaling", "meditation", "collecting"],
-    "active": ["yoga", "cycling", "swimming", "martial arts", "running"],
-    "tech": ["coding", "3D printing", "electronics", "video editing"],
-    "crafts": ["woodworking", "jewelry making", "sewing", "origami"]
-}
+# Per-session block right after SYSTEM_PROMPT; it only changes when the profile does
+PROFILE_BLOCK = """User's interests: {interests}
+User's dislikes: {dislikes}
+User's lifestyle: {lifestyle}"""
+
+# Closes every conversation/fused prompt; everything that changes per turn lives here
+TURN_BLOCK = """Current conversation phase: {phase}
+Previously suggested hobbies: {suggested_hobbies}
+Best-fitting hobbies to suggest next, best first (suggest ONE of these): {candidate_hobbies}
+
+User's latest message: "{user_message}"
+"""
 
 class HobbyMentor:
+    """Prompts are message lists laid out for provider-side prompt caching.
+
+    The conversation and fused prompts share one prefix: the static
+    SYSTEM_PROMPT (a literal message, byte-identical on every call), then the
+    profile block, the rolling summary and the history as chat messages.
+    Only the final user message, which carries the phase, candidates and the
+    user's words, differs between calls.
+    """
+
     def __init__(self):
-        self.conversation_prompt = ChatPromptTemplate.from_template(
-            SYSTEM_PROMPT + """
-            
-            Current conversation phase: {phase}
-            User's interests: {interests}
-            User's dislikes: {dislikes}
-            User's lifestyle: {lifestyle}
-            Previously suggested hobbies: {suggested_hobbies}
-            
-            Conversation history:
-            {conversation_history}
-            
-            User's latest message: "{user_message}"
-            
-            Respond naturally according to the current phase and conversation context.
-            """
-        )
+        from langchain_core.messages import SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+
+        prefix = [
+            SystemMessage(content=SYSTEM_PROMPT),
+            ("system", PROFILE_BLOCK),
+            MessagesPlaceholder("history"),
+        ]
+
+        self.conversation_prompt = ChatPromptTemplate.from_messages(prefix + [
+            ("human", TURN_BLOCK + "Respond naturally according to the current phase and conversation context.")
+        ])
         
-        self.extraction_prompt = ChatPromptTemplate.from_template(
-            """
-            Extract information from the user's response. Return ONLY valid JSON.
-            
-            Current phase: {phase}
-            User message: "{user_message}"
-            
-            Based on the phase, extract:
-            - interests: If asking about interests, return {{"interests": ["interest1", "interest2"]}}
-            - dislikes: If asking about dislikes, return {{"dislikes": ["dislike1", "dislike2"]}}  
-            - lifestyle: If asking about lifestyle, return {{"lifestyle": {{"energy": "high/medium/low", "time": "lots/some/little", "social": "social/solo/both"}}}}
-            - intent: If in suggestion phase, return {{"intent": "wants_more/satisfied/asking_question"}}
-            
-            If no relevant info, return {{}}.
-            """
-        )
+        self.extraction_prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content="""Extract information from the user's response. Return ONLY valid JSON.
+
+Based on the phase, extract:
+- interests: If asking about interests, return {"interests": ["interest1", "interest2"]}
+- dislikes: If asking about dislikes, return {"dislikes": ["dislike1", "dislike2"]}
+- lifestyle: If asking about lifestyle, return {"lifestyle": {"energy": "high/medium/low", "time": "lots/some/little", "social": "social/solo/both"}}
+- intent: If in suggestion phase, return {"intent": "wants_more/satisfied/asking_question"}
+
+If no relevant info, return {}."""),
+            ("human", 'Current phase: {phase}\nUser message: "{user_message}"'),
+        ])
         
-        self.conversation_chain = self.conversation_prompt | llm | StrOutputParser()
-        self.extraction_chain = self.extraction_prompt | llm | JsonOutputParser()
+        self.fused_prompt = ChatPromptTemplate.from_messages(prefix + [
+            ("human", TURN_BLOCK + """Respond naturally according to the current phase and conversation context,
+and extract information from the user's latest message in the same answer.
+Return ONLY valid JSON with your reply under "reply" plus the extracted field for the phase:
+- interests phase: {{"reply": "...", "interests": ["interest1", "interest2"]}}
+- dislikes phase: {{"reply": "...", "dislikes": ["dislike1", "dislike2"]}}
+- lifestyle phase: {{"reply": "...", "lifestyle": {{"energy": "high/medium/low", "time": "lots/some/little", "social": "social/solo/both"}}}}
+- suggesting phase: {{"reply": "...", "intent": "wants_more/satisfied/asking_question"}}
+
+If there is no relevant info, return just {{"reply": "..."}}.""")
+        ])
+        
+        self.summary_prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content="""Update the running summary of a conversation between HobbyMentor, a hobby coach, and a user.
+Keep what the user said about their interests, dislikes and lifestyle, which hobbies were
+suggested and how the user reacted. Return only the summary."""),
+            ("human", "Stay under {max_words} words.\n\nCurrent summary: {summary}\n\nNew messages:\n{messages}"),
+        ])
+        
+        # One client; each chain binds its route's model settings onto it
+        model, route = get_llm(), model_router.model
+        self.conversation_chain = self.conversation_prompt | route("conversation", model) | StrOutputParser()
+        self.extraction_chain = (self.extraction_prompt | route("extraction", model, EXTRACTION_SCHEMA)
+                                 | JsonOutputParser() | drop_nulls)
+        self.fused_chain = self.fused_prompt | route("fused", model, FUSED_SCHEMA) | JsonOutputParser() | drop_nulls
+        self.summary_chain = self.summary_prompt | route("summary", model) | StrOutputParser()
+
+# Token budget for the verbatim recent messages in the prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+# Share of the budget kept when the window overflows
+HISTORY_EVICT_TO = float(os.getenv("HISTORY_EVICT_TO", "0.5"))
+# Token budget for the rolling summary of older messages; 0 drops them instead, as before
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "250"))
+# Messages that left the window are folded into the summary this many at a time, so the summary
+# costs one background LLM call every few turns (and lags the window by at most this many messages)
+SUMMARY_BATCH = int(os.getenv("SUMMARY_BATCH", "6"))
+# Messages waiting for the summary are capped, so a failing summarizer can't grow a session
+MAX_UNSUMMARIZED = 50
+# Sessions whose history is kept as ready-made chat message objects between turns
+RENDERED_HISTORY_SESSIONS = int(os.getenv("RENDERED_HISTORY_SESSIONS", "1024"))
+# user_id -> (weakref to the UserSession, sequence number of the first message, message objects)
+_rendered_history: "OrderedDict[str, tuple]" = OrderedDict()
+# Optional callable(user_id, message) that receives messages pushed out of the prompt window
+history_cold_store: Optional[Callable[[str, dict], None]] = None
 
 class UserSession:
+    __slots__ = ("user_id", "phase", "_interests", "_dislikes", "_lifestyle", "suggested_hobbies",
+                 "_window", "_window_tokens", "_history", "summary", "unsummarized", "message_count",
+                 "__weakref__")
+
     def __init__(self, user_id: str):
         self.user_id = user_id
         self.phase = "greeting"  # greeting -> interests -> dislikes -> lifestyle -> suggesting
-        self.interests = []
-        self.dislikes = []
-        self.lifestyle = {}
+        # Profile fields stay None until first used; interests/dislikes map a normalized key to the first spelling seen
+        self._interests: Optional[Dict[str, str]] = None
+        self._dislikes: Optional[Dict[str, str]] = None
+        self._lifestyle: Optional[Dict[str, str]] = None
         self.suggested_hobbies = []
-        self.conversation_history = []
+        # (role, content length, tokens) per recent message, oldest first, within HISTORY_TOKEN_BUDGET;
+        # the text itself lives only in _history, the prompt-ready "role: content" lines
+        self._window = []
+        self._window_tokens = 0
+        self._history = ""
+        # Rolling summary of the messages that left the window, and those not folded into it yet
+        self.summary = ""
+        self.unsummarized: List[Dict[str, str]] = []
         self.message_count = 0
 
+    @property
+    def interests(self) -> List[str]:
+        return list(self._interests.values()) if self._interests else []
+
+    @property
+    def dislikes(self) -> List[str]:
+        return list(self._dislikes.values()) if self._dislikes else []
+
+    @property
+    def lifestyle(self) -> Dict[str, str]:
+        return dict(self._lifestyle) if self._lifestyle else {}
+
+    @staticmethod
+    def _merge(existing: Optional[Dict[str, str]], items: List[str], added: List[str]) -> Optional[Dict[str, str]]:
+        for item in items:
+            key = str(item).strip().lower()
+            if key:
+                if existing is None:
+                    existing = {}
+                if key not in existing:
+                    existing[key] = item
+                    added.append(key)
+        return existing
+
+    def add_interests(self, items: List[str]) -> List[str]:
+        """Returns the normalized keys that were new to this session."""
+        added = []
+        self._interests = self._merge(self._interests, items, added)
+        return added
+
+    def add_dislikes(self, items: List[str]) -> List[str]:
+        added = []
+        self._dislikes = self._merge(self._dislikes, items, added)
+        return added
+
+    def update_lifestyle(self, lifestyle: Dict[str, str]):
+        if lifestyle:
+            if self._lifestyle is None:
+                self._lifestyle = {}
+            self._lifestyle.update(lifestyle)
+
     def add_message(self, role: str, content: str):
-        self.conversation_history.append({"role": role, "content": content})
+        # A single message longer than the whole budget is cut down so it still fits
+        content = truncate_to_tokens(content, HISTORY_TOKEN_BUDGET)
+        line = f"{role}: {content}"
+        tokens = count_tokens(line) + 1  # + the newline
+        self._window.append((role, len(content), tokens))
+        self._window_tokens += tokens
+        self._history = f"{self._history}\n{line}" if self._history else line
+        # Over budget, trim to HISTORY_EVICT_TO of it in one go: the history prefix then stays
+        # byte-identical for several turns, which provider prompt caching needs
+        target = HISTORY_TOKEN_BUDGET * HISTORY_EVICT_TO if self._window_tokens > HISTORY_TOKEN_BUDGET else HISTORY_TOKEN_BUDGET
+        # The evicted entries and lines are cut off the front once per eviction, not once per message
+        evicted, position = 0, 0
+        while self._window_tokens > target and len(self._window) - evicted > 1:
+            old_role, old_length, old_tokens = self._window[evicted]
+            evicted += 1
+            self._window_tokens -= old_tokens
+            start = position + len(old_role) + 2
+            old_message = {"role": old_role, "content": self._history[start:start + old_length]}
+            position = start + old_length + 1  # Past the line's "\n"
+            if SUMMARY_TOKEN_BUDGET > 0:
+                self.unsummarized = [*self.unsummarized[1 - MAX_UNSUMMARIZED:], old_message]
+            if history_cold_store:
+                history_cold_store(self.user_id, old_message)
+        if evicted:
+            del self._window[:evicted]
+            self._history = self._history[position:]
         self.message_count += 1
 
+    def drop_last_message(self):
+        """Take back the latest message, e.g. a user message whose turn never got a reply."""
+        role, length, tokens = self._window.pop()
+        self._window_tokens -= tokens
+        self._history = self._history[:max(0, len(self._history) - len(role) - 3 - length)]
+        self.message_count -= 1
+        # The rendered messages cached for this session may include it
+        _rendered_history.pop(self.user_id, None)
+
+    def fold_summary(self, summary: str, folded: int):
+        """Install a summary that covers the first `folded` unsummarized messages."""
+        self.summary = truncate_to_tokens(summary.strip(), SUMMARY_TOKEN_BUDGET)
+        self.unsummarized = self.unsummarized[folded:]
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        messages, position = [], 0
+        for role, length, _ in self._window:
+            start = position + len(role) + 2
+            messages.append({"role": role, "content": self._history[start:start + length]})
+            position = start + length + 1
+        return messages
+
+    def history_messages(self, exclude_latest: str = "") -> list:
+        """Summary and recent messages as chat message objects, oldest first.
+
+        Rendered incrementally: for recently active sessions the message
+        objects from the previous turn are reused, dropping the ones that left
+        the window and converting only the new ones. `exclude_latest` drops
+        the last message when it is that user message, since the prompt's
+        closing turn block repeats it.
+        """
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+        first = self.message_count - len(self._window)
+        entry = _rendered_history.pop(self.user_id, None)
+        rendered = []
+        if entry is not None and entry[0]() is self and entry[1] <= first:
+            rendered = entry[2][first - entry[1]:]
+        if len(rendered) < len(self._window):
+            new = self.conversation_history[len(rendered):]
+            rendered = rendered + [HumanMessage(m["content"]) if m["role"] == "user" else AIMessage(m["content"])
+                                   for m in new]
+        _rendered_history[self.user_id] = (weakref.ref(self), first, rendered)
+        if len(_rendered_history) > RENDERED_HISTORY_SESSIONS:
+            _rendered_history.popitem(last=False)
+
+        messages = list(rendered)
+        if exclude_latest and messages and messages[-1].type == "human" and messages[-1].content == exclude_latest:
+            messages.pop()
+        if self.summary:
+            messages.insert(0, SystemMessage(f"Summary of the earlier conversation: {self.summary}"))
+        return messages
+
     def get_conversation_string(self) -> str:
-        return "\n".join([f"{msg['role']}: {msg['content']}" for msg in self.conversation_history[-6:]])  # Last 6 messages
+        # Bounded by SUMMARY_TOKEN_BUDGET + HISTORY_TOKEN_BUDGET however long the session runs
+        if self.summary:
+            return f"Summary of the earlier conversation: {self.summary}\n{self._history}"
+        return self._history
 
     def advance_phase(self):
         phase_order = ["greeting", "interests", "dislikes", "lifestyle", "suggesting"]
         current_index = phase_order.index(self.phase)
         if current_index < len(phase_order) - 1:
             self.phase = phase_order[current_index + 1]
+            record_transition(phase_order[current_index], self.phase)
+            aggregates.phase_changed(phase_order[current_index], self.phase)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "user_id": self.user_id,
+            "phase": self.phase,
+            "interests": self.interests,
+            "dislikes": self.dislikes,
+            "lifestyle": self.lifestyle,
+            "suggested_hobbies": self.suggested_hobbies,
+            "conversation_history": self.conversation_history,
+            "summary": self.summary,
+            "unsummarized": list(self.unsummarized),
+            "message_count": self.message_count
+        })
 
-# Global session storage
-sessions: Dict[str, UserSession] = {}
-mentor = HobbyMentor()
+    @classmethod
+    def from_json(cls, data: str) -> "UserSession":
+        fields = json.loads(data)
+        session = cls(fields["user_id"])
+        session.phase = fields["phase"]
+        session.add_interests(fields["interests"])
+        session.add_dislikes(fields["dislikes"])
+        session.update_lifestyle(fields["lifestyle"])
+        session.suggested_hobbies = fields["suggested_hobbies"]
+        for message in fields["conversation_history"]:
+            session.add_message(message["role"], message["content"])
+        # Re-adding the history above can't push anything out unless the budget shrank
+        session.summary = fields.get("summary", "")
+        session.unsummarized = [*fields.get("unsummarized", []), *session.unsummarized]
+        session.message_count = fields["message_count"]
+        return session
+
+# Phase counts, top interests/dislikes and suggestion counts across sessions, for /api/stats
+aggregates = stats_from_env()
+
+def session_evicted(user_id: str, session: Optional[UserSession]):
+    aggregates.session_removed(session.phase if session is not None else None)
+
+# Global session storage (SESSION_BACKEND picks in-memory or SQLite)
+sessions = store_from_env(dumps=UserSession.to_json, loads=UserSession.from_json, on_evict=session_evicted)
+mentor: Optional[HobbyMentor] = None
+extraction_cache = cache_from_env("app")
+fast_extractor = extractor_from_env()
+# Every chain call goes through the gateway: rate limits, concurrency cap, retries, circuit breaker
+gateway = gateway_from_env()
+
+# Opt-in (SPECULATIVE_SUGGESTIONS=1): pre-generate the next suggestion while the user reads this one
+speculator = speculator_from_env()
+# The message a speculative generation assumes; any wants_more message reuses its reply
+SPECULATIVE_MESSAGE = "Another one?"
+
+# Turns answered locally (see local_turn), by reason: deadline, shed or unavailable
+degraded_turns: Counter = Counter()
+
+def get_mentor() -> HobbyMentor:
+    global mentor
+    if mentor is None:
+        mentor = HobbyMentor()
+    return mentor
+
+def warm_up() -> float:
+    """Build the LLM client and chains now instead of on the first chat request; returns seconds taken."""
+    start = time.perf_counter()
+    get_mentor()
+    encoding()
+    return time.perf_counter() - start
+
+if not LAZY_INIT:
+    warm_up()
+
+def new_session(user_id: str) -> UserSession:
+    aggregates.session_created()
+    return UserSession(user_id)
 
 def get_session(user_id: str) -> UserSession:
-    if user_id not in sessions:
-        sessions[user_id] = UserSession(user_id)
-    return sessions[user_id]
+    return sessions.get_or_create(user_id, new_session)
+
+def save_session(session: UserSession):
+    # Write back after each turn; the SQLite store keeps a serialized copy
+    sessions.put(session.user_id, session)
+    schedule_summary(session)
+    schedule_speculation(session)
+
+# user_ids with a summary update running; one per session keeps the updates in order
+summarizing = set()
+# Strong references so background tasks aren't garbage collected mid-run
+background_tasks = set()
+
+def schedule_summary(session: UserSession):
+    """Fold messages that left the prompt window into the summary, off the request path."""
+    if len(session.unsummarized) < SUMMARY_BATCH or session.user_id in summarizing:
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(update_summary(session.user_id))
+    except RuntimeError:
+        return  # No event loop (scripts calling save_session directly): leave it for the next turn
+    summarizing.add(session.user_id)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def update_summary(user_id: str):
+    # Started from inside a turn; the turn's deadline isn't this task's
+    with deadline_scope(None):
+        await _update_summary(user_id)
+
+async def _update_summary(user_id: str):
+    try:
+        while True:
+            session = sessions.peek(user_id)
+            if session is None or len(session.unsummarized) < SUMMARY_BATCH:
+                return
+            pending = list(session.unsummarized)
+            messages = "\n".join(f"{m['role']}: {m['content']}" for m in pending)
+            try:
+                with span("summary"):
+                    summary = await gateway.ainvoke(get_mentor().summary_chain, {
+                        "summary": session.summary or "(none yet)",
+                        "messages": messages,
+                        "max_words": SUMMARY_TOKEN_BUDGET * 3 // 4
+                    })
+            except Exception as e:
+                print(f"Error updating summary: {e}")
+                record_error("summary")
+                return
+            # The LLM call runs unlocked so turns aren't held up; the fold is a read-modify-put of the
+            # session, so it takes the turn lock, or a turn's put (SESSION_BACKEND=sqlite) would overwrite it
+            async with session_lock(user_id):
+                # Re-read: the session may have been reset, or reloaded by a request meanwhile
+                session = sessions.peek(user_id)
+                if session is None:
+                    return
+                if list(session.unsummarized[:len(pending)]) == pending:
+                    session.fold_summary(summary, len(pending))
+                    sessions.put(user_id, session)
+    finally:
+        summarizing.discard(user_id)
+
+def schedule_speculation(session: UserSession):
+    """After a suggestion, start generating the reply to "another one" in the background."""
+    if speculator is None or session.phase != "suggesting" or not session.suggested_hobbies:
+        return
+    # Real requests waiting on the gateway come first
+    if gateway.queued:
+        return
+    chain = get_mentor().conversation_chain
+    # Inputs are taken now: the session can change before the task runs
+    inputs = conversation_inputs(session, SPECULATIVE_MESSAGE)
+    inputs["suggested_hobbies"] = list(inputs["suggested_hobbies"])
+
+    async def generate():
+        with span("speculation"), deadline_scope(None):
+            return await gateway.ainvoke(chain, inputs)
 
-def generate_response(session: UserSession, user_message: str = "") -> str:
+    try:
+        speculator.start(session.user_id, session.message_count, generate, prompt_tokens(chain, inputs))
+    except RuntimeError:
+        return  # No event loop
+
+async def speculative_reply(session: UserSession, user_message: str) -> Tuple[Optional[str], Optional[dict]]:
+    """(reply, extracted_info) for a turn with a pending speculation, else (None, None).
+
+    Call after the user message is added. The speculation is used when the
+    message wants more and nothing else changed the session since; any other
+    message discards it. The extraction is returned so it isn't run twice.
+    """
+    if speculator is None or not user_message or not speculator.has(session.user_id):
+        return None, None
+    extracted_info = await extract_info(session, user_message)
+    wanted = session.phase == "suggesting" and extracted_info.get("intent") == "wants_more"
+    reply = await within_deadline(speculator.take(session.user_id, session.message_count - 1, wanted))
+    return reply, extracted_info
+
+def update_profile(session: UserSession, extracted_info: dict):
+    if "interests" in extracted_info:
+        aggregates.add_interests(session.add_interests(extracted_info["interests"]))
+    if "dislikes" in extracted_info:
+        aggregates.add_dislikes(session.add_dislikes(extracted_info["dislikes"]))
+    if "lifestyle" in extracted_info:
+        session.update_lifestyle(extracted_info["lifestyle"])
+
+def finish_turn(session: UserSession, response: str):
+    # Advance phase based on context
+    if session.phase == "interests" and session.interests:
+        session.advance_phase()
+    elif session.phase == "dislikes" and session.dislikes:
+        session.advance_phase()
+    elif session.phase == "lifestyle" and session.lifestyle:
+        session.advance_phase()
+
+    # Track suggested hobbies
+    if session.phase == "suggesting":
+        with span("hobby_matching"):
+            for hobby, category in current_catalogue().matcher.match(response):
+                if hobby not in session.suggested_hobbies:
+                    session.suggested_hobbies.append(hobby)
+                    aggregates.suggested(hobby, category)
+
+    session.add_message("assistant", response)
+
+def suggestion_candidates(session: UserSession) -> List[str]:
+    # Ranked locally so only a few profile-fitting, not-yet-suggested hobbies reach the prompt
+    if session.phase != "suggesting":
+        return []
+    return current_catalogue().ranker.candidates(session.interests, session.dislikes, session.lifestyle,
+                                   exclude=session.suggested_hobbies, k=SUGGESTION_CANDIDATES)
+
+def conversation_inputs(session: UserSession, user_message: str) -> dict:
+    return {
+        "phase": session.phase,
+        "interests": session.interests,
+        "dislikes": session.dislikes,
+        "lifestyle": session.lifestyle,
+        "suggested_hobbies": session.suggested_hobbies,
+        "candidate_hobbies": format_candidates(suggestion_candidates(session)),
+        "history": session.history_messages(exclude_latest=user_message),
+        "user_message": user_message
+    }
+
+async def extract_info(session: UserSession, user_message: str) -> dict:
+    # Extract information based on current phase
+    if not user_message:
+        return {}
+    with span("extraction"):
+        # Closed-vocabulary phases try the local rules first
+        extracted_info = fast_extractor.extract(session.phase, user_message)
+        if extracted_info is not None:
+            return extracted_info
+        cached = extraction_cache.get(session.phase, user_message)
+        if cached is not None:
+            return cached
+        try:
+            extracted_info = await gateway.ainvoke(get_mentor().extraction_chain, {
+                "phase": session.phase,
+                "user_message": user_message
+            })
+        except DeadlineExceeded:
+            # Not cached: a later turn with time to spare gets the LLM's extraction
+            return local_extraction(session.phase, user_message, current_catalogue(), fast_extractor)
+        except Exception:
+            record_error("extraction")
+            return {}
+        extraction_cache.put(session.phase, user_message, extracted_info)
+        return extracted_info
+
+async def two_chain_turn(session: UserSession, user_message: str, extracted_info: Optional[dict] = None) -> str:
+    if extracted_info is None:
+        extracted_info = await extract_info(session, user_message)
+    update_profile(session, extracted_info)
+
+    # Generate conversational response
+    with span("generation"):
+        return await gateway.ainvoke(get_mentor().conversation_chain, conversation_inputs(session, user_message))
+
+async def fused_turn(session: UserSession, user_message: str) -> str:
+    # Reply and extraction in a single round-trip; fall back to two chains if the JSON is unusable
+    try:
+        with span("generation"):
+            result = await gateway.ainvoke(get_mentor().fused_chain, conversation_inputs(session, user_message))
+        response = result.pop("reply")
+    except LLMUnavailable:
+        raise
+    except Exception as e:
+        print(f"Fused turn failed, falling back to two chains: {e}")
+        record_error("fused_turn")
+        return await two_chain_turn(session, user_message)
+
+    update_profile(session, result)
+    return response
+
+def local_turn(session: UserSession, user_message: str, reason: str) -> str:
+    """Finish the turn without the LLM: local extraction, then a templated question or a ranked suggestion.
+
+    Call after the user message is added. Safe after a partly run LLM turn:
+    profile merges skip what is already there.
+    """
+    degraded_turns[reason] += 1
+    record_degraded(reason)
+    catalogue = current_catalogue()
+    update_profile(session, local_extraction(session.phase, user_message, catalogue, fast_extractor))
+    topic = next_topic(session.phase, session.interests, session.dislikes, session.lifestyle)
+    if topic == "suggesting" and session.phase == "suggesting":
+        response = local_suggestion(catalogue, session.interests, session.dislikes, session.lifestyle,
+                                    session.suggested_hobbies)
+    else:
+        response = local_question(topic, session.interests)
+    finish_turn(session, response)
+    return response
+
+async def generate_response(session: UserSession, user_message: str = "") -> str:
     try:
         # Handle greeting phase
         if session.phase == "greeting":
@@ -158,59 +659,165 @@ def generate_response(session: UserSession, user_message: str = "") -> str:
         if user_message:
             session.add_message("user", user_message)
 
-        # Extract information based on current phase
-        extracted_info = {}
-        if user_message:
-            try:
-                extracted_info = mentor.extraction_chain.invoke({
-                    "phase": session.phase,
-                    "user_message": user_message
-                })
-            except:
-                extracted_info = {}
-
-        # Update session with extracted info
-        if "interests" in extracted_info:
-            session.interests.extend(extracted_info["interests"])
-        if "dislikes" in extracted_info:
-            session.dislikes.extend(extracted_info["dislikes"]) 
-        if "lifestyle" in extracted_info:
-            session.lifestyle.update(extracted_info["lifestyle"])
-
-        # Generate conversational response
-        response = mentor.conversation_chain.invoke({
-            "phase": session.phase,
-            "interests": session.interests,
-            "dislikes": session.dislikes,
-            "lifestyle": session.lifestyle,
-            "suggested_hobbies": session.suggested_hobbies,
-            "conversation_history": session.get_conversation_string(),
-            "user_message": user_message
-        })
-
-        # Advance phase based on context
-        if session.phase == "interests" and session.interests:
-            session.advance_phase()
-        elif session.phase == "dislikes" and session.dislikes:
-            session.advance_phase()
-        elif session.phase == "lifestyle" and session.lifestyle:
-            session.advance_phase()
+        response, extracted_info = await speculative_reply(session, user_message)
+        if response is not None:
+            update_profile(session, extracted_info)
+        elif RESPONSE_MODE == "fused" and user_message:
+            response = await fused_turn(session, user_message)
+        else:
+            response = await two_chain_turn(session, user_message, extracted_info)
 
-        # Track suggested hobbies
-        if session.phase == "suggesting":
-            # Simple hobby extraction from response
-            for category, hobbies in HOBBY_KNOWLEDGE_BASE.items():
-                for hobby in hobbies:
-                    if hobby.lower() in response.lower() and hobby not in session.suggested_hobbies:
-                        session.suggested_hobbies.append(hobby)
-
-        session.add_message("assistant", response)
+        finish_turn(session, response)
         return response
 
+    except LLMUnavailable as e:
+        if e.reason == "unavailable":
+            print(f"LLM unavailable: {e}")
+            record_error("llm_unavailable")
+        return local_turn(session, user_message, e.reason)
     except Exception as e:
         print(f"Error generating response: {e}")
+        record_error("generate_response")
         return "I'm having trouble processing that. Could you tell me a bit about what you like to do for fun?"
 
+async def stream_response(session: UserSession, user_message: str = "") -> AsyncIterator[str]:
+    # Handle greeting phase
+    if session.phase == "greeting":
+        yield await generate_response(session, user_message)
+        return
+
+    if user_message:
+        session.add_message("user", user_message)
+
+    chunks = []
+    extraction = None
+    replied = False
+    try:
+        try:
+            response, extracted_info = await speculative_reply(session, user_message)
+        except DeadlineExceeded:
+            response, extracted_info = None, None  # The generation below fails fast and answers locally
+        except Exception as e:
+            print(f"Error using speculative reply: {e}")
+            record_error("speculation")
+            response, extracted_info = None, None
+        if response is not None:
+            update_profile(session, extracted_info)
+            finish_turn(session, response)
+            replied = True
+            yield response
+            return
+
+        if extracted_info is None:
+            # Extraction runs alongside generation so the first token isn't held back by it
+            extraction = asyncio.create_task(extract_info(session, user_message))
+        else:
+            extraction = asyncio.get_running_loop().create_future()
+            extraction.set_result(extracted_info)
+        try:
+            with span("generation"):
+                async for chunk in gateway.astream(get_mentor().conversation_chain, conversation_inputs(session, user_message)):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+            update_profile(session, await extraction)
+            finish_turn(session, "".join(chunks))
+            replied = True
+        except LLMUnavailable as e:
+            if e.reason == "unavailable":
+                print(f"LLM unavailable: {e}")
+                record_error("llm_unavailable")
+            # Once part of the reply is out, a different local one can't follow it
+            if not chunks:
+                response = local_turn(session, user_message, e.reason)
+                replied = True
+                yield response
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            record_error("stream_response")
+            if not chunks:
+                yield "I'm having trouble processing that. Could you tell me a bit about what you like to do for fun?"
+    finally:
+        # Also reached when the client disconnects mid-turn (GeneratorExit, CancelledError)
+        if extraction is not None and not extraction.done():
+            extraction.cancel()
+        if not replied:
+            # Keep the history in user/assistant pairs: record the part of the reply that was
+            # sent, or take back the user message if none of it was
+            if chunks:
+                finish_turn(session, "".join(chunks))
+            elif user_message:
+                session.drop_last_message()
+
+async def run_turn(user_id: str, message: str) -> str:
+    with deadline_scope(gateway.deadline()):
+        async with session_lock(user_id):
+            session = get_session(user_id)
+            response = await generate_response(session, message)
+            save_session(session)
+            return response
+
+async def chat_batch(items: Iterable[Tuple[str, str]], concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[dict]:
+    """Run many (user_id, message) turns and yield a result per turn as soon as it completes.
+
+    A user's turns run one after another in the order given; up to
+    `concurrency` turns from different users run at once. Each result
+    carries the item's position in `items` as "index", since results
+    arrive in completion order.
+    """
+    per_user: Dict[str, List[Tuple[int, str]]] = {}
+    for index, (user_id, message) in enumerate(items):
+        per_user.setdefault(user_id, []).append((index, message))
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run_user(user_id: str, turns: List[Tuple[int, str]]):
+        for index, message in turns:
+            async with semaphore:
+                try:
+                    text = await run_turn(user_id, message)
+                    result = {"index": index, "user_id": user_id, "type": "message", "text": text,
+                              "phase": get_session(user_id).phase}
+                except Exception as e:
+                    print(f"Error in batch turn for {user_id}: {e}")
+                    record_error("chat_batch")
+                    result = {"index": index, "user_id": user_id, "type": "error",
+                              "text": "Sorry, I encountered an error. Please try again."}
+            await results.put(result)
+
+    tasks = [asyncio.create_task(run_user(user_id, turns)) for user_id, turns in per_user.items()]
+    try:
+        for _ in range(sum(len(turns) for turns in per_user.values())):
+            yield await results.get()
+    finally:
+        # Also reached when the consumer stops early (client disconnected)
+        for task in tasks:
+            task.cancel()
+
+async def turn_events(session: UserSession, message: str) -> AsyncIterator[dict]:
+    """One streamed turn as "token" events, then "done" with the phase and suggested hobbies. Hold the session lock."""
+    tokens = []
+    try:
+        # Closed here rather than whenever it is garbage collected, so a disconnect settles the turn before the save
+        async with aclosing(stream_response(session, message)) as stream:
+            async for token in stream:
+                tokens.append(token)
+                yield {"type": "token", "text": token}
+    finally:
+        # Saved on disconnect too, so every session backend keeps what stream_response recorded
+        with span("session_save"):
+            save_session(session)
+    yield {
+        "type": "done",
+        "text": "".join(tokens),
+        "phase": session.phase,
+        "suggested_hobbies": list(session.suggested_hobbies)
+    }
+
+def sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
 # FastAPI app
 app = FastAPI()
 app.add_middleware(
@@ -219,16 +826,28 @@ app.add_middleware(
     allow_methods=["*"], 
     allow_headers=["*"]
 )
+# Request latency histograms and the optional Server-Timing header (SERVER_TIMING=1)
+app.add_middleware(MetricsMiddleware)
+# gzip for JSON API responses above API_COMPRESSION_MIN_BYTES
+app.add_middleware(ApiCompressionMiddleware)
 
 @app.post("/api/chat")
 async def chat_endpoint(request: Request):
     try:
-        data = await request.json()
+        with span("parse"):
+            data = await request.json()
         user_id = data.get("user_id", "default")
         message = data.get("message", "")
         
-        session = get_session(user_id)
-        response = generate_response(session, message)
+        # The deadline starts now, so time spent waiting for the session lock counts against it
+        with deadline_scope(gateway.deadline(request.headers.get("x-deadline-ms"))):
+            # One turn at a time per user; concurrent requests for the same user wait here
+            async with session_lock(user_id):
+                with span("session_lookup"):
+                    session = get_session(user_id)
+                response = await generate_response(session, message)
+                with span("session_save"):
+                    save_session(session)
         
         return JSONResponse({
             "type": "message",
@@ -237,20 +856,107 @@ async def chat_endpoint(request: Request):
         
     except Exception as e:
         print(f"Error in chat_endpoint: {e}")
+        record_error("chat_endpoint")
         return JSONResponse({
             "type": "error",
             "text": "Sorry, I encountered an error. Please try again."
         }, status_code=500)
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: Request):
+    try:
+        with span("parse"):
+            data = await request.json()
+    except Exception as e:
+        print(f"Error in chat_stream_endpoint: {e}")
+        record_error("chat_stream_endpoint")
+        return JSONResponse({
+            "type": "error",
+            "text": "Sorry, I encountered an error. Please try again."
+        }, status_code=400)
+
+    user_id = data.get("user_id", "default")
+    message = data.get("message", "")
+    deadline = gateway.deadline(request.headers.get("x-deadline-ms"))
+
+    async def events():
+        # The lock is held for the whole stream, so the next turn sees this one's history
+        with deadline_scope(deadline):
+            async with session_lock(user_id):
+                with span("session_lookup"):
+                    session = get_session(user_id)
+                async for event in turn_events(session, message):
+                    yield sse_event(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/chat/{user_id}")
+async def chat_socket(websocket: WebSocket, user_id: str):
+    # Bound for the whole connection; sessions.version is re-read instead of the session itself,
+    # and only a reset, an eviction or another worker's write makes the next turn load it again
+    session = sessions.peek(user_id)
+    version = sessions.version(user_id)
+
+    async def turn(message: str) -> AsyncIterator[dict]:
+        nonlocal session, version
+        with deadline_scope(gateway.deadline()):
+            async with session_lock(user_id):
+                with span("session_lookup"):
+                    if session is None or sessions.version(user_id) != version:
+                        session = get_session(user_id)
+                try:
+                    async for event in turn_events(session, message):
+                        yield event
+                finally:
+                    # turn_events has saved the session; the save itself changes the SQLite store's version
+                    version = sessions.version(user_id)
+
+    await serve_chat(websocket, turn, {
+        "phase": session.phase if session else "greeting",
+        "suggested_hobbies": session.suggested_hobbies if session else []
+    })
+
+@app.post("/api/chat/batch")
+async def chat_batch_endpoint(request: Request):
+    """Body: {"items": [{"user_id": ..., "message": ...}, ...], "concurrency": optional}.
+
+    Streams one NDJSON line per turn as it completes; see chat_batch.
+    """
+    try:
+        with span("parse"):
+            data = await request.json()
+        items = [(item.get("user_id", "default"), item.get("message", "")) for item in data["items"]]
+        concurrency = min(int(data.get("concurrency", BATCH_CONCURRENCY)), BATCH_CONCURRENCY)
+    except Exception as e:
+        print(f"Error in chat_batch_endpoint: {e}")
+        record_error("chat_batch_endpoint")
+        return JSONResponse({
+            "type": "error",
+            "text": "Expected {\"items\": [{\"user_id\": ..., \"message\": ...}]}"
+        }, status_code=400)
+
+    async def lines():
+        async for result in chat_batch(items, concurrency):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/api/reset/{user_id}")
 async def reset_session(user_id: str):
-    if user_id in sessions:
-        del sessions[user_id]
+    session = sessions.peek(user_id)
+    if sessions.delete(user_id):
+        aggregates.session_removed(session.phase if session is not None else None)
+    if speculator is not None:
+        speculator.discard(user_id)
     return JSONResponse({"status": "reset"})
 
 @app.get("/api/status/{user_id}")
 async def get_status(user_id: str):
-    session = get_session(user_id)
+    # peek never creates a session, so status polling can't fill the store
+    session = sessions.peek(user_id)
+    if session is None:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
     return JSONResponse({
         "phase": session.phase,
         "interests": session.interests,
@@ -260,8 +966,54 @@ async def get_status(user_id: str):
         "message_count": session.message_count
     })
 
-# Serve frontend
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+@app.post("/api/warmup")
+async def warmup_endpoint():
+    # Warm-up hook for lazy mode: ping after deploy or on a schedule to keep the chat path ready
+    seconds = await asyncio.to_thread(warm_up)
+    return JSONResponse({"status": "ready", "seconds": round(seconds, 3)})
+
+@app.get("/api/stats")
+async def aggregate_stats(n: int = 10):
+    # Maintained incrementally; constant time however many sessions there are
+    return JSONResponse(aggregates.snapshot(max(1, min(n, 100))))
+
+@app.get("/api/sessions/stats")
+async def session_stats():
+    return JSONResponse(sessions.stats())
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return JSONResponse(extraction_cache.stats())
+
+@app.get("/api/extraction/stats")
+async def extraction_stats():
+    return JSONResponse(fast_extractor.stats())
+
+@app.get("/api/gateway/stats")
+async def gateway_stats():
+    return JSONResponse({**gateway.stats(), "degraded_turns": dict(degraded_turns)})
+
+@app.get("/api/routes")
+async def model_routes():
+    return JSONResponse({"routes": model_router.table(ROUTE_NAMES), "usage": route_stats()})
+
+@app.get("/api/speculation/stats")
+async def speculation_stats():
+    if speculator is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **speculator.stats()})
+
+@app.get("/api/catalogue/stats")
+async def catalogue_stats():
+    return JSONResponse(live_catalogue.stats())
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Serve frontend: committed .br/.gz variants (python static_assets.py), strong ETags, Cache-Control and 304s
+app.mount("/", PrecompressedStaticFiles(directory="static", html=True), name="static")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
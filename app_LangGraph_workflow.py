@@ -1,24 +1,57 @@
 import os
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langgraph.graph import StateGraph, END
-from typing import Dict, List, TypedDict
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Command, interrupt
+from typing import Annotated, AsyncIterator, Callable, Dict, List, Optional, TypedDict
+from contextlib import asynccontextmanager
+from collections import Counter
+import asyncio
+import json
+import operator
+
+from catalogue import current_catalogue, live_catalogue
+from extraction_cache import cache_from_env
+from fast_extraction import extractor_from_env
+from hobby_ranking import format_candidates
+from llm_gateway import DeadlineExceeded, LLMUnavailable, deadline_scope, gateway_from_env, session_lock
+from llm_provider import create_llm, route_stats
+from local_replies import local_extraction, local_question, local_suggestion
+from metrics import MetricsMiddleware, record_degraded, record_error, record_transition, registry, span
+from model_routes import ITEMS_SCHEMA, LIFESTYLE_SCHEMA, drop_nulls, json_schema, router_from_env
+from session_store import store_from_env
+from static_assets import ApiCompressionMiddleware, PrecompressedStaticFiles
+from ws_chat import serve_chat
 
 # Set OpenAI key
 os.environ["OPENAI_API_KEY"] = "OPENAI_API_KEY"
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
+# Initialize LLM (LLM_PROVIDER=fake swaps in the offline stand-in)
+llm = create_llm(model="gpt-4o", temperature=0.7)
+# Model, temperature, max tokens and timeout per chain, from model_routes.json (see model_routes.py)
+model_router = router_from_env()
+
+# How many ranked hobbies go into the suggestion prompt
+SUGGESTION_CANDIDATES = int(os.getenv("SUGGESTION_CANDIDATES", "3"))
+
+extraction_cache = cache_from_env("langgraph")
+fast_extractor = extractor_from_env()
+# Every chain call goes through the gateway: rate limits, concurrency cap, retries, circuit breaker, deadlines
+gateway = gateway_from_env()
+# Turns answered locally (see generate), by reason: deadline, shed or unavailable
+degraded_turns: Counter = Counter()
 
 # Define the state schema
 class ChatState(TypedDict):
-    messages: List[Dict[str, str]]
+    # Append-only: nodes return just their new messages and the reducer adds them
+    messages: Annotated[List[Dict[str, str]], operator.add]
+    # Latest assistant reply, so callers never scan the history for it
+    last_reply: str
     interests: List[str]
     dislikes: List[str]
     lifestyle: Dict[str, str]
@@ -27,18 +60,6 @@ class ChatState(TypedDict):
     user_id: str
     num_suggestions: int 
 
-# Define hobby knowledge base
-HOBBY_KNOWLEDGE_BASE = {
-    "music": ["playing an instrument", "singing", "music production", "joining a choir"],
-    "outdoors": ["hiking", "camping", "bird watching", "gardening", "rock climbing"],
-    "creative": ["painting", "writing", "photography", "knitting", "pottery", "drawing"],
-    "social": ["board game nights", "book clubs", "volunteering", "dance classes"],
-    "solo": ["reading", "puzzle solving", "journaling", "meditation", "collecting"],
-    "active": ["yoga", "cycling", "swimming", "martial arts", "running"],
-    "tech": ["coding", "3D printing", "electronics", "video editing"],
-    "crafts": ["woodworking", "jewelry making", "sewing", "origami"]
-}
-
 # System prompts
 GREETING_PROMPT = """You are HobbyMentor, a friendly AI hobby coach. 
 Greet the user warmly and ask about their interests. Keep it conversational and short.
@@ -67,8 +88,9 @@ User's interests: {interests}
 User's dislikes: {dislikes}
 User's lifestyle: {lifestyle}
 Previously suggested: {suggested_hobbies}
+Best-fitting candidates, best first: {candidate_hobbies}
 → DO NOT suggest any hobby from the 'Previously suggested' list.
-Suggest ONE new hobby that fits their profile. Explain WHY it fits them specifically.
+Suggest ONE new hobby from the candidates that fits their profile. Explain WHY it fits them specifically.
 Ask if they'd like to know more about this hobby or want another suggestion.
 Be encouraging and personal in your recommendations."""
 
@@ -88,227 +110,387 @@ User message: "{message}"
 Return format: {{"lifestyle": {{"energy": "high/medium/low", "time": "lots/some/little", "social": "social/solo/both"}}}}
 If no lifestyle info mentioned, return {{"lifestyle": {{}}}}"""
 
+# Tag on the user-facing reply calls, so streaming can skip the JSON extraction calls
+REPLY_TAG = "reply"
 
+# What each extraction chain returns; sent as the response format on structured-output routes
+EXTRACTION_SCHEMAS = {
+    "interests": json_schema({"interests": ITEMS_SCHEMA}, always=("interests",)),
+    "dislikes": json_schema({"dislikes": ITEMS_SCHEMA}, always=("dislikes",)),
+    "lifestyle": json_schema({"lifestyle": LIFESTYLE_SCHEMA}, always=("lifestyle",)),
+}
+ROUTE_NAMES = ("greeting", "interests", "dislikes", "lifestyle", "suggestion",
+               *(f"extract_{phase}" for phase in EXTRACTION_SCHEMAS))
+
+def reply_chain(template: str, route: str):
+    prompt = ChatPromptTemplate.from_template(template)
+    return (prompt | model_router.model(route, llm) | StrOutputParser()).with_config(tags=[REPLY_TAG])
+
+def extraction_chain(template: str, phase: str):
+    model = model_router.model(f"extract_{phase}", llm, EXTRACTION_SCHEMAS[phase])
+    return ChatPromptTemplate.from_template(template) | model | JsonOutputParser() | drop_nulls
+
+class PhaseChains:
+    """Every prompt | llm | parser chain the nodes use, built once instead of on every call."""
+
+    def __init__(self):
+        self.greeting = reply_chain(GREETING_PROMPT, "greeting")
+        self.interests = reply_chain(INTERESTS_PROMPT, "interests")
+        self.dislikes = reply_chain(DISLIKES_PROMPT, "dislikes")
+        self.lifestyle = reply_chain(LIFESTYLE_PROMPT, "lifestyle")
+        self.suggestion = reply_chain(SUGGESTION_PROMPT, "suggestion")
+        self.extract = {
+            "interests": extraction_chain(EXTRACT_INTERESTS_PROMPT, "interests"),
+            "dislikes": extraction_chain(EXTRACT_DISLIKES_PROMPT, "dislikes"),
+            "lifestyle": extraction_chain(EXTRACT_LIFESTYLE_PROMPT, "lifestyle"),
+        }
 
-def start_node(state: ChatState) -> ChatState:
-    prompt = ChatPromptTemplate.from_template(GREETING_PROMPT)
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({})
-    return {
-        "messages": state["messages"] + [{"role": "assistant", "content": response}],
-        "interests": state["interests"],
-        "dislikes": state["dislikes"],
-        "lifestyle": state["lifestyle"],
-        "suggested_hobbies": state["suggested_hobbies"],
-        "phase": "interests",
-        "user_id": state["user_id"],
-        "num_suggestions": state["num_suggestions"]
-    }
+chains = PhaseChains()
+
+
+async def extract(phase: str, message: str) -> dict:
+    # Confident rule-based results and repeated short replies skip the LLM call
+    with span("extraction"):
+        extracted = fast_extractor.extract(phase, message)
+        if extracted is not None:
+            return extracted
+        cached = extraction_cache.get(phase, message)
+        if cached is not None:
+            return cached
+        try:
+            extracted = await gateway.ainvoke(chains.extract[phase], {"message": message})
+        except DeadlineExceeded:
+            # Not cached: a later turn with time to spare gets the LLM's extraction
+            return local_extraction(phase, message, current_catalogue(), fast_extractor)
+        extraction_cache.put(phase, message, extracted)
+        return extracted
+
+async def generate(chain, inputs: dict, fallback: Optional[Callable[[], str]] = None) -> str:
+    """The chain's reply, or fallback()'s local one when the LLM is unavailable or out of time."""
+    with span("generation"):
+        try:
+            return await gateway.ainvoke(chain, inputs)
+        except LLMUnavailable as e:
+            if fallback is None:
+                raise
+            if e.reason == "unavailable":
+                print(f"LLM unavailable: {e}")
+                record_error("llm_unavailable")
+            degraded_turns[e.reason] += 1
+            record_degraded(e.reason)
+            return fallback()
+
+
+def latest_user_message(state: ChatState) -> str:
+    messages = state["messages"]
+    return messages[-1]["content"] if messages and messages[-1]["role"] == "user" else ""
+
+def assistant_update(response: str, **changes) -> dict:
+    # Partial state update: only the new message and the fields the node changed
+    return {"messages": [{"role": "assistant", "content": response}], "last_reply": response, **changes}
 
-def interests_node(state: ChatState) -> ChatState:
-    user_message = state["messages"][-1]["content"] if state["messages"] and state["messages"][-1]["role"] == "user" else ""
+
+async def start_node(state: ChatState) -> dict:
+    response = await generate(chains.greeting, {}, lambda: local_question("greeting"))
+    return assistant_update(response, phase="interests")
+
+async def interests_node(state: ChatState) -> dict:
+    user_message = latest_user_message(state)
     new_interests = []
     if user_message.strip():
-        extract_prompt = ChatPromptTemplate.from_template(EXTRACT_INTERESTS_PROMPT)
-        extract_chain = extract_prompt | llm | JsonOutputParser()
         try:
-            extracted = extract_chain.invoke({"message": user_message})
+            extracted = await extract("interests", user_message)
             new_interests = extracted.get("interests", [])
         except Exception as e:
             print(f"Error extracting interests: {e}")
+            record_error("extraction")
 
     # Merge and deduplicate
     updated_interests = list(set(state["interests"] + new_interests))
 
     # Generate response
-    response_prompt = ChatPromptTemplate.from_template(INTERESTS_PROMPT)
-    response_chain = response_prompt | llm | StrOutputParser()
-    response = response_chain.invoke({"interests": updated_interests})
-
-    return {
-        "messages": state["messages"] + [{"role": "assistant", "content": response}],
-        "interests": updated_interests,
-        "dislikes": state["dislikes"],
-        "lifestyle": state["lifestyle"],
-        "suggested_hobbies": state["suggested_hobbies"],
-        "phase": "dislikes",
-        "user_id": state["user_id"],
-        "num_suggestions": state["num_suggestions"]
-    }
+    response = await generate(chains.interests, {"interests": updated_interests},
+                              lambda: local_question("dislikes", updated_interests))
+    return assistant_update(response, interests=updated_interests, phase="dislikes")
 
-def dislikes_node(state: ChatState) -> ChatState:
-    user_message = state["messages"][-1]["content"] if state["messages"] and state["messages"][-1]["role"] == "user" else ""
+async def dislikes_node(state: ChatState) -> dict:
+    user_message = latest_user_message(state)
     new_dislikes = []
     if user_message.strip():
-        extract_prompt = ChatPromptTemplate.from_template(EXTRACT_DISLIKES_PROMPT)
-        extract_chain = extract_prompt | llm | JsonOutputParser()
         try:
-            extracted = extract_chain.invoke({"message": user_message})
+            extracted = await extract("dislikes", user_message)
             new_dislikes = extracted.get("dislikes", [])
         except Exception as e:
             print(f"Error extracting dislikes: {e}")
+            record_error("extraction")
 
     updated_dislikes = list(set(state["dislikes"] + new_dislikes))
 
-    response_prompt = ChatPromptTemplate.from_template(DISLIKES_PROMPT)
-    response_chain = response_prompt | llm | StrOutputParser()
-    response = response_chain.invoke({
+    response = await generate(chains.dislikes, {
         "interests": state["interests"],
         "dislikes": updated_dislikes
-    })
+    }, lambda: local_question("lifestyle"))
+    return assistant_update(response, dislikes=updated_dislikes, phase="lifestyle")
 
-    return {
-        "messages": state["messages"] + [{"role": "assistant", "content": response}],
-        "interests": state["interests"],
-        "dislikes": updated_dislikes,
-        "lifestyle": state["lifestyle"],
-        "suggested_hobbies": state["suggested_hobbies"],
-        "phase": "lifestyle",
-        "user_id": state["user_id"],
-        "num_suggestions": state["num_suggestions"]
-    }
-
-def lifestyle_node(state: ChatState) -> ChatState:
-    user_message = state["messages"][-1]["content"] if state["messages"] and state["messages"][-1]["role"] == "user" else ""
+async def lifestyle_node(state: ChatState) -> dict:
+    user_message = latest_user_message(state)
     new_lifestyle = {}
     if user_message.strip():
-        extract_prompt = ChatPromptTemplate.from_template(EXTRACT_LIFESTYLE_PROMPT)
-        extract_chain = extract_prompt | llm | JsonOutputParser()
         try:
-            extracted = extract_chain.invoke({"message": user_message})
+            extracted = await extract("lifestyle", user_message)
             new_lifestyle = extracted.get("lifestyle", {})
         except Exception as e:
             print(f"Error extracting lifestyle: {e}")
+            record_error("extraction")
 
     merged_lifestyle = {**state["lifestyle"], **new_lifestyle}
 
-    response_prompt = ChatPromptTemplate.from_template(LIFESTYLE_PROMPT)
-    response_chain = response_prompt | llm | StrOutputParser()
-    response = response_chain.invoke({
+    response = await generate(chains.lifestyle, {
         "interests": state["interests"],
         "dislikes": state["dislikes"],
         "lifestyle": merged_lifestyle
-    })
-
-    return {
-        "messages": state["messages"] + [{"role": "assistant", "content": response}],
-        "interests": state["interests"],
-        "dislikes": state["dislikes"],
-        "lifestyle": merged_lifestyle,
-        "suggested_hobbies": state["suggested_hobbies"],
-        "phase": "suggesting",
-        "user_id": state["user_id"],
-        "num_suggestions": state["num_suggestions"]
-    }
+    }, lambda: local_question("suggesting"))
+    return assistant_update(response, lifestyle=merged_lifestyle, phase="suggesting")
 
-def suggestion_node(state: ChatState) -> ChatState:
-    user_message = state["messages"][-1]["content"] if state["messages"] and state["messages"][-1]["role"] == "user" else ""
+async def suggestion_node(state: ChatState) -> dict:
+    # One catalogue version for the whole node, even if a reload lands meanwhile
+    catalogue = current_catalogue()
+    candidates = catalogue.ranker.candidates(state["interests"], state["dislikes"], state["lifestyle"],
+                                             exclude=state["suggested_hobbies"], k=SUGGESTION_CANDIDATES)
 
-    response_prompt = ChatPromptTemplate.from_template(SUGGESTION_PROMPT)
-    response_chain = response_prompt | llm | StrOutputParser()
-    response = response_chain.invoke({
+    response = await generate(chains.suggestion, {
         "interests": state["interests"],
         "dislikes": state["dislikes"],
         "lifestyle": state["lifestyle"],
-        "suggested_hobbies": state["suggested_hobbies"]
-    })
+        "suggested_hobbies": state["suggested_hobbies"],
+        "candidate_hobbies": format_candidates(candidates)
+    }, lambda: local_suggestion(catalogue, state["interests"], state["dislikes"], state["lifestyle"],
+                                state["suggested_hobbies"]))
 
     new_suggested_hobbies = state["suggested_hobbies"].copy()
-    for category, hobbies in HOBBY_KNOWLEDGE_BASE.items():
-        for hobby in hobbies:
-            if hobby.lower() in response.lower() and hobby not in new_suggested_hobbies:
+    with span("hobby_matching"):
+        for hobby, category in catalogue.matcher.match(response):
+            if hobby not in new_suggested_hobbies:
                 new_suggested_hobbies.append(hobby)
 
-    new_messages = state["messages"] + [{"role": "assistant", "content": response}]
+    return assistant_update(response, suggested_hobbies=new_suggested_hobbies, phase="suggesting",
+                            num_suggestions=state["num_suggestions"] + 1)
 
-    return {
-        "messages": new_messages,
-        "interests": state["interests"],
-        "dislikes": state["dislikes"],
-        "lifestyle": state["lifestyle"],
-        "suggested_hobbies": new_suggested_hobbies,
-        "phase": "suggesting",
-        "user_id": state["user_id"],
-        "num_suggestions": state["num_suggestions"] + 1  # Increment safely
-    }
+async def wait_for_user_node(state: ChatState) -> dict:
+    # Pause the run here until the next HTTP request resumes it with the user's message
+    message = interrupt({"phase": state["phase"]})
+    if not message.strip():
+        return {}
+    return {"messages": [{"role": "user", "content": message}]}
 
 # --- Routing Logic ---
+PHASE_NODES = {
+    "start": "start",
+    "interests": "interests",
+    "dislikes": "dislikes",
+    "lifestyle": "lifestyle",
+    "suggesting": "suggesting",
+}
+
 def route_conversation(state: ChatState) -> str:
-    phase = state.get("phase", "start")
-    num_suggestions = state.get("num_suggestions", 0)
-
-    if phase == "start":
-        return "interests"
-    elif phase == "interests":
-        return "dislikes"
-    elif phase == "dislikes":
-        return "lifestyle"
-    elif phase == "lifestyle":
-        return "suggesting"
-    elif phase == "suggesting":
-        if num_suggestions >= 3:
-            return END
-        return "suggesting"
-    else:
-        return END
+    # Run only the node for the current phase; every node then hands back to the user
+    return PHASE_NODES.get(state.get("phase", "start"), END)
 
 # --- Build Graph ---
-def create_chat_graph():
+def instrumented(name: str, node):
+    """Time a node under the node_<name> span and count the phase change in its update."""
+    async def run(state: ChatState) -> dict:
+        with span(f"node_{name}"):
+            update = await node(state)
+        if "phase" in update:
+            record_transition(state["phase"], update["phase"])
+        return update
+    return run
+
+def create_chat_graph(checkpointer):
     workflow = StateGraph(ChatState)
-    workflow.add_node("start", start_node)
-    workflow.add_node("interests", interests_node)
-    workflow.add_node("dislikes", dislikes_node)
-    workflow.add_node("lifestyle", lifestyle_node)
-    workflow.add_node("suggesting", suggestion_node)
+    workflow.add_node("start", instrumented("start", start_node))
+    workflow.add_node("interests", instrumented("interests", interests_node))
+    workflow.add_node("dislikes", instrumented("dislikes", dislikes_node))
+    workflow.add_node("lifestyle", instrumented("lifestyle", lifestyle_node))
+    workflow.add_node("suggesting", instrumented("suggesting", suggestion_node))
+    # Not timed: it only records the user message before interrupt() pauses the run
+    workflow.add_node("wait_for_user", wait_for_user_node)
 
-    workflow.set_entry_point("start")
-    workflow.add_conditional_edges("start", route_conversation)
-    workflow.add_conditional_edges("interests", route_conversation)
-    workflow.add_conditional_edges("dislikes", route_conversation)
-    workflow.add_conditional_edges("lifestyle", route_conversation)
-    workflow.add_conditional_edges("suggesting", route_conversation)
+    workflow.add_conditional_edges(START, route_conversation)
+    for node in PHASE_NODES.values():
+        workflow.add_edge(node, "wait_for_user")
+    workflow.add_conditional_edges("wait_for_user", route_conversation)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 # --- Session Management ---
-chat_graph = create_chat_graph()
-sessions: Dict[str, ChatState] = {}
-
-def get_or_create_session(user_id: str) -> ChatState:
-    if user_id not in sessions:
-        sessions[user_id] = {
-            "messages": [],
-            "interests": [],
-            "dislikes": [],
-            "lifestyle": {},
-            "suggested_hobbies": [],
-            "phase": "start",
-            "user_id": user_id,
-            "num_suggestions": 0
-        }
-    return sessions[user_id]
+# Graph state is checkpointed per thread_id (the user_id) between requests.
+# With SESSION_BACKEND=sqlite, open_checkpointer swaps in a SQLite saver at startup.
+checkpointer = InMemorySaver()
+chat_graph = create_chat_graph(checkpointer)
+
+async def prune_checkpoints(user_id: str) -> int:
+    """Drop all but the thread's latest checkpoint once a turn is over; returns the bytes the thread still takes.
+
+    A paused thread resumes from its latest checkpoint (and that checkpoint's
+    pending writes) alone. The older ones would only serve time travel, and each
+    holds another copy of the whole message list, so keeping them all grows a
+    thread's storage quadratically with its length. Only the public saver API
+    is used (alist, adelete_thread, aput, aput_writes), so this works the same
+    for the in-memory and SQLite savers: the thread is deleted and its latest
+    checkpoint written back with its pending writes. Callers hold the thread's
+    session_lock, so no run sees the thread in between.
+    """
+    config = thread_config(user_id)
+    latest = [t async for t in checkpointer.alist(config, limit=2)]
+    if not latest:
+        return 0
+    kept = latest[0]
+    if len(latest) > 1:
+        await checkpointer.adelete_thread(user_id)
+        checkpoint_ns = kept.config["configurable"].get("checkpoint_ns", "")
+        saved = await checkpointer.aput(
+            {"configurable": {"thread_id": user_id, "checkpoint_ns": checkpoint_ns}},
+            kept.checkpoint, kept.metadata, dict(kept.checkpoint["channel_versions"]))
+        writes: Dict[str, list] = {}
+        for task_id, channel, value in kept.pending_writes or ():
+            writes.setdefault(task_id, []).append((channel, value))
+        for task_id, task_writes in writes.items():
+            await checkpointer.aput_writes(saved, task_writes, task_id)
+    # What the saver stores, as its own serializer encodes it
+    serde = checkpointer.serde
+    return (len(serde.dumps_typed(kept.checkpoint)[1]) + len(serde.dumps_typed(kept.metadata)[1])
+            + sum(len(serde.dumps_typed(value)[1]) for _, _, value in kept.pending_writes or ()))
+
+# Checkpoint deletions for evicted threads still running; held so they aren't garbage collected mid-run
+background_tasks = set()
+
+def forget_thread(user_id: str, _size):
+    # Evicted from the thread index: drop its checkpoints too
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None or isinstance(checkpointer, InMemorySaver):
+        checkpointer.delete_thread(user_id)
+        return
+    task = loop.create_task(checkpointer.adelete_thread(user_id))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+# Index of live threads with TTL/LRU limits; the value is the bytes the thread's checkpoint takes
+# in the checkpointer (see prune_checkpoints), so SESSION_MAX_BYTES bounds what is really stored
+threads = store_from_env(dumps=json.dumps, loads=json.loads, size_of=lambda size: size,
+                         on_evict=forget_thread, table="threads")
+
+def thread_config(user_id: str) -> dict:
+    return {"configurable": {"thread_id": user_id}}
+
+def new_session(user_id: str) -> ChatState:
+    return {
+        "messages": [],
+        "last_reply": "",
+        "interests": [],
+        "dislikes": [],
+        "lifestyle": {},
+        "suggested_hobbies": [],
+        "phase": "start",
+        "user_id": user_id,
+        "num_suggestions": 0
+    }
 
-def process_message(user_id: str, message: str) -> str:
+async def graph_input(user_id: str, message: str):
+    # Resume a thread paused at wait_for_user, or start a new one with the greeting
+    if threads.get(user_id) is not None:
+        snapshot = await chat_graph.aget_state(thread_config(user_id))
+        if snapshot.next:
+            return Command(resume=message)
+    # Unknown, expired or finished thread: clear stale checkpoints, since messages are appended to them
+    await checkpointer.adelete_thread(user_id)
+    return new_session(user_id)
+
+ERROR_REPLY = "I'm sorry, I encountered an error. Could you please try again?"
+# Reply when the LLM is rate limited or down
+BUSY_REPLY = "I'm getting a lot of questions right now - give me a moment and send that again?"
+
+def error_reply(error: Exception) -> str:
+    return BUSY_REPLY if isinstance(error, LLMUnavailable) else ERROR_REPLY
+
+def last_assistant_message(state: ChatState) -> str:
+    return state.get("last_reply") or "Hello! How can I help you find a great hobby?"
+
+async def process_message(user_id: str, message: str, deadline_ms: Optional[str] = None) -> str:
+    # The deadline covers the whole turn; LangGraph runs the nodes in copies of this context
+    with deadline_scope(gateway.deadline(deadline_ms)):
+        # One turn at a time per thread; a second request for the same user waits for the first
+        async with session_lock(user_id):
+            try:
+                with span("session_lookup"):
+                    inputs = await graph_input(user_id, message)
+                result = await chat_graph.ainvoke(inputs, config=thread_config(user_id))
+                threads.put(user_id, await prune_checkpoints(user_id))
+                return last_assistant_message(result)
+            except Exception as e:
+                print(f"Error processing message: {e}")
+                record_error("process_message")
+                return error_reply(e)
+
+async def stream_message(user_id: str, message: str, deadline_ms: Optional[str] = None) -> AsyncIterator[dict]:
+    """Yield reply tokens from the current phase's node as they are generated, then a final "done" event."""
+    with deadline_scope(gateway.deadline(deadline_ms)):
+        async with session_lock(user_id):
+            async for event in _stream_message(user_id, message):
+                yield event
+
+async def _stream_message(user_id: str, message: str) -> AsyncIterator[dict]:
     try:
-        state = get_or_create_session(user_id)
-        if message.strip():
-            state = {
-                **state,
-                "messages": state["messages"] + [{"role": "user", "content": message}]
-            }
-
-        # Invoke graph with higher recursion limit
-        result = chat_graph.invoke(state, config={"recursion_limit": 50})
-        sessions[user_id] = result
-
-        assistant_msgs = [m for m in result["messages"] if m["role"] == "assistant"]
-        return assistant_msgs[-1]["content"] if assistant_msgs else "Hello! How can I help you find a great hobby?"
+        result, streamed = None, False
+        with span("session_lookup"):
+            inputs = await graph_input(user_id, message)
+        async for mode, chunk in chat_graph.astream(inputs, config=thread_config(user_id),
+                                                    stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            token, metadata = chunk
+            if REPLY_TAG in metadata.get("tags", []) and token.content:
+                streamed = True
+                yield {"type": "token", "text": token.content, "node": metadata.get("langgraph_node")}
+        threads.put(user_id, await prune_checkpoints(user_id))
+        if not streamed:
+            # A local reply (see generate) arrives whole, without LLM tokens
+            yield {"type": "token", "text": last_assistant_message(result), "node": None}
+
+        yield {
+            "type": "done",
+            "text": last_assistant_message(result),
+            "phase": result["phase"],
+            "suggested_hobbies": result["suggested_hobbies"]
+        }
     except Exception as e:
-        print(f"Error processing message: {e}")
-        return "I'm sorry, I encountered an error. Could you please try again?"
+        print(f"Error streaming message: {e}")
+        record_error("stream_message")
+        yield {"type": "error", "text": error_reply(e)}
 
 # --- FastAPI Endpoints ---
-app = FastAPI()
+@asynccontextmanager
+async def open_checkpointer(app: FastAPI):
+    global checkpointer, chat_graph
+    if os.getenv("SESSION_BACKEND") == "sqlite":
+        # Optional dependency: langgraph-checkpoint-sqlite (which brings aiosqlite)
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        conn = await aiosqlite.connect(os.getenv("SESSION_DB_PATH", "sessions.db"))
+        checkpointer = AsyncSqliteSaver(conn)
+        await checkpointer.setup()
+        chat_graph = create_chat_graph(checkpointer)
+        yield
+        await conn.close()
+    else:
+        yield
+
+app = FastAPI(lifespan=open_checkpointer)
 
 app.add_middleware(
     CORSMiddleware,
@@ -316,32 +498,73 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request latency histograms and the optional Server-Timing header (SERVER_TIMING=1)
+app.add_middleware(MetricsMiddleware)
+# gzip for JSON API responses above API_COMPRESSION_MIN_BYTES
+app.add_middleware(ApiCompressionMiddleware)
 
 @app.post("/api/chat")
 async def chat_endpoint(request: Request):
     try:
-        data = await request.json()
+        with span("parse"):
+            data = await request.json()
         user_id = data.get("user_id", "default")
         message = data.get("message", "")
-        response = process_message(user_id, message)
+        response = await process_message(user_id, message, request.headers.get("x-deadline-ms"))
         return JSONResponse({"type": "message", "text": response})
     except Exception as e:
         print(f"Error in chat_endpoint: {e}")
+        record_error("chat_endpoint")
         return JSONResponse(
             {"type": "error", "text": "Sorry, I encountered an error. Please try again."},
             status_code=500
         )
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: Request):
+    try:
+        with span("parse"):
+            data = await request.json()
+    except Exception as e:
+        print(f"Error in chat_stream_endpoint: {e}")
+        record_error("chat_stream_endpoint")
+        return JSONResponse(
+            {"type": "error", "text": "Sorry, I encountered an error. Please try again."},
+            status_code=400
+        )
+
+    user_id = data.get("user_id", "default")
+    message = data.get("message", "")
+    deadline_ms = request.headers.get("x-deadline-ms")
+
+    async def events():
+        async for event in stream_message(user_id, message, deadline_ms):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/chat/{user_id}")
+async def chat_socket(websocket: WebSocket, user_id: str):
+    state = (await chat_graph.aget_state(thread_config(user_id))).values if threads.peek(user_id) else {}
+    await serve_chat(websocket, lambda message: stream_message(user_id, message), {
+        "phase": state.get("phase", "greeting"),
+        "suggested_hobbies": state.get("suggested_hobbies", [])
+    })
+
 @app.get("/api/reset/{user_id}")
 async def reset_session(user_id: str):
-    if user_id in sessions:
-        del sessions[user_id]
+    threads.delete(user_id)
+    await checkpointer.adelete_thread(user_id)
     return JSONResponse({"status": "reset"})
 
 @app.get("/api/status/{user_id}")
 async def get_status(user_id: str):
-    if user_id in sessions:
-        session = sessions[user_id]
+    if threads.peek(user_id) is None:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+    snapshot = await chat_graph.aget_state(thread_config(user_id))
+    if snapshot.values:
+        session = snapshot.values
         return JSONResponse({
             "phase": session["phase"],
             "interests": session["interests"],
@@ -352,12 +575,40 @@ async def get_status(user_id: str):
         })
     return JSONResponse({"error": "Session not found"}, status_code=404)
 
+@app.get("/api/sessions/stats")
+async def session_stats():
+    return JSONResponse(threads.stats())
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return JSONResponse(extraction_cache.stats())
+
+@app.get("/api/extraction/stats")
+async def extraction_stats():
+    return JSONResponse(fast_extractor.stats())
+
+@app.get("/api/gateway/stats")
+async def gateway_stats():
+    return JSONResponse({**gateway.stats(), "degraded_turns": dict(degraded_turns)})
+
+@app.get("/api/routes")
+async def model_routes():
+    return JSONResponse({"routes": model_router.table(ROUTE_NAMES), "usage": route_stats()})
+
+@app.get("/api/catalogue/stats")
+async def catalogue_stats():
+    return JSONResponse(live_catalogue.stats())
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return JSONResponse({"status": "healthy"})
 
-# Serve frontend
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+# Serve frontend: committed .br/.gz variants (python static_assets.py), strong ETags, Cache-Control and 304s
+app.mount("/", PrecompressedStaticFiles(directory="static", html=True), name="static")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
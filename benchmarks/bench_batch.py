@@ -0,0 +1,95 @@
+"""Batch throughput vs concurrency limit for app.chat_batch.
+
+Builds a batch of scripted conversations, one user each, and runs it
+through chat_batch at several concurrency limits against the offline fake
+LLM (fixed latency). It checks that every user's turns completed in order
+and reports turns per second. The last run goes through POST
+/api/chat/batch with the in-process ASGI app, to check the NDJSON stream
+end to end.
+
+    python benchmarks/bench_batch.py --users 200 --latency 0.05 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def build_items(users: int, seed: int, tag: str):
+    from bench_load import conversation
+
+    rng = random.Random(seed)
+    scripts = {f"{tag}-{i}": conversation(rng) for i in range(users)}
+    # Interleave users, as an evaluation export would list them
+    items, turn = [], 0
+    while any(turn < len(script) for script in scripts.values()):
+        items += [(user_id, script[turn]) for user_id, script in scripts.items() if turn < len(script)]
+        turn += 1
+    return items
+
+
+def check_order(items, results):
+    # Per user, completion order must follow the order the items were given in
+    seen = {}
+    for result in results:
+        seen.setdefault(result["user_id"], []).append(result["index"])
+    assert all(indexes == sorted(indexes) for indexes in seen.values()), "turns completed out of order"
+    assert sorted(r["index"] for r in results) == list(range(len(items))), "missing results"
+    return sum(r["type"] == "error" for r in results)
+
+
+async def run_api(app, users: int, concurrency: int, seed: int):
+    items = build_items(users, seed, f"c{concurrency}")
+    start = time.perf_counter()
+    results = [result async for result in app.chat_batch(items, concurrency)]
+    elapsed = time.perf_counter() - start
+    errors = check_order(items, results)
+    print(f"concurrency {concurrency:4d}: {len(items)} turns in {elapsed:6.2f}s | "
+          f"{len(items) / elapsed:8.1f} turns/s | errors {errors}")
+
+
+async def run_http(app, users: int, concurrency: int, seed: int):
+    import httpx
+
+    items = build_items(users, seed, "http")
+    body = {"items": [{"user_id": u, "message": m} for u, m in items], "concurrency": concurrency}
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/api/chat/batch", json=body)
+        elapsed = time.perf_counter() - start
+    results = [json.loads(line) for line in response.text.splitlines()]
+    errors = check_order(items, results)
+    print(f"HTTP /api/chat/batch at {concurrency}: {len(results)} NDJSON lines, {response.headers['content-type']}, "
+          f"{len(items) / elapsed:8.1f} turns/s | errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", default="0.05", help="fake LLM latency spec, see fake_llm.LatencyModel")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.update(LLM_PROVIDER="fake", FAKE_LLM_LATENCY=args.latency, FAKE_LLM_SEED=str(args.seed),
+                      BATCH_CONCURRENCY=str(max(args.concurrency)))
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    import app
+
+    print(f"fake LLM latency {args.latency}, {args.users} users")
+    for concurrency in args.concurrency:
+        asyncio.run(run_api(app, args.users, concurrency, args.seed))
+    asyncio.run(run_http(app, args.users, max(args.concurrency), args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Load time, memory, filtered lookups and hot reload for a 50k-entry catalogue.
+
+Generates --size synthetic hobbies with random attributes, then compares:
+
+  dict + regex  the pre-catalogue path: the catalogue as a JSON dict, then
+                HobbyRanker(knowledge_base, attributes), which compiles HobbyMatcher's regex
+  .hcat         catalogue.load_catalogue: mmapped columns, inverted indexes,
+                PhraseMatcher and the ranker
+
+Memory is the Python heap the load leaves allocated (tracemalloc). The
+mmapped columns are page cache shared between processes and aren't counted
+there, so the file size is listed alongside. Filtered lookups compare
+Catalogue.filter with a scan over all entries, and the suggestion path's
+top-3 ranking is timed alongside. The hot reload test rewrites
+the file while a loop keeps calling current_catalogue(), and reports the
+slowest call and how long the new catalogue took to appear.
+
+    python benchmarks/bench_catalogue.py --size 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_hobby_matcher import synthetic_catalogue
+import catalogue
+from hobbies import ATTRIBUTE_NAMES
+from hobby_ranking import HobbyRanker
+
+
+def entries_for(size: int, seed: int):
+    rng = random.Random(seed)
+    return [{"name": hobby, "category": category, **{a: round(rng.random(), 2) for a in ATTRIBUTE_NAMES}}
+            for category, hobbies in synthetic_catalogue(size).items() for hobby in hobbies]
+
+
+def measure(load):
+    # Timed without tracemalloc, which slows allocation-heavy code severalfold; then loaded again for memory
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def load_dict(path: str):
+    with open(path) as f:
+        entries = json.load(f)
+    knowledge_base, attributes = {}, {}
+    for e in entries:
+        knowledge_base.setdefault(e["category"], []).append(e["name"])
+        attributes[e["name"]] = tuple(e[a] for a in ATTRIBUTE_NAMES)
+    return entries, HobbyRanker(knowledge_base, attributes)
+
+
+def level(value: float) -> str:
+    return catalogue.LEVELS[min(int(round(value * 255)) // 86, 2)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = entries_for(args.size, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, hcat_path = os.path.join(tmp, "hobbies.json"), os.path.join(tmp, "hobbies.hcat")
+        with open(json_path, "w") as f:
+            json.dump(entries, f)
+        catalogue.write_catalogue(hcat_path, entries)
+        print(f"{len(entries)} hobbies | JSON {os.path.getsize(json_path) / 1e6:.2f} MB | "
+              f".hcat {os.path.getsize(hcat_path) / 1e6:.2f} MB")
+
+        (dict_entries, _), seconds, memory = measure(lambda: load_dict(json_path))
+        print(f"{'dict + regex':>13}: load {seconds:6.2f} s | heap {memory / 1e6:6.1f} MB")
+        loaded, seconds, memory = measure(lambda: catalogue.load_catalogue(hcat_path))
+        print(f"{'.hcat':>13}: load {seconds:6.2f} s | heap {memory / 1e6:6.1f} MB")
+
+        query = {"category": "outdoors", "noise": "low", "outdoor": "indoor", "cost": "low"}
+        expected = [e["name"] for e in dict_entries if e["category"] == "outdoors" and level(e["noise"]) == "low"
+                    and level(e["outdoor"]) == "low" and level(e["cost"]) == "low"]
+        assert loaded.filter(**query) == expected
+        scan = timeit.timeit(lambda: [e["name"] for e in dict_entries if e["category"] == "outdoors"
+                                      and level(e["noise"]) == "low" and level(e["outdoor"]) == "low"
+                                      and level(e["cost"]) == "low"], number=5) / 5
+        indexed = timeit.timeit(lambda: loaded.filter(**query), number=200) / 200
+        single = timeit.timeit(lambda: loaded.filter(category="music"), number=200) / 200
+        print(f"filter {query}: {len(expected)} hits | scan {scan * 1e3:7.2f} ms | "
+              f"indexed {indexed * 1e3:6.3f} ms | category only {single * 1e3:6.3f} ms")
+        profile = (["nature", "art"], ["loud", "expensive"], {"energy": "low", "social": "solo"})
+        ranked = timeit.timeit(lambda: loaded.ranker.rank(*profile, k=3), number=50) / 50
+        print(f"rank top 3 for {profile}: {ranked * 1e3:6.2f} ms")
+
+        live = catalogue.LiveCatalogue(hcat_path, check_seconds=0.0)
+        catalogue.write_catalogue(hcat_path, entries + [{"name": "competitive kite flying", "category": "outdoors"}])
+        start, slowest = time.perf_counter(), 0.0
+        while len(live.get()) == len(entries):
+            call = time.perf_counter()
+            live.get()
+            slowest = max(slowest, time.perf_counter() - call)
+            time.sleep(0.001)
+        print(f"hot reload: new catalogue live after {time.perf_counter() - start:.2f} s | "
+              f"slowest current_catalogue() meanwhile {slowest * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cold-start time to first byte for the serverless entry point (api/index.py).
+
+Each sample is a fresh Python process that imports api.index and sends one
+request through the Mangum handler, the way a Vercel cold start does. It
+reports the import time and the time to the response for /api/status/{id} and
+for the static index, in eager mode (LAZY_INIT=0, the old behaviour) and in
+lazy mode (LAZY_INIT=1, the api/index.py default). Lazy mode also reports
+what warm_up() costs when it runs later. The end of the output is an
+import-time profile from `python -X importtime` listing the most expensive
+top-level imports in each mode.
+
+    python benchmarks/bench_cold_start.py --samples 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import time
+start = time.perf_counter()
+import json, sys
+sys.path.insert(0, ".")
+from api.index import handler
+imported = time.perf_counter()
+event = {
+    "version": "2.0", "routeKey": "$default", "rawPath": PATH, "rawQueryString": "",
+    "headers": {"host": "bench", "accept-encoding": "identity"}, "isBase64Encoded": False,
+    "requestContext": {"http": {"method": "GET", "path": PATH, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+                       "stage": "$default"},
+}
+response = handler(event, {})
+responded = time.perf_counter()
+import app
+warm_up = app.warm_up()
+print(json.dumps({"import": imported - start, "first_byte": responded - start, "status": response["statusCode"],
+                  "warm_up": warm_up}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def env_for(lazy: bool) -> dict:
+    env = dict(os.environ, LAZY_INIT="1" if lazy else "0")
+    env.setdefault("OPENAI_API_KEY", "sk-offline")
+    return env
+
+
+def probe(lazy: bool, path: str) -> dict:
+    code = PROBE.replace("PATH", repr(path))
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env_for(lazy), check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def interpreter_startup(samples: int) -> float:
+    times = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def import_profile(lazy: bool, top: int):
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.index"], cwd=ROOT,
+                            env=env_for(lazy), check=True, capture_output=True, text=True).stderr
+    # Per top-level package: total self time of all its modules, and its slowest single import with dependencies
+    own, first = {}, {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            package = match.group(4).split(".")[0]
+            own[package] = own.get(package, 0) + int(match.group(1))
+            first[package] = max(first.get(package, 0), int(match.group(2)))
+    total = first.get("api", sum(own.values()))
+    print(f"\nimport profile, LAZY_INIT={int(lazy)}: import api.index takes {total / 1e3:.0f} ms")
+    for package in sorted(own, key=own.get, reverse=True)[:top]:
+        print(f"  {own[package] / 1e3:8.1f} ms own {first[package] / 1e3:8.1f} ms slowest import  {package}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    startup = interpreter_startup(args.samples)
+    print(f"interpreter start-up (python -c pass): {startup * 1e3:.0f} ms, included in 'cold TTFB'")
+    for lazy in (False, True):
+        for path in ("/api/status/bench", "/"):
+            samples = [probe(lazy, path) for _ in range(args.samples)]
+            median = {key: statistics.median(s[key] for s in samples) for key in ("import", "first_byte", "warm_up")}
+            print(f"LAZY_INIT={int(lazy)} {path:<18} status {samples[0]['status']} | "
+                  f"import {median['import'] * 1e3:6.0f} ms | first byte {median['first_byte'] * 1e3:6.0f} ms | "
+                  f"cold TTFB {(startup + median['first_byte']) * 1e3:6.0f} ms | "
+                  f"deferred warm_up {median['warm_up'] * 1e3:6.0f} ms")
+
+    for lazy in (False, True):
+        import_profile(lazy, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Concurrency check for /api/chat.
+
+Fires N simultaneous chat turns (one per user) against each backend with the
+offline fake LLM and compares the wall time with a single turn. With the async
+path, N turns should take roughly as long as one; the run fails if the ratio
+is above --max-ratio.
+
+Every turn must do the same LLM work, so each user sends a different message
+and the extraction cache and fast extraction path are off: otherwise the
+concurrent turns would hit the cache the solo turn filled and skip a call.
+
+    python benchmarks/bench_concurrency.py --users 20 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import httpx
+
+from fake_llm import FakeChatModel
+
+
+def load_backend(name: str, latency: float):
+    fake = FakeChatModel(latency=latency)
+    if name == "app":
+        import app as module
+        module.llm = fake
+        module.mentor = module.HobbyMentor()
+    else:
+        import app_LangGraph_workflow as module
+        module.llm = fake
+        module.chains = module.PhaseChains()
+    return module
+
+
+def message_for(user_id: str) -> str:
+    return f"I love nature and art, and {user_id} likes puzzles"
+
+
+async def run_turns(client: httpx.AsyncClient, user_ids, opening: bool = False) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/api/chat", json={"user_id": uid, "message": "" if opening else message_for(uid)})
+        for uid in user_ids
+    ])
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    return elapsed
+
+
+async def bench(name: str, users: int, latency: float) -> float:
+    module = load_backend(name, latency)
+    transport = httpx.ASGITransport(app=module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Open every session first so the measured turn hits the LLM.
+        await run_turns(client, [f"{name}-solo"] + [f"{name}-{i}" for i in range(users)], opening=True)
+        calls = module.llm.calls
+        single = await run_turns(client, [f"{name}-solo"])
+        solo_calls, calls = module.llm.calls - calls, module.llm.calls
+        many = await run_turns(client, [f"{name}-{i}" for i in range(users)])
+        many_calls = module.llm.calls - calls
+    print(f"{name:>10}: 1 turn {single:.3f}s ({solo_calls} LLM calls) | {users} concurrent turns {many:.3f}s "
+          f"({many_calls / users:.1f} LLM calls each) | ratio {many / single:.2f}x (serial would be {users}x)")
+    assert many_calls == solo_calls * users, "concurrent turns did different LLM work from the solo turn"
+    return many / single
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--backend", choices=["app", "langgraph", "both"], default="both")
+    parser.add_argument("--max-ratio", type=float, default=1.5)
+    args = parser.parse_args()
+
+    # Set here, not at import: bench_streaming imports load_backend from this module
+    os.environ.update(EXTRACTION_CACHE_SIZE="0", FAST_EXTRACTION_THRESHOLD="")
+    backends = ["app", "langgraph"] if args.backend == "both" else [args.backend]
+    for name in backends:
+        ratio = asyncio.run(bench(name, args.users, args.latency))
+        assert ratio <= args.max_ratio, f"{name}: {args.users} concurrent turns took {ratio:.2f}x one turn"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Prompt size and per-turn latency vs conversation length in app.py.
+
+Runs sessions of 10 to 500 turns through generate_response with the offline
+fake LLM and measures the conversation prompt at the last turn, in tokens.
+It also reports the local time per turn, averaged over the last ten turns.
+"budget" is the token-budgeted window plus rolling summary.
+"unbounded" puts the whole history in the prompt, which is what the window
+guards against. Background summary updates finish between turns, as they
+would while the user types, and are not counted in the turn time.
+
+    python benchmarks/bench_context_window.py --turns 10 50 100 250 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", FAKE_LLM_LATENCY="0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from context_budget import count_tokens
+
+OPENERS = ["I love being in nature and doing art", "I really dislike loud environments",
+           "I have a bit of time in the evenings, and prefer being on my own"]
+FOLLOW_UPS = ["Another one?", "Tell me more about that, I'm curious how I would get started and what it costs",
+              "Hmm, I tried something like that years ago with my sister and we both gave up after a month "
+              "because it got boring, so maybe something with more variety?", "thanks!", "something different",
+              "What equipment would I need for that one, and is it okay to do it alone at home in a small flat?"]
+
+
+def prompt_tokens(session: app.UserSession, message: str) -> int:
+    inputs = app.conversation_inputs(session, message)
+    return count_tokens(app.get_mentor().conversation_prompt.format(**inputs))
+
+
+async def run_session(turns: int, mode: str, seed: int):
+    rng = random.Random(seed)
+    user_id = f"{mode}-{turns}"
+    app.sessions.delete(user_id)
+    session = app.get_session(user_id)
+    await app.generate_response(session, "")
+    times = []
+    for turn in range(turns):
+        message = OPENERS[turn] if turn < len(OPENERS) else rng.choice(FOLLOW_UPS)
+        start = time.perf_counter()
+        await app.generate_response(session, message)
+        app.save_session(session)
+        times.append(time.perf_counter() - start)
+        # The background summary update lands between turns
+        await asyncio.gather(*app.background_tasks)
+    probe = rng.choice(FOLLOW_UPS)
+    last = times[-10:]
+    return prompt_tokens(session, probe), sum(last) / len(last), len(session.conversation_history)
+
+
+async def main_async(turn_counts, seed: int):
+    modes = {"budget": (app.HISTORY_TOKEN_BUDGET, app.SUMMARY_TOKEN_BUDGET), "unbounded": (10 ** 9, 0)}
+    fake = app.get_llm()
+    print(f"HISTORY_TOKEN_BUDGET {app.HISTORY_TOKEN_BUDGET}, SUMMARY_TOKEN_BUDGET {app.SUMMARY_TOKEN_BUDGET}")
+    for mode, (history_budget, summary_budget) in modes.items():
+        app.HISTORY_TOKEN_BUDGET, app.SUMMARY_TOKEN_BUDGET = history_budget, summary_budget
+        for turns in turn_counts:
+            calls = fake.calls
+            tokens, turn_time, window = await run_session(turns, mode, seed)
+            print(f"{mode:>9} {turns:4d} turns: prompt {tokens:6d} tokens | {turn_time * 1e3:6.2f} ms/turn local | "
+                  f"{window:4d} messages verbatim | {(fake.calls - calls) / turns:.2f} LLM calls/turn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100, 250, 500])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.turns, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Turn latency with a slow, long-tailed LLM, with and without deadline mode.
+
+1. Deadlines. --conversations scripted conversations (bench_load's scripts)
+   run --concurrency at a time, and the fake LLM's latency per call is drawn
+   from --latency (default: 0.8 s median, long tail). The first run has no
+   deadline; then one run per value in --deadlines (LLM_TURN_DEADLINE).
+   Reports p50/p95/p99/max turn latency and the share of turns answered
+   locally.
+2. Overload. --burst users start a conversation at once, while the gateway
+   only lets --provider-limit calls through at a time. This runs with load
+   shedding off, then with LLM_SHED_QUEUE_DEPTH=--shed-depth, then with
+   shedding plus the longest of --deadlines. Reports turn latency and how
+   many turns were shed.
+
+Turns run through the backend's own entry point (app.run_turn or
+app_LangGraph_workflow.process_message), which sets the turn's deadline.
+
+    python benchmarks/bench_deadline.py --conversations 200 --concurrency 50 --deadlines 4 2 1
+    python benchmarks/bench_deadline.py --backend langgraph
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", TOKEN_COUNTER="estimate")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from bench_load import conversation, load_backend
+from fake_llm import LatencyModel
+from llm_gateway import LLMGateway
+
+
+def percentile(values, q: float) -> float:
+    return statistics.quantiles(values, n=100)[int(q) - 1] if len(values) > 1 else values[0]
+
+
+async def run(module, label: str, gateway: LLMGateway, scripts, concurrency: int):
+    module.gateway = gateway
+    module.degraded_turns.clear()
+    turn = module.run_turn if hasattr(module, "run_turn") else module.process_message
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def converse(user_id: str, messages):
+        async with semaphore:
+            for message in messages:
+                start = time.perf_counter()
+                await turn(user_id, message)
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[converse(f"{label}-{i}", messages) for i, messages in enumerate(scripts)])
+    elapsed = time.perf_counter() - start
+    degraded = sum(module.degraded_turns.values())
+    reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(module.degraded_turns.items())) or "-"
+    print(f"{label:>22}: {len(latencies)} turns in {elapsed:6.2f}s | p50 {percentile(latencies, 50):5.2f}s "
+          f"p95 {percentile(latencies, 95):5.2f}s p99 {percentile(latencies, 99):5.2f}s max {max(latencies):5.2f}s | "
+          f"local replies {degraded / len(latencies):6.1%} ({reasons})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="app", choices=["app", "langgraph"])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", default="lognormal:0.8,0.9", help="fake LLM latency spec, see fake_llm.LatencyModel")
+    parser.add_argument("--deadlines", type=float, nargs="+", default=[4.0, 2.0, 1.0])
+    parser.add_argument("--burst", type=int, default=400)
+    parser.add_argument("--provider-limit", type=int, default=16)
+    parser.add_argument("--shed-depth", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    module, fake = load_backend(args.backend)
+    if hasattr(module, "extraction_cache"):
+        module.extraction_cache.max_entries = 0
+    rng = random.Random(args.seed)
+    scripts = [conversation(rng) for _ in range(args.conversations)]
+
+    print(f"{args.backend}: fake LLM latency {args.latency}, {args.conversations} conversations, "
+          f"{args.concurrency} at a time")
+    runs = [("no deadline", LLMGateway(turn_deadline=0))]
+    runs += [(f"deadline {seconds:g}s", LLMGateway(turn_deadline=seconds)) for seconds in args.deadlines]
+    for label, gateway in runs:
+        fake.latency_model = LatencyModel(args.latency, seed=args.seed)
+        asyncio.run(run(module, label, gateway, scripts, args.concurrency))
+
+    burst = [conversation(rng)[:2] for _ in range(args.burst)]
+    print(f"\noverload: {args.burst} users at once, {args.provider_limit} LLM calls in flight at most")
+    deadline = max(args.deadlines)
+    for label, depth, seconds in (("no shedding", 0, 0), (f"shed at queue {args.shed_depth}", args.shed_depth, 0),
+                                  (f"shed + deadline {deadline:g}s", args.shed_depth, deadline)):
+        fake.latency_model = LatencyModel(args.latency, seed=args.seed)
+        gateway = LLMGateway(max_concurrency=args.provider_limit, turn_deadline=seconds, shed_queue_depth=depth)
+        asyncio.run(run(module, label, gateway, burst, args.burst))
+
+
+if __name__ == "__main__":
+    main()
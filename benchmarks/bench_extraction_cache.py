@@ -0,0 +1,85 @@
+"""Extraction cache hit rate and LLM calls saved in app.py.
+
+Replays many conversations built from a small pool of common replies (the
+short answers real users repeat) through generate_response with the offline
+fake LLM, once with the cache disabled and once enabled. A second pass with
+the disk tier shows hits surviving a restart.
+
+    python benchmarks/bench_extraction_cache.py --conversations 200 --latency 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from extraction_cache import ExtractionCache
+
+from fake_llm import FakeChatModel
+
+INTERESTS = ["I love nature and art", "I like music", "music!", "I enjoy reading", "Tech and coding",
+             "I like being outdoors", "I love nature and art."]
+DISLIKES = ["I hate loud places", "crowds", "Nothing really", "I dislike sports", "I hate loud places!"]
+LIFESTYLE = ["I have little time", "not much time, I prefer being alone", "Lots of free time, love people",
+             "evenings only", "I have little time."]
+FOLLOW_UPS = ["another one", "Another one?", "yes", "more please", "sounds good"]
+
+
+def conversation(rng: random.Random):
+    return ["", rng.choice(INTERESTS), rng.choice(DISLIKES), rng.choice(LIFESTYLE),
+            rng.choice(FOLLOW_UPS), rng.choice(FOLLOW_UPS)]
+
+
+async def replay(label: str, cache: ExtractionCache, conversations: int, latency: float, seed: int = 0):
+    fake = FakeChatModel(latency=latency)
+    app.llm = fake
+    app.mentor = app.HobbyMentor()
+    app.RESPONSE_MODE = "two_chain"
+    app.extraction_cache = cache
+
+    rng = random.Random(seed)
+    turns = 0
+    start = time.perf_counter()
+    for i in range(conversations):
+        session = app.UserSession(f"{label}-{i}")
+        for message in conversation(rng):
+            await app.generate_response(session, message)
+            turns += 1
+    elapsed = time.perf_counter() - start
+
+    stats = cache.stats()
+    print(f"{label:>16}: {fake.calls / turns:.2f} LLM calls/turn | hit rate {stats['hit_rate']:.1%} "
+          f"(memory {stats['hits']}, disk {stats['disk_hits']}, misses {stats['misses']}) | "
+          f"{elapsed / turns * 1000:6.1f} ms/turn")
+    return fake.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    uncached = asyncio.run(replay("no cache", ExtractionCache("bench", max_entries=0), args.conversations, args.latency))
+    cached = asyncio.run(replay("memory cache", ExtractionCache("bench"), args.conversations, args.latency))
+    print(f"LLM calls saved: {uncached - cached} of {uncached} ({(uncached - cached) / uncached:.1%})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "extraction_cache.db")
+        asyncio.run(replay("disk, first run", ExtractionCache("bench", disk_path=path), args.conversations,
+                           args.latency))
+        # A fresh process: empty memory tier, warm disk tier
+        asyncio.run(replay("disk, restarted", ExtractionCache("bench", disk_path=path), args.conversations,
+                           args.latency, seed=1))
+
+
+if __name__ == "__main__":
+    main()
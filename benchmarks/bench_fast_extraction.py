@@ -0,0 +1,82 @@
+"""Agreement of the rule-based fast path with the LLM extraction.
+
+benchmarks/extraction_corpus.jsonl holds labelled lifestyle and suggesting
+phase replies; each label is the LLM-path extraction for that message. For a
+range of thresholds this reports how many replies take the fast path and how
+often the fast-path result agrees with the label (every key the fast path
+returns must match). With --live the labels are replaced by fresh calls to
+app.py's extraction chain, which needs OPENAI_API_KEY.
+
+    python benchmarks/bench_fast_extraction.py
+    python benchmarks/bench_fast_extraction.py --live
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fast_extraction import FastExtractor
+
+CORPUS = os.path.join(ROOT, "benchmarks", "extraction_corpus.jsonl")
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def agrees(fast: dict, expected: dict) -> bool:
+    if "intent" in fast:
+        return fast["intent"] == expected.get("intent")
+    reference = expected.get("lifestyle") or {}
+    return all(reference.get(key) == value for key, value in fast["lifestyle"].items())
+
+
+async def live_labels(corpus):
+    import app
+    return await asyncio.gather(*[
+        app.get_mentor().extraction_chain.ainvoke({"phase": case["phase"], "user_message": case["message"]})
+        for case in corpus
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", action="store_true", help="label the corpus with the real LLM extraction")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if args.live:
+        for case, label in zip(corpus, asyncio.run(live_labels(corpus))):
+            case["expected"] = label
+
+    extractor = FastExtractor()
+    start = time.perf_counter()
+    guesses = [extractor.classify(case["phase"], case["message"]) for case in corpus]
+    per_call = (time.perf_counter() - start) / len(corpus)
+    print(f"{len(corpus)} labelled replies | {per_call * 1e6:.0f} us per fast-path classification")
+
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.9, 1.0):
+        for phase in ("lifestyle", "suggesting"):
+            decided = [(guess, case) for (guess, confidence), case in zip(guesses, corpus)
+                       if case["phase"] == phase and guess is not None and confidence >= threshold]
+            total = sum(case["phase"] == phase for case in corpus)
+            agreed = sum(agrees(guess, case["expected"]) for guess, case in decided)
+            agreement = agreed / len(decided) if decided else 1.0
+            print(f"threshold {threshold:.1f} {phase:>10}: fast path {len(decided):3d}/{total} "
+                  f"({len(decided) / total:5.1%}) | agreement {agreement:6.1%}")
+
+    disagreements = [(case, guess) for (guess, confidence), case in zip(guesses, corpus)
+                     if guess is not None and confidence >= extractor.threshold and not agrees(guess, case["expected"])]
+    for case, guess in disagreements:
+        print(f"  disagrees at default threshold: {case['message']!r} -> {guess}, expected {case['expected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Latency and token comparison of the two-chain and fused turn modes in app.py.
+
+Plays the same scripted conversation through generate_response in each mode
+with the offline fake LLM and reports LLM calls, tokens and wall time per turn.
+
+    python benchmarks/bench_fused_mode.py --conversations 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+
+from fake_llm import FakeChatModel
+
+SCRIPT = [
+    "",
+    "I love being in nature and doing art",
+    "I really dislike loud environments",
+    "I have a bit of time in the evenings, and prefer being on my own",
+    "Sounds great, another one please",
+    "Another one?",
+]
+
+
+async def run_mode(mode: str, conversations: int, latency: float):
+    fake = FakeChatModel(latency=latency)
+    app.llm = fake
+    app.mentor = app.HobbyMentor()
+    app.RESPONSE_MODE = mode
+
+    turns = 0
+    start = time.perf_counter()
+    for i in range(conversations):
+        session = app.UserSession(f"{mode}-{i}")
+        for message in SCRIPT:
+            await app.generate_response(session, message)
+            turns += 1
+        assert session.phase == "suggesting", session.phase
+    elapsed = time.perf_counter() - start
+
+    print(f"{mode:>9}: {fake.calls / turns:.2f} LLM calls/turn | "
+          f"{fake.prompt_tokens / turns:7.1f} prompt + {fake.completion_tokens / turns:5.1f} completion tokens/turn | "
+          f"{elapsed / turns * 1000:6.1f} ms/turn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for mode in ("two_chain", "fused"):
+        asyncio.run(run_mode(mode, args.conversations, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""LLM gateway behaviour in app.py under a rate-limited provider.
+
+1. Provider 429s. The fake LLM rejects calls beyond --provider-limit in
+   flight, with a retry-after. A batch of conversations runs at
+   --concurrency three ways: no gateway protection (no retries, no cap),
+   retries only, and retries plus a concurrency cap at the provider limit.
+   The report counts turns answered with a local reply because the LLM was
+   unavailable, provider rejections and throughput.
+2. Requests-per-minute bucket: the achieved call rate against LLM_RPM.
+3. Same-user race: --burst concurrent /api/chat requests for one user, with
+   and without session_lock. Without the lock, turns interleave in the
+   history and several turns extract against the same phase.
+
+    python benchmarks/bench_gateway.py --users 100 --concurrency 64 --provider-limit 8
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from bench_load import conversation
+from llm_gateway import LLMGateway
+
+
+async def run_batch(label: str, gateway: LLMGateway, users: int, concurrency: int, seed: int):
+    app.gateway = gateway
+    app.degraded_turns.clear()
+    fake = app.get_llm()
+    rejected = fake.rejected
+    rng = random.Random(seed)
+    items = [(f"{label}-{i}", message) for i in range(users) for message in conversation(rng)]
+    start = time.perf_counter()
+    results = [result async for result in app.chat_batch(items, concurrency)]
+    elapsed = time.perf_counter() - start
+    local = sum(app.degraded_turns.values())
+    stats = gateway.stats()
+    print(f"{label:>14}: {len(results)} turns in {elapsed:5.2f}s | {len(results) / elapsed:6.1f} turns/s | "
+          f"local replies {local:4d} | provider 429s {fake.rejected - rejected:5d} | retries {stats['retries']:5d} | "
+          f"avg queue wait {stats['avg_wait_ms']:6.1f} ms")
+
+
+async def run_rpm(rpm: int, calls: int):
+    app.gateway = gateway = LLMGateway(rpm=rpm)
+    chain = app.get_mentor().conversation_chain
+    inputs = app.conversation_inputs(app.UserSession("rpm"), "hi")
+    # The bucket starts full (a minute's worth), so drain it before timing the steady rate
+    gateway.requests.tokens = 0
+    start = time.perf_counter()
+    await asyncio.gather(*[gateway.ainvoke(chain, inputs) for _ in range(calls)])
+    elapsed = time.perf_counter() - start
+    print(f"LLM_RPM {rpm}: {calls} calls in {elapsed:.2f}s = {calls / elapsed * 60:.0f} per minute")
+
+
+async def run_race(burst: int, locked: bool):
+    import httpx
+
+    user_id = f"race-{locked}"
+    real_lock = app.session_lock
+    if not locked:
+        app.session_lock = lambda user_id: contextlib.nullcontext()
+    app.gateway = LLMGateway()
+    messages = ["", "I love nature and art", "I hate crowds", "I have some time in the evenings, prefer solo"]
+    messages += [f"Another one please ({i})" for i in range(burst - len(messages))]
+    try:
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await asyncio.gather(*[client.post("/api/chat", json={"user_id": user_id, "message": m})
+                                   for m in messages])
+    finally:
+        app.session_lock = real_lock
+    session = app.sessions.peek(user_id)
+    # Serialized turns alternate user / assistant; interleaved ones put two of a role side by side
+    roles = [m["role"] for m in session.conversation_history]
+    interleaved = sum(a == b for a, b in zip(roles, roles[1:]))
+    print(f"{'with' if locked else 'without':>7} session_lock: {len(messages)} concurrent requests -> "
+          f"{interleaved} interleaved history entries, phase {session.phase} "
+          f"(serialized turns reach suggesting)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--provider-limit", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = app.get_llm()
+    fake.latency_model = None
+    fake.latency = args.latency
+    fake.max_concurrent = args.provider_limit
+    fake.retry_after = 0.02
+    app.extraction_cache.max_entries = 0
+
+    print(f"fake LLM: {args.latency * 1000:.0f} ms, at most {args.provider_limit} calls in flight")
+    scenarios = [
+        ("unprotected", LLMGateway(max_concurrency=10 ** 6, max_retries=0, breaker_threshold=10 ** 9)),
+        ("retries only", LLMGateway(max_concurrency=10 ** 6, backoff_base=0.05, breaker_threshold=10 ** 9)),
+        ("retries + cap", LLMGateway(max_concurrency=args.provider_limit, backoff_base=0.05)),
+    ]
+    for label, gateway in scenarios:
+        asyncio.run(run_batch(label, gateway, args.users, args.concurrency, args.seed))
+
+    fake.max_concurrent = None
+    fake.latency = 0.0
+    asyncio.run(run_rpm(args.rpm, max(1, args.rpm // 60 * 2)))
+
+    fake.latency = args.latency
+    for locked in (False, True):
+        asyncio.run(run_race(args.burst, locked))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""LLM calls per /api/chat request for the LangGraph backend, before and after
+per-turn execution.
+
+"before" re-creates the old graph, where the router always ran on to the next
+phase and each request ran the whole graph from the entry point. "after" is
+the current checkpointed graph, which runs one phase node per request.
+
+    python benchmarks/bench_graph_calls.py
+"""
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from langgraph.graph import StateGraph, END
+
+import app_LangGraph_workflow as workflow
+from fake_llm import FakeChatModel
+
+SCRIPT = [
+    "",
+    "I love being in nature and doing art",
+    "I really dislike loud environments",
+    "I have a bit of time in the evenings, and prefer being on my own",
+    "Sounds great, another one please",
+    "Another one?",
+]
+
+
+def legacy_route(state):
+    phase = state.get("phase", "start")
+    if phase == "suggesting":
+        return END if state.get("num_suggestions", 0) >= 3 else "suggesting"
+    return {"start": "interests", "interests": "dislikes", "dislikes": "lifestyle", "lifestyle": "suggesting"}.get(phase, END)
+
+
+def legacy_graph():
+    graph = StateGraph(workflow.ChatState)
+    for name in workflow.PHASE_NODES:
+        graph.add_node(name, getattr(workflow, "suggestion_node" if name == "suggesting" else f"{name}_node"))
+        graph.add_conditional_edges(name, legacy_route)
+    graph.set_entry_point("start")
+    return graph.compile()
+
+
+async def legacy_turns(fake: FakeChatModel):
+    graph, state, calls = legacy_graph(), workflow.new_session("legacy"), []
+    for message in SCRIPT:
+        if message:
+            state = {**state, "messages": state["messages"] + [{"role": "user", "content": message}]}
+        before = fake.calls
+        state = await graph.ainvoke(state, config={"recursion_limit": 50})
+        calls.append(fake.calls - before)
+    return calls
+
+
+async def checkpointed_turns(fake: FakeChatModel):
+    calls = []
+    for message in SCRIPT:
+        before = fake.calls
+        await workflow.process_message("checkpointed", message)
+        calls.append(fake.calls - before)
+    return calls
+
+
+def main():
+    fake = FakeChatModel(latency=0)
+    workflow.llm = fake
+    workflow.chains = workflow.PhaseChains()
+    for label, run in (("before", legacy_turns), ("after", checkpointed_turns)):
+        calls = asyncio.run(run(fake))
+        print(f"{label:>6}: LLM calls per request {calls} | total {sum(calls)} | max {max(calls)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Per-node overhead of the LangGraph backend at 10, 100 and 1000 messages of history.
+
+"before" re-creates the old suggestion node, which rebuilt its prompt | llm |
+parser chain on every call, returned a full copy of the state with the message
+list re-concatenated, and scanned every message for the latest reply. "after"
+is the current node: chains built once, a partial update appended by the
+messages reducer, and the reply read from last_reply. The fake LLM answers
+instantly, so the times are framework and state-handling overhead only.
+The last column is a whole /api/chat turn through the checkpointed graph.
+
+    python benchmarks/bench_graph_nodes.py --repeat 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+import app_LangGraph_workflow as workflow
+from fake_llm import FakeChatModel
+
+SIZES = (10, 100, 1000)
+
+
+def suggesting_state(size: int) -> dict:
+    state = workflow.new_session("bench")
+    roles = ("user", "assistant")
+    state.update({
+        "messages": [{"role": roles[i % 2], "content": f"message {i} " + "about hobbies " * 8} for i in range(size)],
+        "interests": ["nature", "art"], "dislikes": ["loud environments"],
+        "lifestyle": {"energy": "medium", "time": "some", "social": "solo"},
+        "suggested_hobbies": ["pottery"], "phase": "suggesting", "last_reply": "message",
+    })
+    return state
+
+
+async def legacy_suggestion_node(state: dict) -> dict:
+    chain = ChatPromptTemplate.from_template(workflow.SUGGESTION_PROMPT) | workflow.llm | StrOutputParser()
+    response = await chain.ainvoke({
+        "interests": state["interests"], "dislikes": state["dislikes"], "lifestyle": state["lifestyle"],
+        "suggested_hobbies": state["suggested_hobbies"], "candidate_hobbies": "painting, reading, journaling",
+    })
+    return {**state, "messages": state["messages"] + [{"role": "assistant", "content": response}],
+            "num_suggestions": state["num_suggestions"] + 1}
+
+
+def legacy_last_reply(state: dict) -> str:
+    assistant_msgs = [m for m in state["messages"] if m["role"] == "assistant"]
+    return assistant_msgs[-1]["content"]
+
+
+async def time_node(node, read_reply, state: dict, repeat: int) -> float:
+    read_reply(await node(state))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read_reply(await node(state))
+    return (time.perf_counter() - start) / repeat
+
+
+async def time_graph_turn(size: int, repeat: int) -> float:
+    # Grow a real thread to the target size, then time further suggestion turns
+    user_id = f"graph-{size}"
+    await workflow.process_message(user_id, "")
+    for message in ("nature and art", "loud places", "I have little time and prefer being alone"):
+        await workflow.process_message(user_id, message)
+    while len((await workflow.chat_graph.aget_state(workflow.thread_config(user_id))).values["messages"]) < size:
+        await workflow.process_message(user_id, "another one")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await workflow.process_message(user_id, "another one")
+    return (time.perf_counter() - start) / repeat
+
+
+async def main_async(repeat: int):
+    workflow.llm = FakeChatModel(latency=0)
+    workflow.chains = workflow.PhaseChains()
+    print(f"{'messages':>8} | {'before node':>11} | {'after node':>10} | {'speedup':>7} | {'after graph turn':>16}")
+    for size in SIZES:
+        state = suggesting_state(size)
+        before = await time_node(legacy_suggestion_node, legacy_last_reply, state, repeat)
+        after = await time_node(workflow.suggestion_node, workflow.last_assistant_message, state, repeat)
+        turn = await time_graph_turn(size, max(1, repeat // 10))
+        print(f"{size:>8} | {before * 1e3:8.3f} ms | {after * 1e3:7.3f} ms | {before / after:6.2f}x | "
+              f"{turn * 1e3:13.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
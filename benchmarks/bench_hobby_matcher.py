@@ -0,0 +1,64 @@
+"""Microbenchmark: compiled HobbyMatcher vs the original nested substring loop.
+
+Times hobby detection on a typical suggestion reply against the built-in
+catalogue and against synthetic catalogues of growing size.
+
+    python benchmarks/bench_hobby_matcher.py
+"""
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hobbies import HOBBY_KNOWLEDGE_BASE, HobbyMatcher
+
+REPLY = ("Since you love quiet time outdoors and have a creative streak, how about bird watching? "
+         "It pairs nicely with photography or sketching, and you can do it on your own at your own pace. "
+         "Would you like to hear more about getting started, or should I suggest something else?")
+
+WORDS = ("amateur", "urban", "miniature", "vintage", "competitive", "digital", "wild", "ceramic", "glass",
+         "model", "paper", "garden", "kite", "rope", "stone", "wood", "sound", "film", "night", "river")
+SYLLABLES = ("ka", "lo", "mi", "ren", "tu", "sa", "vel", "do", "qui", "par", "zen", "bo", "li", "fe", "ra", "no")
+NOUNS = ("painting", "carving", "racing", "building", "sailing", "weaving", "brewing", "foraging",
+         "restoration", "collecting", "photography", "walking", "mapping", "binding", "design", "making")
+
+
+def legacy_match(knowledge_base, response, suggested):
+    for category, hobbies in knowledge_base.items():
+        for hobby in hobbies:
+            if hobby.lower() in response.lower() and hobby not in suggested:
+                suggested.append(hobby)
+    return suggested
+
+
+def synthetic_catalogue(size: int):
+    rng = random.Random(size)
+    catalogue = {category: list(hobbies) for category, hobbies in HOBBY_KNOWLEDGE_BASE.items()}
+    names = set(h for hobbies in catalogue.values() for h in hobbies)
+    categories = list(catalogue)
+    while len(names) < size:
+        coined = "".join(rng.choice(SYLLABLES) for _ in range(3))
+        name = f"{rng.choice(WORDS)} {coined} {rng.choice(NOUNS)}"
+        if name not in names:
+            names.add(name)
+            catalogue[rng.choice(categories)].append(name)
+    return catalogue
+
+
+def main():
+    for size in (38, 1_000, 5_000, 20_000):
+        catalogue = HOBBY_KNOWLEDGE_BASE if size == 38 else synthetic_catalogue(size)
+        matcher = HobbyMatcher(catalogue)
+        assert {h for h, _ in matcher.match(REPLY)} >= {"bird watching", "photography"}
+        runs = 2000 if size < 5_000 else 200
+        legacy = timeit.timeit(lambda: legacy_match(catalogue, REPLY, []), number=runs) / runs
+        compiled = timeit.timeit(lambda: matcher.match(REPLY), number=runs) / runs
+        print(f"{size:>6} hobbies: loop {legacy * 1e6:9.1f} us | matcher {compiled * 1e6:6.1f} us "
+              f"| {legacy / compiled:6.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Scoring latency of HobbyRanker as the catalogue grows.
+
+Builds synthetic catalogues with random attributes on top of the built-in
+one and times rank() for a typical profile, including the hard filters.
+
+    python benchmarks/bench_hobby_ranking.py
+"""
+import os
+import random
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_hobby_matcher import synthetic_catalogue
+from hobbies import ATTRIBUTE_NAMES, HOBBY_ATTRIBUTES, HOBBY_KNOWLEDGE_BASE
+from hobby_ranking import HobbyRanker
+
+PROFILE = {
+    "interests": ["nature", "art", "quiet evenings with a book"],
+    "dislikes": ["loud environments", "crowds"],
+    "lifestyle": {"energy": "low", "time": "some", "social": "solo"},
+    "exclude": ["bird watching", "painting"],
+}
+
+
+def main():
+    for size in (38, 10_000, 50_000):
+        catalogue = HOBBY_KNOWLEDGE_BASE if size == 38 else synthetic_catalogue(size)
+        rng = random.Random(size)
+        attributes = dict(HOBBY_ATTRIBUTES)
+        for hobbies in catalogue.values():
+            for hobby in hobbies:
+                attributes.setdefault(hobby, tuple(round(rng.random(), 2) for _ in ATTRIBUTE_NAMES))
+
+        start = time.perf_counter()
+        ranker = HobbyRanker(catalogue, attributes)
+        build = time.perf_counter() - start
+
+        runs = 2000 if size < 10_000 else 200
+        per_call = timeit.timeit(lambda: ranker.rank(k=3, **PROFILE), number=runs) / runs
+        top = ", ".join(hobby for hobby, _, _ in ranker.rank(k=3, **PROFILE))
+        print(f"{size:>6} hobbies: build {build:6.2f} s | rank {per_call * 1e3:6.3f} ms | top 3: {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Offline load test for /api/chat on both backends.
+
+Replays scripted multi-turn conversations through the in-process ASGI app
+(httpx.ASGITransport), so no network or API key is needed. The LLM is
+the fake provider (LLM_PROVIDER=fake) with a seeded latency distribution.
+Up to --concurrency conversations are in flight at once, and each
+conversation's turns run in order. The report gives throughput, p50/p95/p99
+request latency and LLM calls and tokens per turn.
+
+    python benchmarks/bench_load.py --conversations 2000 --concurrency 100 --latency lognormal:0.3,0.5
+    python benchmarks/bench_load.py --backend app --response-mode fused --latency uniform:0.1,0.4
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+INTERESTS = ["I love being in nature and doing art", "I like music and singing", "Tech and coding mostly",
+             "I enjoy reading and puzzles", "sports and being active", "cooking, photography, travel"]
+DISLIKES = ["I really dislike loud environments", "crowds", "Nothing really", "I hate anything competitive",
+            "being stuck indoors", "long commitments"]
+LIFESTYLE = ["I have a bit of time in the evenings, and prefer being on my own", "Lots of free time, love people",
+             "I'm always tired after work", "not much time, I prefer being alone", "pretty active, weekends free"]
+FOLLOW_UPS = ["Another one?", "Sounds great, another one please", "How do I get started?", "thanks!",
+              "something different", "Tell me more about that"]
+
+
+def conversation(rng: random.Random):
+    # Greeting, one answer per profile phase, then one to four suggestion turns
+    return (["", rng.choice(INTERESTS), rng.choice(DISLIKES), rng.choice(LIFESTYLE)]
+            + [rng.choice(FOLLOW_UPS) for _ in range(rng.randint(1, 4))])
+
+
+def load_backend(name: str):
+    if name == "app":
+        import app as module
+        return module, module.get_llm()
+    import app_LangGraph_workflow as module
+    return module, module.llm
+
+
+async def run_backend(name: str, conversations: int, concurrency: int, seed: int):
+    import httpx
+
+    module, fake = load_backend(name)
+    rng = random.Random(seed)
+    scripts = [conversation(rng) for _ in range(conversations)]
+    latencies, errors = [], 0
+    next_index = 0
+    calls_before, prompt_before, completion_before = fake.calls, fake.prompt_tokens, fake.completion_tokens
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index, errors
+        while next_index < len(scripts):
+            index = next_index
+            next_index += 1
+            for message in scripts[index]:
+                start = time.perf_counter()
+                response = await client.post("/api/chat", json={"user_id": f"{name}-{seed}-{index}", "message": message})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+    transport = httpx.ASGITransport(app=module.app)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", limits=limits, timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(min(concurrency, conversations))])
+        elapsed = time.perf_counter() - start
+
+    turns = len(latencies)
+    p = statistics.quantiles(latencies, n=100)
+    print(f"{name:>10}: {conversations} conversations, {turns} turns in {elapsed:.1f}s | "
+          f"{turns / elapsed:7.1f} turns/s | p50 {p[49] * 1e3:6.0f} ms  p95 {p[94] * 1e3:6.0f} ms  "
+          f"p99 {p[98] * 1e3:6.0f} ms | {(fake.calls - calls_before) / turns:.2f} LLM calls/turn | "
+          f"{(fake.prompt_tokens - prompt_before) / turns:6.0f} + "
+          f"{(fake.completion_tokens - completion_before) / turns:4.0f} tokens/turn | errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("app", "langgraph", "both"), default="both")
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", default="lognormal:0.2,0.4", help="fake LLM latency spec, see fake_llm.LatencyModel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--response-mode", choices=("two_chain", "fused"), default="two_chain",
+                        help="RESPONSE_MODE for app.py")
+    args = parser.parse_args()
+
+    # The apps read these at import time
+    os.environ.update(LLM_PROVIDER="fake", FAKE_LLM_LATENCY=args.latency, FAKE_LLM_SEED=str(args.seed),
+                      RESPONSE_MODE=args.response_mode)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+    backends = ("app", "langgraph") if args.backend == "both" else (args.backend,)
+    print(f"fake LLM latency {args.latency}, concurrency {args.concurrency}")
+    for name in backends:
+        asyncio.run(run_backend(name, args.conversations, args.concurrency, args.seed))
+
+
+if __name__ == "__main__":
+    main()
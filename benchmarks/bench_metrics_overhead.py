@@ -0,0 +1,90 @@
+"""Cost of the metrics instrumentation.
+
+First times one span() and one Counter.inc() in a tight loop. Then it runs
+whole /api/chat conversations through the in-process ASGI app against a
+zero-latency fake LLM, so the instrumentation is a large share of each
+turn. Rounds alternate between metrics.ENABLED on and off, and the report
+compares the medians of the two.
+
+    python benchmarks/bench_metrics_overhead.py --backend app --conversations 200 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", FAKE_LLM_LATENCY="0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import metrics
+
+SCRIPT = ["", "I love being in nature and doing art", "I really dislike loud environments",
+          "I have a bit of time in the evenings, and prefer being on my own", "Another one?", "thanks!"]
+
+
+def micro(iterations: int):
+    counter = metrics.Counter("bench_total", "bench", ("label",))
+    for enabled in (True, False):
+        metrics.ENABLED = enabled
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with metrics.span("bench"):
+                pass
+        span_cost = (time.perf_counter() - start) / iterations
+        start = time.perf_counter()
+        for _ in range(iterations):
+            counter.inc(label="x")
+        inc_cost = (time.perf_counter() - start) / iterations
+        print(f"metrics {'on ' if enabled else 'off'}: span {span_cost * 1e6:5.2f} us, counter inc {inc_cost * 1e6:5.2f} us")
+
+
+async def run_round(module, conversations: int, tag: str) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(conversations):
+            for message in SCRIPT:
+                response = await client.post("/api/chat", json={"user_id": f"{tag}-{i}", "message": message})
+                response.raise_for_status()
+        return (time.perf_counter() - start) / (conversations * len(SCRIPT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("app", "langgraph"), default="app")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    micro(args.iterations)
+
+    if args.backend == "app":
+        import app as module
+    else:
+        import app_LangGraph_workflow as module
+    # Extraction cache hits would hide the extraction span after the first round
+    module.extraction_cache.max_entries = 0
+
+    per_turn = {True: [], False: []}
+    asyncio.run(run_round(module, 5, "warmup"))
+    for r in range(args.rounds):
+        for enabled in (True, False):
+            metrics.ENABLED = enabled
+            per_turn[enabled].append(asyncio.run(run_round(module, args.conversations, f"{r}-{enabled}")))
+    metrics.ENABLED = True
+
+    on, off = statistics.median(per_turn[True]), statistics.median(per_turn[False])
+    print(f"{args.backend}: per turn {on * 1e3:.3f} ms with metrics, {off * 1e3:.3f} ms without "
+          f"({(on - off) * 1e6:+.1f} us, {(on - off) / off * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
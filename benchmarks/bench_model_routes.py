@@ -0,0 +1,118 @@
+"""Extraction quality, latency and tokens per model route.
+
+Runs every case in benchmarks/extraction_corpus.jsonl through the extraction
+chains twice: once with every route on the single default model (gpt-4o at
+0.7, free-text JSON, the pre-routing setup) and once with the routing table
+(MODEL_ROUTES, default model_routes.json). Cases go through app.py's
+extraction chain, and the lifestyle cases also through
+app_LangGraph_workflow's extract_lifestyle chain. A case agrees when the
+parsed extraction equals its label. Reports agreement, p50/p95 latency and
+tokens per route and model (llm_provider.route_stats), and exits non-zero if
+the routed agreement drops more than --tolerance below the single-model run.
+
+Offline, the fake LLM answers each case with its label, so this checks the
+plumbing: the strict response format, null-filled keys and drop_nulls must
+give back exactly what free-text extraction did. --mini-speed scales the
+fake's latency for gpt-4o-mini. With --live both runs call the real models
+(needs OPENAI_API_KEY) and the agreement compares the models themselves.
+
+    python benchmarks/bench_model_routes.py
+    python benchmarks/bench_model_routes.py --live
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.chdir(ROOT)
+
+from bench_fast_extraction import load_corpus
+
+
+def percentile(values, q: float) -> float:
+    return statistics.quantiles(values, n=100)[int(q) - 1] if len(values) > 1 else values[0]
+
+
+def chains(app, graph):
+    """(route, chain, inputs for a case, cases it applies to) for each extraction chain under test."""
+    graph.llm = app.get_llm()
+    graph.chains = graph.PhaseChains()
+    return [
+        ("extraction", app.HobbyMentor().extraction_chain,
+         lambda case: {"phase": case["phase"], "user_message": case["message"]}, lambda case: True),
+        ("extract_lifestyle", graph.chains.extract["lifestyle"],
+         lambda case: {"message": case["message"]}, lambda case: case["phase"] == "lifestyle"),
+    ]
+
+
+async def run(label: str, router, corpus, live: bool):
+    import app
+    import app_LangGraph_workflow as graph
+    import llm_provider
+
+    app.model_router = graph.model_router = router
+    llm_provider.route_usage.clear()
+    fake = None if live else app.get_llm()
+    agreed, total, latencies, mismatches = 0, 0, {}, []
+    for route, chain, inputs, applies in chains(app, graph):
+        for case in filter(applies, corpus):
+            if fake is not None:
+                fake.extractions = {case["phase"]: case["expected"]}
+            start = time.perf_counter()
+            result = await chain.ainvoke(inputs(case))
+            latencies.setdefault(route, []).append(time.perf_counter() - start)
+            expected = case["expected"] if route == "extraction" else {"lifestyle": case["expected"].get("lifestyle", {})}
+            total += 1
+            if result == expected:
+                agreed += 1
+            else:
+                mismatches.append((route, case["message"], result, expected))
+
+    print(f"\n{label}: agreement {agreed}/{total} ({agreed / total:.1%})")
+    for stats in llm_provider.route_stats():
+        times = latencies[stats["route"]]
+        print(f"  {stats['route']:>17} {stats['model']:>12}: {stats['calls']:3d} calls | "
+              f"p50 {percentile(times, 50) * 1e3:6.1f} ms p95 {percentile(times, 95) * 1e3:6.1f} ms | "
+              f"tokens {stats['prompt_tokens']:6d} in {stats['completion_tokens']:5d} out")
+    for route, message, result, expected in mismatches[:10]:
+        print(f"  disagrees on {route}: {message!r} -> {result}, expected {expected}")
+    return agreed / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="call the real models instead of the fake LLM")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per call, seconds")
+    parser.add_argument("--mini-speed", type=float, default=0.4, help="fake gpt-4o-mini latency as a share of gpt-4o's")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="agreement the routed run may lose")
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ.update(LLM_PROVIDER="fake", TOKEN_COUNTER="estimate")
+        os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    import app
+    from model_routes import ModelRouter, router_from_env
+
+    if not args.live:
+        fake = app.get_llm()
+        fake.latency_model, fake.latency = None, args.latency
+        fake.model_latency = {"gpt-4o-mini": args.mini_speed}
+
+    corpus = load_corpus()
+    print(f"{len(corpus)} labelled replies, {'live models' if args.live else 'fake LLM'}")
+    baseline = asyncio.run(run("single model", ModelRouter(), corpus, args.live))
+    routed = asyncio.run(run(f"routed ({os.getenv('MODEL_ROUTES', 'model_routes.json')})",
+                             router_from_env(), corpus, args.live))
+    if routed < baseline - args.tolerance:
+        print(f"\nregression: routed agreement {routed:.1%} vs {baseline:.1%} on the single model")
+        sys.exit(1)
+    print(f"\nno regression: routed agreement {routed:.1%} vs {baseline:.1%} on the single model")
+
+
+if __name__ == "__main__":
+    main()
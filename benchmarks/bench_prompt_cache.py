@@ -0,0 +1,125 @@
+"""Provider prompt-cache reuse and latency for app.py's prompt layout.
+
+The offline fake LLM stands in for the provider. It remembers prompt
+prefixes in 128-token blocks, counts a repeated prefix of at least 1024
+tokens as cached, and adds --prefill-ms per 1k uncached prompt tokens to
+its latency. Sessions of --turns turns run under three layouts:
+
+  legacy       the old single-string prompt: SYSTEM_PROMPT, then per-turn
+               values, then the history as text; the window slides every turn
+  messages     the message-list prompts with a sliding window (HISTORY_EVICT_TO=1)
+  messages+50% the message-list prompts, trimming to half the budget on overflow
+
+The report gives the share of prompt tokens served from the cache, the
+average turn latency and the time to render one conversation prompt.
+
+    python benchmarks/bench_prompt_cache.py --sessions 20 --turns 40 --prefill-ms 40
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", FAKE_LLM_LATENCY="0.05", TOKEN_COUNTER="estimate")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+# The conversation prompt as it was before the message-list layout
+LEGACY_TEMPLATE = app.SYSTEM_PROMPT + """
+
+            Current conversation phase: {phase}
+            User's interests: {interests}
+            User's dislikes: {dislikes}
+            User's lifestyle: {lifestyle}
+            Previously suggested hobbies: {suggested_hobbies}
+            Best-fitting hobbies to suggest next, best first (suggest ONE of these): {candidate_hobbies}
+
+            Conversation history:
+            {conversation_history}
+
+            User's latest message: "{user_message}"
+
+            Respond naturally according to the current phase and conversation context.
+            """
+
+OPENERS = ["I love being in nature and doing art, especially sketching", "I really dislike loud environments",
+           "I have a bit of time in the evenings, and prefer being on my own"]
+FOLLOW_UPS = ["Another one?", "Tell me more about that, how would I get started?", "thanks, that sounds fun!",
+              "Hmm, something different please, maybe less expensive", "What would I need to buy first?"]
+
+
+def legacy_inputs(inputs: dict) -> dict:
+    roles = {"human": "user", "ai": "assistant"}
+    history = "\n".join(f"{roles.get(m.type, m.type)}: {m.content}" for m in inputs["history"])
+    return {**inputs, "conversation_history": history}
+
+
+async def run_layout(label: str, prompt, adapt, sessions: int, turns: int, seed: int):
+    fake = app.get_llm()
+    fake.prefix_cache.clear()
+    rng = random.Random(seed)
+    prompt_before, cached_before = fake.prompt_tokens, fake.cached_tokens
+    times = []
+    for i in range(sessions):
+        user_id = f"{label}-{i}"
+        session = app.get_session(user_id)
+        await app.generate_response(session, "")
+        for turn in range(turns):
+            message = OPENERS[turn] if turn < len(OPENERS) else rng.choice(FOLLOW_UPS)
+            start = time.perf_counter()
+            await app.generate_response(session, message)
+            times.append(time.perf_counter() - start)
+            app.save_session(session)
+            await asyncio.gather(*app.background_tasks)
+    prompt_tokens = fake.prompt_tokens - prompt_before
+    cached = fake.cached_tokens - cached_before
+
+    # Render cost of one conversation prompt for the last (full-window) session
+    inputs = adapt(app.conversation_inputs(session, "Another one?"))
+    start = time.perf_counter()
+    for _ in range(200):
+        prompt.format_messages(**inputs)
+    render = (time.perf_counter() - start) / 200
+    print(f"{label:>13}: {cached / prompt_tokens:6.1%} of {prompt_tokens / len(times):5.0f} prompt tokens/turn cached | "
+          f"{sum(times) / len(times) * 1e3:6.1f} ms/turn | render {render * 1e6:6.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--prefill-ms", type=float, default=40.0, help="fake latency per 1k uncached prompt tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = app.get_llm()
+    fake.prefill_per_1k = args.prefill_ms / 1000
+    mentor = app.get_mentor()
+    current_chain = mentor.conversation_chain
+    legacy_prompt = ChatPromptTemplate.from_template(LEGACY_TEMPLATE)
+    legacy_chain = RunnableLambda(legacy_inputs) | legacy_prompt | fake | StrOutputParser()
+    layouts = (
+        ("legacy", legacy_chain, legacy_prompt, legacy_inputs, 1.0),
+        ("messages", current_chain, mentor.conversation_prompt, lambda inputs: inputs, 1.0),
+        ("messages+50%", current_chain, mentor.conversation_prompt, lambda inputs: inputs, 0.5),
+    )
+
+    print(f"fake LLM: 50 ms + {args.prefill_ms:.0f} ms per 1k uncached prompt tokens; "
+          f"HISTORY_TOKEN_BUDGET {app.HISTORY_TOKEN_BUDGET}")
+    for label, chain, prompt, adapt, evict_to in layouts:
+        mentor.conversation_chain = chain
+        app.HISTORY_EVICT_TO = evict_to
+        asyncio.run(run_layout(label, prompt, adapt, args.sessions, args.turns, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Resident memory of 100k idle UserSession objects, before and after the
+compact session layout.
+
+"before" is a copy of the original UserSession: per-instance __dict__, a list
+that keeps every message as a dict, and lists of interests/dislikes that grow
+with every repeated extraction. Two shapes are measured: sessions that were
+only greeted, and sessions that reached the suggesting phase after 20
+messages with repeated extraction results.
+
+    python benchmarks/bench_session_memory.py --sessions 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+
+GREETING = "Hi! I'm HobbyMentor, and I'd love to help you discover some amazing new hobbies."
+
+
+class LegacyUserSession:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.phase = "greeting"
+        self.interests = []
+        self.dislikes = []
+        self.lifestyle = {}
+        self.suggested_hobbies = []
+        self.conversation_history = []
+        self.message_count = 0
+
+    def add_message(self, role: str, content: str):
+        self.conversation_history.append({"role": role, "content": content})
+        self.message_count += 1
+
+
+def greeted(cls, i):
+    session = cls(f"user-{i}")
+    session.phase = "interests"
+    session.add_message("assistant", GREETING)
+    return session
+
+
+def active(cls, i):
+    session = greeted(cls, i)
+    for turn in range(10):
+        session.add_message("user", f"user {i} says something about their week, turn {turn}")
+        session.add_message("assistant", f"assistant reply {turn} for user {i}, asking a follow-up question")
+        if cls is LegacyUserSession:
+            session.interests.extend(["nature", "art"])
+            session.dislikes.extend(["loud environments"])
+            session.lifestyle.update({"energy": "medium"})
+        else:
+            session.add_interests(["nature", "art"])
+            session.add_dislikes(["loud environments"])
+            session.update_lifestyle({"energy": "medium"})
+    session.phase = "suggesting"
+    return session
+
+
+def measure(build, cls, count: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    sessions = [build(cls, i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for shape, build in (("greeted", greeted), ("active", active)):
+        before = measure(build, LegacyUserSession, args.sessions)
+        after = measure(build, app.UserSession, args.sessions)
+        print(f"{shape:>8}: before {before / 2**20:7.1f} MiB | after {after / 2**20:7.1f} MiB "
+              f"| {after / before:.0%} of before ({args.sessions} sessions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""/api/stats query cost at growing session counts, and top-k sketch accuracy.
+
+Fills app.py's session store with --sessions simulated sessions, all through
+the same hooks real turns use: get_session, update_profile, advance_phase
+and finish_turn. Free-text interests and dislikes are drawn from a Zipf-like
+vocabulary of --vocabulary values. For each size it reports:
+
+- time per /api/stats snapshot, which reads the incremental counters
+- time for the scan it replaces: one pass over every session, counting
+  phases, interests, dislikes and suggested hobbies
+- recall of the Space-Saving top 10 against exact counts from the scan
+
+    python benchmarks/bench_session_stats.py --sessions 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", TOKEN_COUNTER="estimate", SESSION_MAX_COUNT="", SESSION_MAX_BYTES="",
+                  SESSION_TTL_SECONDS="")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from hobbies import HOBBY_KNOWLEDGE_BASE
+
+HOBBIES = [hobby for hobbies in HOBBY_KNOWLEDGE_BASE.values() for hobby in hobbies]
+
+
+def zipf_words(rng: random.Random, vocabulary: int, count: int, prefix: str):
+    # Rank r drawn with weight 1/r, a long tail of rare free-text values
+    return [f"{prefix} {int(vocabulary ** rng.random())}" for _ in range(count)]
+
+
+def populate(start: int, end: int, rng: random.Random, vocabulary: int):
+    for i in range(start, end):
+        session = app.get_session(f"stats-{i}")
+        session.advance_phase()
+        app.update_profile(session, {"interests": zipf_words(rng, vocabulary, 3, "interest")})
+        stage = rng.random()
+        if stage < 0.8:
+            session.advance_phase()
+            app.update_profile(session, {"dislikes": zipf_words(rng, vocabulary, 2, "dislike")})
+        if stage < 0.6:
+            session.advance_phase()
+            session.advance_phase()
+            for hobby in rng.sample(HOBBIES, 2):
+                app.finish_turn(session, f"Have you thought about trying {hobby}?")
+        app.sessions.put(session.user_id, session)
+
+
+def scan():
+    phases, interests, dislikes, hobbies = Counter(), Counter(), Counter(), Counter()
+    for user_id in list(app.sessions._entries):
+        session = app.sessions.peek(user_id)
+        phases[session.phase] += 1
+        interests.update(key.lower() for key in session.interests)
+        dislikes.update(key.lower() for key in session.dislikes)
+        hobbies.update(session.suggested_hobbies)
+    return phases, interests, dislikes, hobbies
+
+
+def timed(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    filled = 0
+    print(f"Space-Saving capacity {app.aggregates.interests.capacity}, vocabulary {args.vocabulary}")
+    for size in sorted(args.sessions):
+        populate(filled, size, rng, args.vocabulary)
+        filled = size
+        snapshot_time, snapshot = timed(lambda: app.aggregates.snapshot(10), 200)
+        scan_time, (phases, interests, dislikes, hobbies) = timed(scan, 1 if size > 10000 else 5)
+        assert snapshot["sessions_by_phase"] == {p: phases[p] for p in snapshot["sessions_by_phase"]}
+        exact_top = {value for value, _ in interests.most_common(10)}
+        recall = len(exact_top & {e["value"] for e in snapshot["top_interests"]}) / len(exact_top)
+        print(f"{size:>8} sessions: /api/stats snapshot {snapshot_time * 1e6:7.1f} us | full scan {scan_time * 1e3:9.1f} ms | "
+              f"top-10 interest recall {recall:.0%} | phases {dict(phases)}")
+
+
+if __name__ == "__main__":
+    main()
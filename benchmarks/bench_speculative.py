@@ -0,0 +1,97 @@
+"""Speculative next-suggestion generation in app.py, on vs off.
+
+Each of --users simulated users answers the three profile questions, then
+sends --follow-ups messages in the suggesting phase. A message is a "want
+more" request ("another one", "something else?") with probability
+--wants-more, and otherwise a question or a thank-you. Users pause --think-ms
+between turns to read the reply, which is the time a speculation has to
+finish. The fake LLM answers in --latency seconds.
+
+The report gives suggesting-phase turn latency (mean and p95), LLM calls,
+the speculation hit rate and the estimated tokens spent on discarded
+speculations.
+
+    python benchmarks/bench_speculative.py --users 20 --follow-ups 8 --wants-more 0.7
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", TOKEN_COUNTER="estimate")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import app
+from speculation import Speculator
+
+PROFILE = ["", "I love being in nature and doing art", "I really dislike loud crowds",
+           "I have a few free evenings a week and prefer being on my own"]
+WANTS_MORE = ["Another one?", "another one please", "Something else?", "one more idea", "Got any more suggestions?"]
+OTHER = ["How would I get started with that?", "What does it cost to begin?", "thanks, that sounds fun!",
+         "Is that something I can do indoors?"]
+
+
+async def user(user_id: str, rng: random.Random, follow_ups: int, wants_more: float, think: float, times: list):
+    for message in PROFILE:
+        await app.run_turn(user_id, message)
+    for _ in range(follow_ups):
+        await asyncio.sleep(think)
+        message = rng.choice(WANTS_MORE) if rng.random() < wants_more else rng.choice(OTHER)
+        start = time.perf_counter()
+        await app.run_turn(user_id, message)
+        times.append(time.perf_counter() - start)
+
+
+async def run(label: str, speculator, args):
+    app.speculator = speculator
+    fake = app.get_llm()
+    calls = fake.calls
+    rng = random.Random(args.seed)
+    times = []
+    await asyncio.gather(*[user(f"{label}-{i}", random.Random(rng.random()), args.follow_ups, args.wants_more,
+                                args.think_ms / 1000, times) for i in range(args.users)])
+    # Let speculations started by the last turns finish so their cost is counted
+    await asyncio.sleep(args.latency * 2)
+    p95 = statistics.quantiles(times, n=20)[-1]
+    line = (f"{label:>12}: {statistics.mean(times) * 1e3:6.1f} ms mean, {p95 * 1e3:6.1f} ms p95 per suggesting turn | "
+            f"{fake.calls - calls:5d} LLM calls")
+    if speculator is not None:
+        for user_id in list(speculator.pending):
+            speculator.discard(user_id)
+        stats = speculator.stats()
+        line += (f" | hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses, "
+                 f"{stats['skipped_budget']} skipped) | ~{stats['wasted_tokens']} wasted tokens")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--follow-ups", type=int, default=8)
+    parser.add_argument("--wants-more", type=float, default=0.7)
+    parser.add_argument("--think-ms", type=float, default=500)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--tpm", type=float, default=0, help="speculation token budget per minute, 0 = unlimited")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = app.get_llm()
+    fake.latency_model = None
+    fake.latency = args.latency
+    app.extraction_cache.max_entries = 0
+
+    print(f"fake LLM {args.latency * 1000:.0f} ms, {args.users} users x {args.follow_ups} follow-ups, "
+          f"{args.wants_more:.0%} want more, {args.think_ms:.0f} ms think time")
+    asyncio.run(run("off", None, args))
+    asyncio.run(run("speculative", Speculator(args.max_in_flight, args.tpm), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Bytes transferred and requests per second for the index page and /api/status.
+
+Compares app.py as served today (PrecompressedStaticFiles plus
+ApiCompressionMiddleware) with a baseline app that mounts the same static
+directory through a bare StaticFiles and serves the same status handler
+without compression. Requests go through the in-process ASGI app with a
+browser-like Accept-Encoding, so the numbers are serving cost plus bytes on
+the wire, with no network:
+
+  index        first load of /
+  index 304    a revisit sending If-None-Match with the ETag from the first load
+  status       /api/status for a session with --interests interests
+
+    python benchmarks/bench_static.py --requests 2000 --interests 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.update(LLM_PROVIDER="fake", TOKEN_COUNTER="estimate")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+import app
+
+ACCEPT = {"accept-encoding": "gzip, deflate, br"}
+
+
+def baseline_app() -> FastAPI:
+    baseline = FastAPI()
+    baseline.get("/api/status/{user_id}")(app.get_status)
+    baseline.mount("/", StaticFiles(directory="static", html=True), name="static")
+    return baseline
+
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict, requests: int):
+    downloaded = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        await response.aread()
+        downloaded += response.num_bytes_downloaded
+    elapsed = time.perf_counter() - start
+    return response.status_code, downloaded / requests, requests / elapsed
+
+
+async def run(label: str, asgi_app, user_id: str, requests: int):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = await client.get("/", headers=ACCEPT)
+        revisit = {**ACCEPT, "if-none-match": first.headers["etag"]}
+        for name, path, headers in (("index", "/", ACCEPT), ("index 304", "/", revisit),
+                                    ("status", f"/api/status/{user_id}", ACCEPT)):
+            status, size, rate = await measure(client, path, headers, requests)
+            print(f"{label:>9} {name:>9}: HTTP {status} | {size:7.0f} body bytes/request | {rate:7.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--interests", type=int, default=60)
+    args = parser.parse_args()
+
+    session = app.get_session("bench-static")
+    session.add_interests([f"interest {i}: weekend hiking with friends" for i in range(args.interests)])
+    session.add_dislikes([f"dislike {i}: loud crowded places" for i in range(args.interests // 3)])
+    app.save_session(session)
+
+    for label, asgi_app in (("baseline", baseline_app()), ("current", app.app)):
+        asyncio.run(run(label, asgi_app, session.user_id, args.requests))
+
+
+if __name__ == "__main__":
+    main()
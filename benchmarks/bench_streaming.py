@@ -0,0 +1,81 @@
+"""Time to first token: blocking vs streamed turns.
+
+Runs the same turn through the blocking path (generate_response /
+process_message) and the streaming path behind /api/chat/stream
+(stream_response / stream_message) of each backend with the offline fake LLM.
+It reports the time to the first reply text and to the full reply. The
+generators are timed directly because httpx's in-process ASGI transport
+buffers whole response bodies.
+
+    python benchmarks/bench_streaming.py --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+
+from benchmarks.bench_concurrency import load_backend
+
+MESSAGE = "I love being in nature and doing art"
+
+
+async def timed(events):
+    start = time.perf_counter()
+    first = None
+    async for event in events:
+        is_token = isinstance(event, str) or event["type"] == "token"
+        if first is None and is_token:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def bench_app(latency: float):
+    module = load_backend("app", latency)
+    blocking, streamed = module.UserSession("blocking"), module.UserSession("streamed")
+    for session in (blocking, streamed):
+        await module.generate_response(session, "")
+
+    start = time.perf_counter()
+    await module.generate_response(blocking, MESSAGE)
+    total = time.perf_counter() - start
+    report("app", "blocking", total, total)
+    report("app", "streamed", *await timed(module.stream_response(streamed, MESSAGE)))
+    assert (streamed.phase, streamed.interests) == (blocking.phase, blocking.interests)
+
+
+async def bench_langgraph(latency: float):
+    module = load_backend("langgraph", latency)
+    for user_id in ("blocking", "streamed"):
+        await module.process_message(user_id, "")
+
+    start = time.perf_counter()
+    await module.process_message("blocking", MESSAGE)
+    total = time.perf_counter() - start
+    report("langgraph", "blocking", total, total)
+    report("langgraph", "streamed", *await timed(module.stream_message("streamed", MESSAGE)))
+
+
+def report(backend: str, label: str, first: float, total: float):
+    print(f"{backend:>10} {label:<9} first token {first * 1000:7.1f} ms | full reply {total * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--backend", choices=["app", "langgraph", "both"], default="both")
+    args = parser.parse_args()
+
+    if args.backend in ("app", "both"):
+        asyncio.run(bench_app(args.latency))
+    if args.backend in ("langgraph", "both"):
+        asyncio.run(bench_langgraph(args.latency))
+
+
+if __name__ == "__main__":
+    main()
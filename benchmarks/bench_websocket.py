@@ -0,0 +1,122 @@
+"""Sustained turns per second over /ws/chat vs HTTP.
+
+Starts the app under uvicorn in a subprocess (offline fake LLM, --latency
+seconds per call) and runs --users concurrent users. Each user sends
+--turns turns four ways:
+
+  http         POST /api/chat per turn (pooled keep-alive connections)
+  http sse     POST /api/chat/stream per turn, reading the SSE stream
+  ws           one /ws/chat connection per user, waiting for "done" before the next turn
+  ws pipelined one connection per user, all turns sent at once; replies come back in order
+
+Requires the `websockets` package (also what uvicorn uses to serve WebSockets).
+
+    python benchmarks/bench_websocket.py --users 50 --turns 20 --latency 0.0
+    python benchmarks/bench_websocket.py --app app_LangGraph_workflow
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = ["", "I love being in nature and doing art", "I really dislike loud crowds",
+            "I have a few free evenings a week and prefer being on my own"]
+
+
+def message(turn: int) -> str:
+    return MESSAGES[turn] if turn < len(MESSAGES) else "Another one please"
+
+
+async def http_user(client, user_id: str, turns: int, stream: bool):
+    for turn in range(turns):
+        body = {"user_id": user_id, "message": message(turn)}
+        if stream:
+            async with client.stream("POST", "/api/chat/stream", json=body) as response:
+                async for _ in response.aiter_lines():
+                    pass
+        else:
+            (await client.post("/api/chat", json=body)).raise_for_status()
+
+
+async def ws_user(url: str, turns: int, pipelined: bool):
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        json.loads(await ws.recv())  # ready
+        if pipelined:
+            for turn in range(turns):
+                await ws.send(json.dumps({"message": message(turn), "id": turn}))
+        done = 0
+        for turn in range(turns):
+            if not pipelined:
+                await ws.send(json.dumps({"message": message(turn), "id": turn}))
+            while True:
+                event = json.loads(await ws.recv())
+                if event["type"] in ("done", "error"):
+                    done += 1
+                    break
+    return done
+
+
+async def run(mode: str, base: str, users: int, turns: int):
+    import httpx
+
+    start = time.perf_counter()
+    if mode.startswith("http"):
+        limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+        async with httpx.AsyncClient(base_url=base, timeout=None, limits=limits) as client:
+            await asyncio.gather(*[http_user(client, f"{mode}-{i}", turns, mode == "http sse") for i in range(users)])
+    else:
+        ws_base = base.replace("http://", "ws://")
+        await asyncio.gather(*[ws_user(f"{ws_base}/ws/chat/{mode.replace(' ', '-')}-{i}", turns, mode == "ws pipelined")
+                               for i in range(users)])
+    elapsed = time.perf_counter() - start
+    print(f"{mode:>13}: {users * turns} turns in {elapsed:6.2f}s | {users * turns / elapsed:7.1f} turns/s")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="app", choices=["app", "app_LangGraph_workflow"])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", default="0.0", help="fake LLM latency spec, see fake_llm.LatencyModel")
+    args = parser.parse_args()
+
+    port = free_port()
+    env = {**os.environ, "LLM_PROVIDER": "fake", "FAKE_LLM_LATENCY": args.latency, "TOKEN_COUNTER": "estimate",
+           "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-offline")}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{args.app}:app", "--port", str(port),
+                               "--log-level", "warning", "--no-access-log"], cwd=ROOT, env=env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 60
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise SystemExit("server did not start")
+                time.sleep(0.2)
+        print(f"{args.app} under uvicorn, fake LLM latency {args.latency}, {args.users} users x {args.turns} turns")
+        for mode in ("http", "http sse", "ws", "ws pipelined"):
+            asyncio.run(run(mode, base, args.users, args.turns))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""File-backed hobby catalogue with inverted indexes and hot reload.
+
+Without CATALOGUE_PATH the apps use the built-in HOBBY_KNOWLEDGE_BASE. With
+it, they load a .hcat file, a compact binary column format:
+
+    b"HCAT" + uint32 format version + uint32 header length + JSON header, padded to 8 bytes
+    category_ids   uint16[count]              index into header["categories"]
+    attributes     uint8[attributes][count]   0-255 for 0-1, one row per attribute name
+    names          UTF-8, newline separated
+
+The numeric columns are memory-mapped read-only, so loading doesn't copy
+them and processes serving the same file share the pages. The names are
+decoded once, because the matcher and ranker need them as strings.
+
+Loading builds inverted indexes:
+- category -> hobby ids
+- (attribute, level) -> hobby ids, where the level is "low", "medium" or
+  "high" (thirds of the 0-1 scale)
+
+filter(category="outdoors", noise="low", cost="low") starts from the
+shortest matching posting list and checks the other constraints on that list
+only, without scanning the catalogue. "indoor/outdoor" and "solo/social" are
+the low/high levels of the outdoor and social attributes.
+
+Hot reload: current_catalogue() checks the file's mtime and size at most
+every CATALOGUE_CHECK_SECONDS (default 2). When the file has changed, a
+background thread loads the new one and swaps it in with a single reference
+assignment. In-flight requests keep the catalogue they started with. If the
+new file fails to load, the old catalogue stays in place. Write new files
+with write_catalogue, which replaces the file atomically.
+
+Build a file from JSON Lines, one {"name", "category", <attribute>: 0-1, ...}
+per line, or from the built-in catalogue:
+
+    python catalogue.py build hobbies.jsonl hobbies.hcat
+    python catalogue.py builtin hobbies.hcat
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from hobbies import ATTRIBUTE_NAMES, HOBBY_ATTRIBUTES, HOBBY_KNOWLEDGE_BASE, PhraseMatcher, hobby_matcher
+from hobby_ranking import HobbyRanker, hobby_ranker
+from metrics import record_error
+
+MAGIC = b"HCAT"
+FORMAT_VERSION = 1
+LEVELS = ("low", "medium", "high")
+# Synonyms for attribute levels
+LEVEL_ALIASES = {("outdoor", "indoor"): "low", ("outdoor", "outdoor"): "high",
+                 ("social", "solo"): "low", ("social", "social"): "high"}
+
+
+def _quantize(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(values, dtype=np.float32) * 255), 0, 255).astype(np.uint8)
+
+
+def write_catalogue(path: str, entries: Iterable[dict], attribute_names: Tuple[str, ...] = ATTRIBUTE_NAMES):
+    """Write entries ({"name", "category", attribute: 0-1, ...}) to `path`, replacing it atomically.
+
+    Missing attributes are stored as 0.5 (neutral).
+    """
+    categories: Dict[str, int] = {}
+    names, category_ids, rows = [], [], []
+    for entry in entries:
+        name = str(entry["name"]).replace("\n", " ").strip()
+        names.append(name)
+        category_ids.append(categories.setdefault(entry["category"], len(categories)))
+        rows.append([float(entry.get(attribute, 0.5)) for attribute in attribute_names])
+    if len(categories) > 65535:
+        raise ValueError("at most 65535 categories")
+
+    header = json.dumps({"count": len(names), "categories": list(categories),
+                         "attributes": list(attribute_names)}).encode()
+    prefix = MAGIC + struct.pack("<II", FORMAT_VERSION, len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 8)
+    attributes = _quantize(np.asarray(rows, dtype=np.float32).reshape(len(names), len(attribute_names)).T)
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(np.asarray(category_ids, dtype="<u2").tobytes())
+        f.write(np.ascontiguousarray(attributes).tobytes())
+        f.write("\n".join(names).encode())
+    os.replace(tmp, path)
+
+
+def builtin_entries() -> List[dict]:
+    return [{"name": hobby, "category": category, **dict(zip(ATTRIBUTE_NAMES, HOBBY_ATTRIBUTES.get(hobby, ())))}
+            for category, hobbies in HOBBY_KNOWLEDGE_BASE.items() for hobby in hobbies]
+
+
+class Catalogue:
+    """One immutable catalogue version: columns, indexes, matcher and ranker."""
+
+    def __init__(self, names: List[str], categories: List[str], category_ids: np.ndarray,
+                 attribute_names: List[str], levels: np.ndarray, matcher=None, ranker=None,
+                 source: Optional[str] = None):
+        self.names = names
+        self.categories = categories
+        self.category_ids = category_ids
+        self.attribute_names = attribute_names
+        # uint8 attributes x hobbies; possibly a read-only view into the mmapped file
+        self.levels = levels
+        self.source = source
+
+        # Inverted indexes as (sorted ids, start offsets) pairs: ids[starts[k]:starts[k + 1]] have key k
+        self._by_category = self._postings(category_ids, len(categories))
+        self._level_ids = np.minimum(levels // 86, 2).astype(np.uint8)  # 0-85 low, 86-171 medium, 172-255 high
+        self._by_level = [self._postings(row, len(LEVELS)) for row in self._level_ids]
+
+        self.matcher = matcher or PhraseMatcher(zip(names, (categories[c] for c in category_ids.tolist())))
+        if ranker is None:
+            # The ranker scores on ATTRIBUTE_NAMES; attributes the file doesn't have are neutral
+            rows = np.full((len(ATTRIBUTE_NAMES), len(names)), 0.5, dtype=np.float32)
+            for row, attribute in enumerate(ATTRIBUTE_NAMES):
+                if attribute in attribute_names:
+                    rows[row] = levels[attribute_names.index(attribute)] / np.float32(255)
+            ranker = HobbyRanker.from_arrays(categories, names, category_ids, rows, self.matcher)
+        self.ranker = ranker
+        # name -> id, shared with the ranker rather than built twice
+        self.index = ranker.index
+
+    @staticmethod
+    def _postings(keys: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(keys, kind="stable").astype(np.uint32)
+        starts = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=size), out=starts[1:])
+        return order, starts
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def filter(self, category: Optional[str] = None, **levels: str) -> List[str]:
+        """Hobbies in `category` (if given) with each attribute at the given level, in catalogue order."""
+        lists = []
+        if category is not None:
+            if category not in self.categories:
+                return []
+            ids, starts = self._by_category
+            k = self.categories.index(category)
+            lists.append(ids[starts[k]:starts[k + 1]])
+        checks = []
+        for attribute, level in levels.items():
+            level = LEVEL_ALIASES.get((attribute, level), level)
+            if attribute not in self.attribute_names or level not in LEVELS:
+                raise ValueError(f"unknown filter {attribute}={level}")
+            row, k = self.attribute_names.index(attribute), LEVELS.index(level)
+            ids, starts = self._by_level[row]
+            lists.append(ids[starts[k]:starts[k + 1]])
+            checks.append((row, k))
+        if not lists:
+            return list(self.names)
+        # Walk the shortest posting list and test the other constraints on it
+        shortest = min(lists, key=len)
+        keep = np.ones(len(shortest), dtype=bool)
+        if category is not None:
+            keep &= self.category_ids[shortest] == self.categories.index(category)
+        for row, k in checks:
+            keep &= self._level_ids[row][shortest] == k
+        return [self.names[i] for i in np.sort(shortest[keep]).tolist()]
+
+
+def load_catalogue(path: str) -> Catalogue:
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and filesystems without mmap support: read into memory instead
+            data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a hobby catalogue file")
+    version, header_length = struct.unpack_from("<II", data, 4)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported catalogue format version {version}")
+    header = json.loads(bytes(data[12:12 + header_length]))
+    offset = 12 + header_length
+    offset += -offset % 8
+    count, attribute_names = header["count"], header["attributes"]
+
+    category_ids = np.frombuffer(data, dtype="<u2", count=count, offset=offset)
+    offset += 2 * count
+    levels = np.frombuffer(data, dtype=np.uint8, count=count * len(attribute_names), offset=offset)
+    levels = levels.reshape(len(attribute_names), count)
+    offset += levels.size
+    names = bytes(data[offset:]).decode().split("\n") if count else []
+    if len(names) != count:
+        raise ValueError(f"{path}: expected {count} names, found {len(names)}")
+    return Catalogue(names, header["categories"], category_ids, attribute_names, levels, source=path)
+
+
+def builtin_catalogue() -> Catalogue:
+    # Same matcher and ranker objects as before there was a catalogue file
+    entries = builtin_entries()
+    categories = list(HOBBY_KNOWLEDGE_BASE)
+    category_ids = np.asarray([categories.index(e["category"]) for e in entries], dtype=np.uint16)
+    levels = _quantize(np.asarray([[e.get(a, 0.5) for a in ATTRIBUTE_NAMES] for e in entries]).T)
+    return Catalogue([e["name"] for e in entries], categories, category_ids, list(ATTRIBUTE_NAMES), levels,
+                     matcher=hobby_matcher, ranker=hobby_ranker)
+
+
+class LiveCatalogue:
+    """The current Catalogue for a file, reloaded in the background when the file changes."""
+
+    def __init__(self, path: Optional[str], check_seconds: float = 2.0):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.catalogue = load_catalogue(path) if path else builtin_catalogue()
+        self._signature = self._stat()
+        self._checked = time.monotonic()
+        self._reloading = False
+        self.reloads = 0
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> Catalogue:
+        if self.path and not self._reloading and time.monotonic() - self._checked >= self.check_seconds:
+            self._checked = time.monotonic()
+            signature = self._stat()
+            if signature is not None and signature != self._signature:
+                self._reloading = True
+                threading.Thread(target=self._reload, args=(signature,), daemon=True).start()
+        return self.catalogue
+
+    def _reload(self, signature: Tuple[int, int]):
+        try:
+            catalogue = load_catalogue(self.path)
+        except Exception as e:
+            print(f"Catalogue reload failed, keeping the current one: {e}")
+            record_error("catalogue_reload")
+        else:
+            # One reference assignment; readers see the old or the new catalogue, never a mix
+            self.catalogue = catalogue
+            self.reloads += 1
+        finally:
+            self._signature = signature
+            self._reloading = False
+
+    def stats(self) -> Dict[str, object]:
+        return {"source": self.path or "builtin", "hobbies": len(self.catalogue),
+                "categories": len(self.catalogue.categories), "reloads": self.reloads}
+
+
+def catalogue_from_env() -> LiveCatalogue:
+    return LiveCatalogue(os.getenv("CATALOGUE_PATH") or None, float(os.getenv("CATALOGUE_CHECK_SECONDS", "2")))
+
+
+# One copy per process, shared by app.py and app_LangGraph_workflow.py
+live_catalogue = catalogue_from_env()
+
+
+def current_catalogue() -> Catalogue:
+    return live_catalogue.get()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        with open(sys.argv[2]) as f:
+            write_catalogue(sys.argv[3], (json.loads(line) for line in f if line.strip()))
+    elif len(sys.argv) == 3 and sys.argv[1] == "builtin":
+        write_catalogue(sys.argv[2], builtin_entries())
+    else:
+        raise SystemExit(__doc__)
+    print(f"Wrote {sys.argv[-1]}: {len(load_catalogue(sys.argv[-1]))} hobbies")
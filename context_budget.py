@@ -0,0 +1,55 @@
+"""Token counting for the prompt's conversation history.
+
+count_tokens() uses the model's tiktoken encoding when it can be loaded
+(tiktoken ships with langchain-openai but fetches its encoding file on
+first use). Without it, the fallback is a 4-characters-per-token estimate,
+which is close enough for budgeting. TOKEN_COUNTER=estimate skips tiktoken
+altogether; it is the default with LLM_PROVIDER=fake, so offline runs never
+download the encoding. truncate_to_tokens() cuts text down to a budget, so
+one very long message or summary cannot blow past it.
+"""
+import os
+
+ENCODING_MODEL = "gpt-4o"
+
+_encoding = None
+_encoding_tried = False
+
+
+def token_counter() -> str:
+    # Read on first use rather than at import, so settings from a .env loaded after the import apply
+    return os.getenv("TOKEN_COUNTER", "estimate" if os.getenv("LLM_PROVIDER") == "fake" else "tiktoken")
+
+
+def encoding():
+    """The tiktoken encoding, or None when it is disabled or could not be loaded (tried once)."""
+    global _encoding, _encoding_tried
+    if not _encoding_tried:
+        _encoding_tried = True
+        if token_counter() == "tiktoken":
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(ENCODING_MODEL)
+            except Exception as e:
+                print(f"tiktoken unavailable, estimating token counts: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    # One token is left for the ellipsis
+    keep = max(0, budget - 1)
+    enc = encoding()
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:keep]) + "…"
+    return text[:keep * 4] + "…"
@@ -0,0 +1,127 @@
+"""Memoizing cache for LLM extraction results.
+
+Short replies such as "yes", "another one" or "I have little time" come up
+over and over, and each one would otherwise cost a full extraction call.
+Results are keyed on (namespace, phase, normalized message) and kept in an
+in-process LRU with a TTL. An optional SQLite tier survives restarts and can
+be shared between workers.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+_NOT_WORD = re.compile(r"[^\w\s']+")
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(_NOT_WORD.sub(" ", message.lower()).split())
+
+
+class ExtractionCache:
+    def __init__(self, namespace: str, max_entries: int = 10_000, ttl_seconds: Optional[float] = 24 * 3600,
+                 max_message_chars: int = 200, disk_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_message_chars = max_message_chars
+        self.clock = clock
+        # key -> (stored_at, JSON text); JSON so every hit hands out a fresh dict
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+                         "skipped": 0}
+        self._disk = None
+        self._lock = threading.Lock()
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def _key(self, phase: str, message: str) -> Optional[str]:
+        if len(message) > self.max_message_chars:
+            return None
+        normalized = normalize_message(message)
+        return f"{self.namespace}\x1f{phase}\x1f{normalized}" if normalized else None
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl_seconds is None or self.clock() - stored_at <= self.ttl_seconds
+
+    def get(self, phase: str, message: str) -> Optional[dict]:
+        key = self._key(phase, message)
+        if key is None:
+            self.counters["skipped"] += 1
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return json.loads(entry[1])
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+        if self._disk is not None:
+            with self._lock:
+                row = self._disk.execute("SELECT stored_at, value FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._fresh(row[0]):
+                self._remember(key, row[0], row[1])
+                self.counters["disk_hits"] += 1
+                return json.loads(row[1])
+
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, phase: str, message: str, extracted: dict):
+        key = self._key(phase, message)
+        if key is None or not isinstance(extracted, dict):
+            return
+        value = json.dumps(extracted)
+        stored_at = self.clock()
+        self._remember(key, stored_at, value)
+        self.counters["stores"] += 1
+        if self._disk is not None:
+            with self._lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO extraction_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, value, stored_at)
+                )
+                if self.ttl_seconds is not None and self.counters["stores"] % 1000 == 0:
+                    self._disk.execute("DELETE FROM extraction_cache WHERE stored_at < ?", (stored_at - self.ttl_seconds,))
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        if self._disk is not None:
+            with self._lock:
+                self._disk.execute("DELETE FROM extraction_cache WHERE key LIKE ?", (f"{self.namespace}\x1f%",))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hit_rate = (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0
+        return {**self.counters, "entries": len(self._entries), "hit_rate": round(hit_rate, 4)}
+
+
+def cache_from_env(namespace: str) -> ExtractionCache:
+    """Configured by EXTRACTION_CACHE_SIZE (default 10,000), EXTRACTION_CACHE_TTL_SECONDS
+    (default 24 hours) and EXTRACTION_CACHE_PATH (SQLite file for the disk tier, off when unset)."""
+    ttl = os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "86400")
+    return ExtractionCache(
+        namespace,
+        max_entries=int(os.getenv("EXTRACTION_CACHE_SIZE", "10000")),
+        ttl_seconds=float(ttl) if ttl else None,
+        disk_path=os.getenv("EXTRACTION_CACHE_PATH") or None,
+    )
@@ -0,0 +1,252 @@
+"""Offline stand-in for ChatOpenAI, for benchmarks and load tests.
+
+Selected with LLM_PROVIDER=fake (see llm_provider.py) or constructed directly.
+Replies after a simulated latency, either fixed or drawn from a seeded
+LatencyModel. It also simulates provider-side prompt caching: a prompt
+prefix seen before, in cache_block_tokens steps and at least
+cache_min_tokens long, counts as cached. The count is reported the way
+ChatOpenAI reports it, as usage input_token_details["cache_read"].
+prefill_per_1k adds latency for the uncached part. Extraction prompts (the ones asking for JSON) get the scripted
+JSON answer for their phase; everything else gets a short conversational
+reply that mentions a hobby, so suggestion tracking still fires. Calls
+routed by model_routes pass their model name; model_latency scales the
+latency per model, and a response_format schema gets every key it lists,
+null when the script has no value, as strict structured output does.
+Nothing here touches the network.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+REPLY = "That sounds lovely! Have you ever thought about trying pottery? It fits your calm, creative side."
+
+# Scripted extraction answers per phase; fused prompts get the same fields next to "reply"
+EXTRACTIONS = {
+    "interests": {"interests": ["nature", "art"]},
+    "dislikes": {"dislikes": ["loud environments"]},
+    "lifestyle": {"lifestyle": {"energy": "medium", "time": "some", "social": "solo"}},
+    "suggesting": {"intent": "wants_more"},
+}
+
+# How each prompt family names its phase
+PHASE_MARKERS = {
+    "interests": ("Current phase: interests", "Extract interests"),
+    "dislikes": ("Current phase: dislikes", "Extract dislikes"),
+    "lifestyle": ("Current phase: lifestyle", "Extract lifestyle"),
+    "suggesting": ("Current phase: suggesting",),
+}
+
+
+class FakeRateLimitError(Exception):
+    """Shaped like openai.RateLimitError as far as the gateway looks: a 429 status and retry-after headers."""
+    status_code = 429
+
+    def __init__(self, retry_after: float = 0.05):
+        super().__init__("Rate limit reached (fake)")
+        self.headers = {"retry-after-ms": str(int(retry_after * 1000))}
+
+
+class LatencyModel:
+    """Seeded latency sampler, in seconds, built from a spec string.
+
+    "0.2" or "fixed:0.2", "uniform:LOW,HIGH", "normal:MEAN,STD",
+    "lognormal:MEDIAN,SIGMA" (long tail, closest to real API latency) and
+    "exponential:MEAN". Samples never go below zero.
+    """
+
+    def __init__(self, spec: str = "0.2", seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self._rng = random.Random(seed)
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Bad latency spec {spec!r}")
+
+    def sample(self) -> float:
+        p, rng = self.params, self._rng
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+
+def count_tokens(text: str) -> int:
+    # Rough 4-characters-per-token estimate, close enough for relative comparisons
+    return max(1, len(text) // 4)
+
+
+def scripted_reply(prompt: str, extractions: Dict[str, dict] = EXTRACTIONS, reply: str = REPLY) -> str:
+    if "JSON" not in prompt:
+        return reply
+    if '"reply"' in prompt:
+        for phase, extracted in extractions.items():
+            if f"Current conversation phase: {phase}" in prompt:
+                return json.dumps({"reply": reply, **extracted})
+        return json.dumps({"reply": reply})
+    for phase, markers in PHASE_MARKERS.items():
+        if any(marker in prompt for marker in markers):
+            return json.dumps(extractions.get(phase, {}))
+    return "{}"
+
+
+def _conform(value: Any, schema: dict) -> Any:
+    # Every listed key, null where the script had none, as a strict json_schema response would have
+    if isinstance(value, dict) and "properties" in schema:
+        return {key: _conform(value.get(key), sub) for key, sub in schema["properties"].items()}
+    return value
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.2
+    # Optional LatencyModel; when set, every call draws its latency from it instead of `latency`
+    latency_model: Optional[Any] = None
+    extractions: Dict[str, dict] = Field(default_factory=lambda: dict(EXTRACTIONS))
+    # Conversational replies, used in turn
+    replies: List[str] = Field(default_factory=lambda: [REPLY])
+    # Provider-side limits: calls beyond max_concurrent in flight, and a random failure_rate share, get a 429
+    max_concurrent: Optional[int] = None
+    failure_rate: float = 0.0
+    retry_after: float = 0.05
+    # Prompt caching stand-in, with OpenAI's granularity by default
+    cache_block_tokens: int = 128
+    cache_min_tokens: int = 1024
+    cache_max_entries: int = 200_000
+    prefill_per_1k: float = 0.0
+    prefix_cache: Any = Field(default_factory=OrderedDict)
+    # Latency multiplier per model name passed by the call (model_routes), e.g. {"gpt-4o-mini": 0.4}
+    model_latency: Dict[str, float] = Field(default_factory=dict)
+    calls: int = 0
+    calls_by_model: Dict[str, int] = Field(default_factory=dict)
+    rejected: int = 0
+    in_flight: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _delay(self, model: Optional[str] = None) -> float:
+        delay = self.latency_model.sample() if self.latency_model is not None else self.latency
+        return delay * self.model_latency.get(model, 1.0)
+
+    def _check_limits(self):
+        over = self.max_concurrent is not None and self.in_flight >= self.max_concurrent
+        if over or (self.failure_rate and random.random() < self.failure_rate):
+            self.rejected += 1
+            raise FakeRateLimitError(self.retry_after)
+
+    def _cached_prefix(self, messages: List[BaseMessage]) -> int:
+        """Tokens at the start of this prompt already seen in an earlier one, then remember this prompt."""
+        serialized = "".join(f"<{m.type}>{m.content}\n" for m in messages).encode()
+        block = self.cache_block_tokens * 4  # same 4-characters-per-token scale as count_tokens
+        running = hashlib.blake2b(digest_size=16)
+        keys = []
+        for start in range(0, len(serialized) - block + 1, block):
+            running.update(serialized[start:start + block])
+            keys.append(running.digest())
+        hits = 0
+        while hits < len(keys) and keys[hits] in self.prefix_cache:
+            hits += 1
+        for key in keys:
+            self.prefix_cache[key] = None
+            self.prefix_cache.move_to_end(key)
+        while len(self.prefix_cache) > self.cache_max_entries:
+            self.prefix_cache.popitem(last=False)
+        cached = hits * self.cache_block_tokens
+        return cached if cached >= self.cache_min_tokens else 0
+
+    def _prefill_delay(self, result: ChatResult) -> float:
+        usage = result.generations[0].message.usage_metadata
+        uncached = usage["input_tokens"] - usage["input_token_details"]["cache_read"]
+        return self.prefill_per_1k * uncached / 1000
+
+    def _respond(self, messages: List[BaseMessage], model: Optional[str] = None,
+                 response_format: Optional[dict] = None) -> ChatResult:
+        reply = self.replies[self.calls % len(self.replies)]
+        self.calls += 1
+        if model:
+            self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = scripted_reply(prompt, self.extractions, reply)
+        if response_format is not None:
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(_conform(json.loads(content or "{}"), schema))
+        input_tokens = count_tokens(prompt)
+        cached = min(self._cached_prefix(messages), input_tokens)
+        usage = {"input_tokens": input_tokens, "output_tokens": count_tokens(content),
+                 "input_token_details": {"cache_read": cached}}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        self.prompt_tokens += usage["input_tokens"]
+        self.cached_tokens += cached
+        self.completion_tokens += usage["output_tokens"]
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._check_limits()
+        result = self._respond(messages, kwargs.get("model"), kwargs.get("response_format"))
+        self.in_flight += 1
+        try:
+            time.sleep(self._delay(kwargs.get("model")) + self._prefill_delay(result))
+        finally:
+            self.in_flight -= 1
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._check_limits()
+        result = self._respond(messages, kwargs.get("model"), kwargs.get("response_format"))
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self._delay(kwargs.get("model")) + self._prefill_delay(result))
+        finally:
+            self.in_flight -= 1
+        return result
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # Time to first token is a fifth of the latency, the rest is spread over the words
+        self._check_limits()
+        delay = self._delay(kwargs.get("model"))
+        result = self._respond(messages, kwargs.get("model"), kwargs.get("response_format"))
+        message = result.generations[0].message
+        words = message.content.split(" ")
+        self.in_flight += 1
+        try:
+            # Prefill happens before the first token
+            await asyncio.sleep(delay / 5 + self._prefill_delay(result))
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(delay * 4 / 5 / len(words))
+                # Usage rides on the last chunk, as with ChatOpenAI(stream_usage=True)
+                usage = message.usage_metadata if i == len(words) - 1 else None
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word,
+                                                                   usage_metadata=usage))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            self.in_flight -= 1
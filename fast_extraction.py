@@ -0,0 +1,198 @@
+"""Rule-based extraction for the closed-vocabulary phases.
+
+Lifestyle (energy / time / social) and the suggesting-phase intent
+(wants_more / satisfied / asking_question) come from small fixed label sets,
+so keyword patterns handle most replies. FastExtractor scores every label,
+turns the margin between the best and second-best label into a confidence,
+and only returns a result at or above the threshold; anything less certain
+goes to the LLM extraction as before. Results use the same schema as the
+LLM extraction: {"lifestyle": {...}} and {"intent": "..."}.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from hobby_ranking import CATEGORY_LEXICON
+from hobbies import HobbyMatcher, hobby_matcher
+
+# (pattern, weight); a weight of 1.0 settles a label on its own, the category lexicon only adds support
+Rules = List[Tuple[str, float]]
+
+LIFESTYLE_RULES: Dict[str, Dict[str, Rules]] = {
+    "energy": {
+        "high": [(r"\b(?:very |really |pretty |quite )?(?:active|energetic|sporty|athletic)\b", 1.0),
+                 (r"\b(?:lots of|plenty of|high|a lot of|full of) energy\b", 1.0),
+                 (r"\blove (?:to move|moving|being active)\b", 1.0)],
+        "medium": [(r"\b(?:moderate(?:ly)?|medium|average|some|a bit of|decent) (?:energy|active)\b", 1.0),
+                   (r"\b(?:somewhat|fairly|moderately) active\b", 1.0),
+                   (r"\bnot too (?:active|energetic|intense)\b", 1.0)],
+        "low": [(r"\b(?:low|no|little|not much) energy\b", 1.0),
+                (r"\b(?:always |usually |often |quite |very )?(?:tired|exhausted|drained|worn out|lazy)\b", 1.0),
+                (r"\bnot (?:very |that |really )?(?:active|energetic|sporty)\b", 1.0),
+                (r"\b(?:low[- ]key|laid[- ]back|chill|relaxed|calm)\b", 0.6)],
+    },
+    "time": {
+        "lots": [(r"\b(?:lots of|plenty of|a lot of|loads of|tons of) (?:free |spare )?time\b", 1.0),
+                 (r"\b(?:retired|unemployed|on holiday|on vacation)\b", 1.0),
+                 (r"\bwhole weekends?\b", 0.6)],
+        "some": [(r"\b(?:some|a bit of|a little bit of|a few hours of|a couple of hours of) (?:free |spare )?time\b", 1.0),
+                 (r"\b(?:a few|a couple of|couple of) hours\b", 1.0),
+                 (r"\b(?:evenings|weekends|after work|a few times a week)\b", 0.8)],
+        "little": [(r"\b(?:little|hardly any|no|limited|barely any) (?:free |spare )?time\b", 1.0),
+                   (r"\b(?:not|n't have) (?:much|a lot of|enough|any) (?:free |spare )?time\b", 1.0),
+                   (r"\b(?:very |really |super |quite )?busy\b", 1.0),
+                   (r"\b(?:full[- ]time|long hours|two jobs)\b", 0.6)],
+    },
+    "social": {
+        "social": [(r"\b(?:with|around|meet(?:ing)?|love|like) (?:other )?(?:people|friends|others)\b", 1.0),
+                   (r"\b(?:in (?:a )?groups?|with a group|a people person|extrovert(?:ed)?|very social|outgoing)\b", 1.0)],
+        "solo": [(r"\b(?:alone|on my own|by myself|solo|introvert(?:ed)?|solitary|my own company)\b", 1.0),
+                 (r"\bnot (?:very |really |a )?(?:social|a people person|into people)\b", 1.0)],
+        "both": [(r"\b(?:both|either|a mix|mix of|a bit of both|depends)\b", 1.0)],
+    },
+}
+
+INTENT_RULES: Dict[str, Rules] = {
+    "wants_more": [(r"\b(?:another|one more|more (?:ideas|suggestions|options|hobbies)|something else|"
+                    r"something different|anything else|next one|other (?:ideas|options|suggestions))\b", 1.0),
+                   (r"^(?:more|next|again)\b", 1.0),
+                   (r"\b(?:not for me|not really my thing|not interested|don'?t like (?:that|it)|no thanks)\b", 0.8)],
+    "satisfied": [(r"\b(?:thanks|thank you|thx|cheers)\b", 0.8),
+                  (r"\b(?:perfect|sounds (?:good|great|perfect|fun)|love (?:it|that|this)|i'?ll try (?:it|that)|"
+                   r"that'?s (?:great|perfect|it|all)|great idea|awesome|give it a (?:go|try|shot)|bye|goodbye)\b", 1.0)],
+    # "Can you suggest..." and "Do you have any..." open requests for more, not questions
+    "asking_question": [(r"^(?:how|what|where|why|when|which|who|is|are|does|do|can|could|should|would|will)\b"
+                         r"(?! you (?:give|suggest|show|recommend|have (?:any|some|another|other|more)))", 1.0),
+                        (r"\b(?:tell me (?:more )?about|more about|how (?:do|would|can|much)|what (?:do|does|is))\b", 1.0),
+                        (r"\?\s*$", 0.6)],
+}
+
+# Catalogue categories whose CATEGORY_LEXICON words support a lifestyle value
+LEXICON_HINTS = {"social": ("social", "social"), "solo": ("social", "solo"), "active": ("energy", "high")}
+LEXICON_WEIGHT = 0.4
+
+# A negation in the few words before a match makes that match unreliable
+_NEGATION = re.compile(r"\b(?:not|no|never|don'?t|doesn'?t|isn'?t|aren'?t|can'?t|hardly|without)\b|n't\b")
+NEGATION_WINDOW = 20
+
+# Phases with a closed label set; the others always use the LLM
+FAST_PHASES = ("lifestyle", "suggesting")
+
+# Confidence scale for how many lifestyle dimensions were found
+LIFESTYLE_COVERAGE = {1: 0.7, 2: 0.9, 3: 1.0}
+
+
+def _compile(rules: Rules) -> List[Tuple[re.Pattern, float, bool]]:
+    # Rules that spell out the negation themselves ("not much time") are exempt from the negation check
+    return [(re.compile(pattern, re.IGNORECASE), weight, bool(_NEGATION.search(pattern.replace("\\b", ""))))
+            for pattern, weight in rules]
+
+
+def _confidence(scores: Dict[str, float]) -> Tuple[Optional[str], float]:
+    # Strength of the best label, discounted when a competing label scores close to it
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] <= 0:
+        return None, 0.0
+    best, top = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    return best, min(1.0, top) * min(1.0, 0.5 + (top - second) / top)
+
+
+def _score(groups: Dict[str, list], text: str) -> Tuple[Dict[str, float], bool]:
+    """Sum of rule weights per label, and whether an unhandled negation was seen."""
+    found = [(label, weight, match.start(), match.end(), handles_negation)
+             for label, compiled in groups.items() for pattern, weight, handles_negation in compiled
+             for match in pattern.finditer(text)]
+    scores = dict.fromkeys(groups, 0.0)
+    negated = False
+    for label, weight, start, end, handles_negation in found:
+        # A longer match for another label wins: "somewhat active" is medium, "not very active" is low
+        if any(other != label and s <= start and end <= e and e - s > end - start for other, _, s, e, _ in found):
+            continue
+        if not handles_negation and _NEGATION.search(text, max(0, start - NEGATION_WINDOW), start):
+            negated = True
+            continue
+        scores[label] += weight
+    return scores, negated
+
+
+class FastExtractor:
+    """Pattern-based lifestyle and intent extraction with a confidence threshold.
+
+    `extract(phase, message)` returns the extraction dict when confident and
+    None otherwise. Phases outside FAST_PHASES are open-vocabulary and always
+    return None without being counted; other decisions are counted per phase.
+    """
+
+    def __init__(self, threshold: float = 0.8, matcher: Optional[HobbyMatcher] = None):
+        self.threshold = threshold
+        self.matcher = matcher or hobby_matcher
+        self._lifestyle = {dimension: {value: _compile(rules) for value, rules in values.items()}
+                           for dimension, values in LIFESTYLE_RULES.items()}
+        for category, (dimension, value) in LEXICON_HINTS.items():
+            words = "|".join(map(re.escape, CATEGORY_LEXICON.get(category, ())))
+            if words:
+                self._lifestyle[dimension][value] += _compile([(rf"\b(?:{words})\b", LEXICON_WEIGHT)])
+        self._intent = {label: _compile(rules) for label, rules in INTENT_RULES.items()}
+        self.counters = {"fast_path": 0, "llm_path": 0}
+        self.by_phase: Dict[str, Dict[str, int]] = {}
+
+    def classify_lifestyle(self, message: str) -> Tuple[Dict[str, str], float]:
+        text = message.lower()
+        scores, negated = {}, False
+        for dimension, values in self._lifestyle.items():
+            scores[dimension], was_negated = _score(values, text)
+            negated |= was_negated
+        # Hobbies named outright lend their category's support too ("I love yoga" leans active)
+        for _, category in self.matcher.match(text):
+            if category in LEXICON_HINTS:
+                dimension, value = LEXICON_HINTS[category]
+                scores[dimension][value] += LEXICON_WEIGHT
+
+        lifestyle, confidences = {}, []
+        for dimension, values in scores.items():
+            value, confidence = _confidence(values)
+            if value is not None and confidence >= 0.5:
+                lifestyle[dimension] = value
+                confidences.append(confidence)
+        if not lifestyle:
+            return {}, 0.0
+        confidence = min(confidences) * LIFESTYLE_COVERAGE[len(lifestyle)]
+        return lifestyle, confidence * (0.5 if negated else 1.0)
+
+    def classify_intent(self, message: str) -> Tuple[Optional[str], float]:
+        scores, negated = _score(self._intent, message.strip().lower())
+        label, confidence = _confidence(scores)
+        return label, confidence * (0.5 if negated else 1.0)
+
+    def classify(self, phase: str, message: str) -> Tuple[Optional[dict], float]:
+        """Best guess and its confidence, regardless of the threshold."""
+        if phase == "lifestyle":
+            lifestyle, confidence = self.classify_lifestyle(message)
+            return ({"lifestyle": lifestyle} if lifestyle else None), confidence
+        if phase == "suggesting":
+            intent, confidence = self.classify_intent(message)
+            return ({"intent": intent} if intent else None), confidence
+        return None, 0.0
+
+    def extract(self, phase: str, message: str) -> Optional[dict]:
+        if phase not in FAST_PHASES:
+            return None
+        extracted, confidence = self.classify(phase, message)
+        path = "fast_path" if extracted is not None and confidence >= self.threshold else "llm_path"
+        self.counters[path] += 1
+        phase_counters = self.by_phase.setdefault(phase, {"fast_path": 0, "llm_path": 0})
+        phase_counters[path] += 1
+        return extracted if path == "fast_path" else None
+
+    def stats(self) -> Dict[str, object]:
+        decisions = self.counters["fast_path"] + self.counters["llm_path"]
+        fast_rate = self.counters["fast_path"] / decisions if decisions else 0.0
+        return {**self.counters, "fast_path_rate": round(fast_rate, 4), "threshold": self.threshold,
+                "by_phase": self.by_phase}
+
+
+def extractor_from_env() -> FastExtractor:
+    """Threshold from FAST_EXTRACTION_THRESHOLD (default 0.8); an empty value turns the fast path off."""
+    threshold = os.getenv("FAST_EXTRACTION_THRESHOLD", "0.8")
+    return FastExtractor(threshold=float(threshold) if threshold else float("inf"))
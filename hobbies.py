@@ -0,0 +1,160 @@
+"""Hobby knowledge base and the matcher that finds hobbies mentioned in replies.
+
+Shared by app.py and app_LangGraph_workflow.py so both use one catalogue and
+one compiled matcher.
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Define knowledge base
+HOBBY_KNOWLEDGE_BASE = {
+    "music": ["playing an instrument", "singing", "music production", "joining a choir"],
+    "outdoors": ["hiking", "camping", "bird watching", "gardening", "rock climbing"],
+    "creative": ["painting", "writing", "photography", "knitting", "pottery", "drawing"],
+    "social": ["board game nights", "book clubs", "volunteering", "dance classes"],
+    "solo": ["reading", "puzzle solving", "journaling", "meditation", "collecting"],
+    "active": ["yoga", "cycling", "swimming", "martial arts", "running"],
+    "tech": ["coding", "3D printing", "electronics", "video editing"],
+    "crafts": ["woodworking", "jewelry making", "sewing", "origami"]
+}
+
+# Per-hobby attributes on a 0-1 scale, in ATTRIBUTE_NAMES order:
+# energy (physical effort), time (commitment), social (1 = group activity),
+# noise (how loud it is), outdoor (1 = done outside), cost (money to start and keep going)
+ATTRIBUTE_NAMES = ("energy", "time", "social", "noise", "outdoor", "cost")
+HOBBY_ATTRIBUTES = {
+    "playing an instrument": (0.3, 0.8, 0.3, 0.7, 0.0, 0.6),
+    "singing": (0.3, 0.4, 0.4, 0.8, 0.0, 0.1),
+    "music production": (0.1, 0.8, 0.1, 0.6, 0.0, 0.7),
+    "joining a choir": (0.3, 0.5, 0.9, 0.9, 0.0, 0.2),
+    "hiking": (0.8, 0.6, 0.4, 0.1, 1.0, 0.2),
+    "camping": (0.6, 0.8, 0.6, 0.2, 1.0, 0.5),
+    "bird watching": (0.3, 0.4, 0.2, 0.0, 1.0, 0.2),
+    "gardening": (0.5, 0.5, 0.1, 0.1, 0.9, 0.3),
+    "rock climbing": (1.0, 0.6, 0.5, 0.3, 0.7, 0.6),
+    "painting": (0.1, 0.5, 0.1, 0.0, 0.2, 0.3),
+    "writing": (0.0, 0.5, 0.0, 0.0, 0.0, 0.0),
+    "photography": (0.4, 0.4, 0.2, 0.0, 0.7, 0.7),
+    "knitting": (0.0, 0.4, 0.2, 0.0, 0.0, 0.2),
+    "pottery": (0.2, 0.5, 0.3, 0.1, 0.0, 0.5),
+    "drawing": (0.0, 0.3, 0.0, 0.0, 0.1, 0.1),
+    "board game nights": (0.1, 0.3, 1.0, 0.7, 0.0, 0.3),
+    "book clubs": (0.0, 0.3, 0.9, 0.3, 0.0, 0.1),
+    "volunteering": (0.5, 0.5, 0.9, 0.4, 0.4, 0.0),
+    "dance classes": (0.8, 0.4, 0.9, 0.9, 0.0, 0.5),
+    "reading": (0.0, 0.3, 0.0, 0.0, 0.0, 0.1),
+    "puzzle solving": (0.0, 0.3, 0.1, 0.0, 0.0, 0.1),
+    "journaling": (0.0, 0.1, 0.0, 0.0, 0.0, 0.0),
+    "meditation": (0.0, 0.1, 0.1, 0.0, 0.1, 0.0),
+    "collecting": (0.1, 0.3, 0.2, 0.0, 0.0, 0.5),
+    "yoga": (0.5, 0.3, 0.4, 0.0, 0.1, 0.3),
+    "cycling": (0.8, 0.4, 0.3, 0.2, 1.0, 0.6),
+    "swimming": (0.8, 0.3, 0.3, 0.4, 0.3, 0.4),
+    "martial arts": (1.0, 0.6, 0.7, 0.8, 0.0, 0.5),
+    "running": (0.9, 0.3, 0.2, 0.1, 0.9, 0.2),
+    "coding": (0.0, 0.7, 0.1, 0.0, 0.0, 0.2),
+    "3D printing": (0.1, 0.5, 0.1, 0.3, 0.0, 0.8),
+    "electronics": (0.1, 0.6, 0.1, 0.1, 0.0, 0.5),
+    "video editing": (0.0, 0.6, 0.1, 0.2, 0.0, 0.5),
+    "woodworking": (0.5, 0.7, 0.1, 0.8, 0.1, 0.7),
+    "jewelry making": (0.1, 0.4, 0.1, 0.1, 0.0, 0.4),
+    "sewing": (0.1, 0.4, 0.1, 0.2, 0.0, 0.4),
+    "origami": (0.0, 0.2, 0.0, 0.0, 0.0, 0.0)
+}
+
+
+_WORD = re.compile(r"\w+")
+
+
+def _inflections(phrase: str) -> List[str]:
+    # Simple plural handling on the last word: "book club" <-> "book clubs", "dance class" <-> "dance classes"
+    forms = [phrase, phrase + "s", phrase + "es"]
+    if phrase.endswith("es"):
+        forms.append(phrase[:-2])
+    if phrase.endswith("s"):
+        forms.append(phrase[:-1])
+    return forms
+
+
+def _trie_pattern(node: dict) -> str:
+    # Alternation over a character trie, so matching cost depends on the text, not the catalogue size
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        body = f"(?:{body})?"
+    return body
+
+
+class HobbyMatcher:
+    """Finds catalogue hobbies in free text in a single regex pass.
+
+    Matches whole words only ("reading" does not match inside "proofreading")
+    and accepts simple plural forms. Results are (hobby, category) pairs in
+    order of first mention.
+    """
+
+    def __init__(self, knowledge_base: Dict[str, List[str]]):
+        self.forms: Dict[str, Tuple[str, str]] = {}
+        for category, hobbies in knowledge_base.items():
+            for hobby in hobbies:
+                for form in _inflections(hobby.lower()):
+                    self.forms.setdefault(form, (hobby, category))
+
+        trie: dict = {}
+        for form in self.forms:
+            node = trie
+            for char in form:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE)
+
+    def match(self, text: str) -> List[Tuple[str, str]]:
+        found: Dict[str, str] = {}
+        for mention in self.pattern.finditer(text):
+            hobby, category = self.forms[mention.group(0).lower()]
+            found.setdefault(hobby, category)
+        return list(found.items())
+
+
+class PhraseMatcher:
+    """HobbyMatcher's interface for catalogues of tens of thousands of hobbies.
+
+    Compiling HobbyMatcher's single regex takes seconds at that size, so this
+    indexes names by their word sequence instead: building is one dict insert
+    per name form, and matching looks up the word n-grams of the text, longest
+    first. Matching is case-insensitive and whole-word with the same plural
+    forms; names are compared word by word, ignoring punctuation between words.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        self.forms: Dict[str, Tuple[str, str]] = {}
+        self.first_words = set()
+        self.max_words = 1
+        for hobby, category in pairs:
+            for form in _inflections(hobby.lower()):
+                words = _WORD.findall(form)
+                if words:
+                    self.forms.setdefault(" ".join(words), (hobby, category))
+                    self.first_words.add(words[0])
+                    self.max_words = max(self.max_words, len(words))
+
+    def match(self, text: str) -> List[Tuple[str, str]]:
+        found: Dict[str, str] = {}
+        words = _WORD.findall(text.lower())
+        i = 0
+        while i < len(words):
+            step = 1
+            if words[i] in self.first_words:
+                for n in range(min(self.max_words, len(words) - i), 0, -1):
+                    entry = self.forms.get(" ".join(words[i:i + n]))
+                    if entry is not None:
+                        found.setdefault(entry[0], entry[1])
+                        step = n
+                        break
+            i += step
+        return list(found.items())
+
+
+hobby_matcher = HobbyMatcher(HOBBY_KNOWLEDGE_BASE)
@@ -0,0 +1,173 @@
+"""Local hobby ranking used to pre-select suggestion candidates before the LLM.
+
+Every hobby gets a precomputed feature vector: its category index plus the
+ATTRIBUTE_NAMES values from hobbies.HOBBY_ATTRIBUTES. A session profile
+(interests, dislikes, lifestyle) becomes weight vectors once per call, and all
+hobbies are scored together with whole-array NumPy operations. Disliked hobbies and hobbies already
+suggested are filtered out before the top-k pick.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hobbies import ATTRIBUTE_NAMES, HOBBY_ATTRIBUTES, HOBBY_KNOWLEDGE_BASE, HobbyMatcher, hobby_matcher
+
+# Words in free-text interests/dislikes that point at a catalogue category
+CATEGORY_LEXICON = {
+    "music": ("music", "song", "sing", "instrument", "guitar", "piano", "band", "concert", "melody"),
+    "outdoors": ("nature", "outdoor", "outdoors", "outside", "hike", "forest", "mountain", "garden", "plant",
+                 "animal", "bird", "camping", "fresh", "park", "trail"),
+    "creative": ("art", "arts", "creative", "creativity", "draw", "paint", "design", "write", "writing", "photo",
+                 "story", "color", "colour"),
+    "social": ("people", "friend", "social", "community", "group", "team", "party", "meeting", "together"),
+    "solo": ("quiet", "alone", "calm", "relax", "relaxing", "peace", "peaceful", "book", "reading", "solitude",
+             "mindful", "mindfulness", "puzzle"),
+    "active": ("sport", "fitness", "exercise", "gym", "run", "running", "active", "dance", "move", "movement",
+               "workout", "energy"),
+    "tech": ("tech", "technology", "computer", "code", "coding", "programming", "gadget", "game", "gaming",
+             "video", "electronic", "electronics", "robot"),
+    "crafts": ("craft", "crafts", "diy", "build", "building", "making", "hand", "wood", "sew", "knit", "jewelry"),
+}
+
+# Words in dislikes that penalize (and past the cutoff, exclude) high values of an attribute
+ATTRIBUTE_DISLIKES = {
+    "energy": ("exercise", "sweat", "sweating", "sport", "physical", "tiring", "exhausting", "strenuous"),
+    "time": ("commitment", "committing", "time-consuming", "long"),
+    "social": ("people", "crowd", "stranger", "socializing", "socialising", "group", "talking", "small talk"),
+    "noise": ("loud", "noise", "noisy", "crowd", "crowded", "busy", "chaotic"),
+    "outdoor": ("outdoor", "outdoors", "outside", "weather", "bug", "insect", "cold", "heat", "rain"),
+    "cost": ("expensive", "money", "cost", "costly", "pricey", "price", "budget"),
+}
+EXCLUDE_ABOVE = 0.7
+# Score given to filtered hobbies; arithmetic masking is much cheaper than boolean indexing on large arrays
+BLOCKED = np.float32(-1e9)
+
+LIFESTYLE_TARGETS = {
+    "energy": {"high": 1.0, "medium": 0.5, "low": 0.1},
+    "time": {"lots": 0.9, "some": 0.5, "little": 0.1},
+    "social": {"social": 0.9, "both": 0.5, "solo": 0.1},
+}
+
+_WORD = re.compile(r"[a-z][a-z\-]*")
+
+
+def _words(texts: Iterable[str]) -> List[str]:
+    # Lowercased words with a trailing plural "s" also tried bare ("crowds" -> "crowd")
+    words = []
+    for text in texts:
+        for word in _WORD.findall(str(text).lower()):
+            words.append(word)
+            if word.endswith("s") and len(word) > 3:
+                words.append(word[:-1])
+    return words
+
+
+class HobbyRanker:
+    def __init__(self, knowledge_base: Dict[str, List[str]], attributes: Dict[str, Sequence[float]],
+                 matcher: Optional[HobbyMatcher] = None):
+        hobbies: List[str] = []
+        hobby_categories: List[int] = []
+        for index, (category, names) in enumerate(knowledge_base.items()):
+            for hobby in names:
+                hobbies.append(hobby)
+                hobby_categories.append(index)
+        neutral = (0.5,) * len(ATTRIBUTE_NAMES)
+        rows = np.asarray([attributes.get(h, neutral) for h in hobbies], dtype=np.float32).T
+        self._build(list(knowledge_base), hobbies, np.asarray(hobby_categories), rows,
+                    matcher or HobbyMatcher(knowledge_base))
+
+    @classmethod
+    def from_arrays(cls, categories: List[str], hobbies: List[str], category_ids: np.ndarray,
+                    attributes: np.ndarray, matcher) -> "HobbyRanker":
+        """Build from column arrays (see catalogue.Catalogue): attributes is ATTRIBUTE_NAMES x hobbies."""
+        ranker = cls.__new__(cls)
+        ranker._build(categories, hobbies, category_ids, attributes, matcher)
+        return ranker
+
+    def _build(self, categories: List[str], hobbies: List[str], category_ids: np.ndarray, attributes: np.ndarray,
+               matcher):
+        self.categories = categories
+        self.hobbies = hobbies
+        self.category_ids = np.asarray(category_ids, dtype=np.intp)
+        # One contiguous row per attribute (shape: attributes x hobbies) so column reads stay cheap
+        self.attributes = np.ascontiguousarray(attributes, dtype=np.float32)
+        self.index = {hobby: i for i, hobby in enumerate(self.hobbies)}
+        # Used to spot hobbies named outright in interests/dislikes
+        self.matcher = matcher
+
+        self._category_words = {word: self.categories.index(category)
+                                for category, words in CATEGORY_LEXICON.items() if category in self.categories
+                                for word in words}
+        self._attribute_words = {word: ATTRIBUTE_NAMES.index(name)
+                                 for name, words in ATTRIBUTE_DISLIKES.items() for word in words}
+
+    def _category_weights(self, texts: Iterable[str]) -> np.ndarray:
+        weights = np.zeros(len(self.categories), dtype=np.float32)
+        for word in _words(texts):
+            if word in self._category_words:
+                weights[self._category_words[word]] += 1.0
+        return weights
+
+    def _mentioned(self, texts: Iterable[str]) -> List[int]:
+        return [self.index[hobby] for text in texts for hobby, _ in self.matcher.match(str(text))]
+
+    def scores(self, interests: Sequence[str], dislikes: Sequence[str], lifestyle: Dict[str, str],
+               exclude: Iterable[str] = ()) -> np.ndarray:
+        """Score every hobby for a profile; filtered hobbies score BLOCKED or lower."""
+        liked = self._category_weights(interests)
+        if liked.any():
+            liked /= liked.max()
+        disliked = self._category_weights(dislikes)
+
+        # Interests: category affinity, plus a boost for hobbies named outright
+        score = np.take(2.0 * liked - 2.0 * np.minimum(disliked, 1.0), self.category_ids)
+        mentioned = self._mentioned(interests)
+        if mentioned:
+            score[mentioned] += 1.5
+
+        # Lifestyle: distance from the preferred energy / time / social level
+        for name, targets in LIFESTYLE_TARGETS.items():
+            target = targets.get(str(lifestyle.get(name, "")).lower())
+            if target is not None:
+                score -= np.abs(self.attributes[ATTRIBUTE_NAMES.index(name)] - np.float32(target))
+
+        # Dislikes: penalize the disliked attributes and drop hobbies that are high on them
+        blocked = np.take(disliked > 0, self.category_ids)
+        penalized = {self._attribute_words[word] for word in _words(dislikes) if word in self._attribute_words}
+        for attribute in penalized:
+            column = self.attributes[attribute]
+            score -= 2.0 * column
+            blocked |= column >= EXCLUDE_ABOVE
+
+        blocked[self._mentioned(dislikes)] = True
+        blocked[[self.index[h] for h in exclude if h in self.index]] = True
+        score += blocked * BLOCKED
+        return score
+
+    def rank(self, interests: Sequence[str], dislikes: Sequence[str], lifestyle: Dict[str, str],
+             exclude: Iterable[str] = (), k: int = 3) -> List[Tuple[str, str, float]]:
+        """Top-k (hobby, category, score), best first; equal scores are ordered by catalogue position."""
+        score = self.scores(interests, dislikes, lifestyle, exclude)
+        if k > 32:
+            picked = [(int(i), float(score[i])) for i in np.argsort(-score, kind="stable")[:k]]
+        else:
+            # Small k: repeated argmax is O(k*n) and picks the earliest index on ties
+            picked = []
+            for _ in range(min(k, len(score))):
+                best = int(score.argmax())
+                picked.append((best, float(score[best])))
+                score[best] = BLOCKED
+        return [(self.hobbies[i], self.categories[self.category_ids[i]], round(value, 3))
+                for i, value in picked if value > BLOCKED / 2]
+
+    def candidates(self, interests: Sequence[str], dislikes: Sequence[str], lifestyle: Dict[str, str],
+                   exclude: Iterable[str] = (), k: int = 3) -> List[str]:
+        return [hobby for hobby, _, _ in self.rank(interests, dislikes, lifestyle, exclude, k)]
+
+
+hobby_ranker = HobbyRanker(HOBBY_KNOWLEDGE_BASE, HOBBY_ATTRIBUTES, matcher=hobby_matcher)
+
+
+def format_candidates(candidates: Optional[List[str]]) -> str:
+    return ", ".join(candidates) if candidates else "None yet"
@@ -0,0 +1,463 @@
+"""The single path for chain calls in app.py and app_LangGraph_workflow.py.
+
+LLMGateway.ainvoke(chain, inputs) and .astream(chain, inputs) wrap a chain
+call with:
+
+- token buckets for requests and tokens per minute (LLM_RPM, LLM_TPM;
+  0 = unlimited). The token cost is the rendered prompt plus
+  LLM_COMPLETION_TOKENS for the reply.
+- a cap on calls in flight (LLM_MAX_CONCURRENCY), with FIFO waiting.
+- retries on 429s, 5xx and connection errors (LLM_MAX_RETRIES). Waits use
+  exponential backoff with full jitter (LLM_BACKOFF_BASE, LLM_BACKOFF_MAX),
+  or the server's retry-after when it sends one.
+- a circuit breaker. After LLM_BREAKER_THRESHOLD consecutive failures, calls
+  fail fast with LLMUnavailable for LLM_BREAKER_COOLDOWN seconds. Then a
+  single trial call decides whether to close it again.
+
+Errors that retrying cannot fix, such as bad JSON from the model, pass
+straight through. session_lock(user_id) serializes turns for one user while
+different users run in parallel.
+
+Deadlines: gateway.deadline() gives a turn LLM_TURN_DEADLINE seconds
+(default 8; 0 = none), or less if the client asked for less. Every call made
+under `with deadline_scope(deadline):` (extraction, generation, and the
+nodes LangGraph runs inside the turn) shares that budget, queueing and
+retries included. When the budget runs out, the call is cancelled and
+raises DeadlineExceeded. LLM_DEADLINE_RESERVE (default 0.1 s) is kept back
+so the caller can still answer locally. A stream only has to start within
+the budget, because a reply that is already arriving isn't cut off.
+
+Load shedding: once LLM_SHED_QUEUE_DEPTH calls (default 256; 0 = off) are
+waiting for a slot or for rate-limit budget, gateway.deadline() hands out an
+already expired deadline. The turn then makes no LLM calls at all and falls
+back to its local reply.
+"""
+import asyncio
+import os
+import random
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from context_budget import count_tokens
+from metrics import LLM_CIRCUIT_OPEN, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_SECONDS, LLM_RETRIES
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+
+class LLMUnavailable(Exception):
+    """Raised when the circuit is open or retries ran out on a retryable error."""
+
+    reason = "unavailable"
+
+
+class DeadlineExceeded(LLMUnavailable):
+    """Raised when a call doesn't fit in the turn's remaining time; `reason` is "deadline" or "shed"."""
+
+    def __init__(self, reason: str = "deadline"):
+        super().__init__(f"LLM call skipped or cancelled: {reason}")
+        self.reason = reason
+
+
+class Deadline:
+    def __init__(self, seconds: float, reserve: float = 0.0, reason: str = "deadline",
+                 clock: Callable[[], float] = time.monotonic):
+        self.at = clock() + seconds
+        self.reserve = reserve
+        self.reason = reason
+        self.clock = clock
+
+    def remaining(self) -> float:
+        """Seconds left for LLM calls, after the reserve."""
+        return self.at - self.reserve - self.clock()
+
+    async def run(self, awaitable: Awaitable) -> Any:
+        budget = self.remaining()
+        if budget <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(self.reason)
+        timeout = asyncio.timeout(budget)
+        try:
+            async with timeout:
+                return await awaitable
+        except TimeoutError:
+            # A timeout raised by the call itself (not ours) is the call's error
+            if not timeout.expired():
+                raise
+            raise DeadlineExceeded(self.reason) from None
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Apply `deadline` to every gateway call in this context; None clears an outer one (background work)."""
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            pass  # An abandoned stream closed later from another task's context; nothing to restore there
+
+
+async def within_deadline(awaitable: Awaitable) -> Any:
+    """Await `awaitable`, cancelled with DeadlineExceeded if the current deadline runs out first."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return await awaitable
+    return await deadline.run(awaitable)
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    return (status in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_NAMES
+            or isinstance(error, (asyncio.TimeoutError, ConnectionError)))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after (numeric form only)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def prompt_tokens(chain, inputs: dict) -> int:
+    # The prompt is the first step of the chain, possibly under a .with_config() binding
+    runnable = chain
+    while hasattr(runnable, "bound"):
+        runnable = runnable.bound
+    try:
+        return count_tokens(runnable.first.format(**inputs))
+    except Exception:
+        return count_tokens(str(inputs))
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` per minute, holding at most a minute's worth."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def take(self, amount: float) -> float:
+        """Take `amount` if available and return 0, otherwise take nothing and return seconds to wait."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single call larger than the bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if self.clock() - self.opened_at < self.cooldown else "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def abandon_trial(self):
+        """The trial call was cancelled before it told us anything; the next call gets to be the trial."""
+        self.trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self.trial_running = False
+        if self.opened_at is not None:
+            self.opened_at = None
+            LLM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        reopen = self.trial_running
+        self.trial_running = False
+        if reopen or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = self.clock()
+            self.opens += 1
+            LLM_CIRCUIT_OPEN.set(1)
+
+
+class LLMGateway:
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 64, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0, breaker_threshold: int = 5,
+                 breaker_cooldown: float = 30.0, completion_tokens: int = 300, turn_deadline: float = 8.0,
+                 deadline_reserve: float = 0.1, shed_queue_depth: int = 0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.completion_tokens = completion_tokens
+        self.turn_deadline = turn_deadline
+        self.deadline_reserve = deadline_reserve
+        self.shed_queue_depth = shed_queue_depth
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.in_flight = 0
+        self.queued = 0
+        # Futures of calls waiting for a concurrency slot, oldest first
+        self._waiters: deque = deque()
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "queued_calls": 0,
+                         "deadline_exceeded": 0, "shed": 0}
+        self.wait_seconds = 0.0
+
+    # --- admission ---
+
+    async def _wait_for_budget(self, tokens: int):
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            while bucket is not None:
+                delay = bucket.take(amount)
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+
+    async def _acquire_slot(self):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # _release_slot hands its slot straight to the oldest waiter
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def _admit(self, chain, inputs: dict) -> bool:
+        """Wait for budget and a slot; True if this call is the breaker's half-open trial."""
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise LLMUnavailable("LLM circuit breaker is open")
+        tokens = prompt_tokens(chain, inputs) + self.completion_tokens if self.tokens is not None else 0
+        start = time.perf_counter()
+        self.queued += 1
+        LLM_QUEUE_DEPTH.inc()
+        try:
+            await self._wait_for_budget(tokens)
+            await self._acquire_slot()
+        except BaseException:
+            # Cancelled while queued (deadline, disconnect): a trial that never ran mustn't hold the breaker
+            if trial:
+                self.breaker.abandon_trial()
+            raise
+        finally:
+            self.queued -= 1
+            LLM_QUEUE_DEPTH.dec()
+        waited = time.perf_counter() - start
+        self.wait_seconds += waited
+        if waited > 0.001:
+            self.counters["queued_calls"] += 1
+        LLM_QUEUE_SECONDS.observe(waited)
+        LLM_IN_FLIGHT.set(self.in_flight)
+        self.counters["calls"] += 1
+        return trial
+
+    def _release(self):
+        self._release_slot()
+        LLM_IN_FLIGHT.set(self.in_flight)
+
+    async def _failed(self, error: BaseException, attempt: int):
+        """Decide what to do after a failed attempt: return after backing off, or raise."""
+        if not is_retryable(error):
+            # The provider answered; the problem is the answer, so the breaker counts it as healthy
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self.counters["failures"] += 1
+            raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {error}") from error
+        status = getattr(error, "status_code", None)
+        reason = "rate_limit" if status == 429 or type(error).__name__ == "RateLimitError" else "error"
+        self.counters["retries"] += 1
+        LLM_RETRIES.inc(reason=reason)
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        else:
+            # Small jitter so callers told the same retry-after don't all come back at once
+            delay += random.uniform(0, self.backoff_base / 4)
+        await asyncio.sleep(delay)
+
+    # --- deadlines ---
+
+    def deadline(self, requested_ms: Optional[str] = None) -> Optional[Deadline]:
+        """A new turn's deadline: LLM_TURN_DEADLINE, shortened to `requested_ms` (e.g. an X-Deadline-Ms header).
+
+        Returns an expired deadline when shedding load, and None when neither a
+        deadline nor shedding applies.
+        """
+        if self.shed_queue_depth and self.queued >= self.shed_queue_depth:
+            self.counters["shed"] += 1
+            return Deadline(0.0, reason="shed")
+        seconds = self.turn_deadline
+        try:
+            requested = float(requested_ms) / 1000 if requested_ms else 0.0
+        except ValueError:
+            requested = 0.0
+        if requested > 0:
+            seconds = min(seconds, requested) if seconds > 0 else requested
+        return Deadline(seconds, self.deadline_reserve) if seconds > 0 else None
+
+    async def _within_deadline(self, awaitable: Awaitable) -> Any:
+        try:
+            return await within_deadline(awaitable)
+        except DeadlineExceeded as e:
+            if e.reason == "deadline":
+                self.counters["deadline_exceeded"] += 1
+            raise
+
+    # --- calls ---
+
+    async def ainvoke(self, chain, inputs: dict, config: Optional[dict] = None) -> Any:
+        return await self._within_deadline(self._ainvoke(chain, inputs, config))
+
+    async def astream(self, chain, inputs: dict, config: Optional[dict] = None) -> AsyncIterator[Any]:
+        stream = self._astream(chain, inputs, config)
+        try:
+            # The deadline covers the wait for the first chunk only
+            try:
+                first = await self._within_deadline(stream.__anext__())
+            except StopAsyncIteration:
+                return
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _ainvoke(self, chain, inputs: dict, config: Optional[dict] = None) -> Any:
+        attempt = 0
+        while True:
+            trial = await self._admit(chain, inputs)
+            try:
+                result = await chain.ainvoke(inputs, config=config)
+            except Exception as e:
+                error = e
+            except BaseException:
+                # CancelledError skips record_success/record_failure; don't leave the breaker half-open forever
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self._release()
+            await self._failed(error, attempt)
+            attempt += 1
+
+    async def _astream(self, chain, inputs: dict, config: Optional[dict] = None) -> AsyncIterator[Any]:
+        # Retried only until the first chunk is out; after that a failure goes to the caller
+        attempt = 0
+        while True:
+            trial = await self._admit(chain, inputs)
+            started = False
+            try:
+                async for chunk in chain.astream(inputs, config=config):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started:
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    raise
+                error = e
+            except BaseException:
+                # Cancelled, or closed by a consumer that stopped reading
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return
+            finally:
+                self._release()
+            await self._failed(error, attempt)
+            attempt += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {**self.counters, "in_flight": self.in_flight, "queue_depth": self.queued,
+                "avg_wait_ms": round(self.wait_seconds / self.counters["calls"] * 1000, 2) if self.counters["calls"] else 0.0,
+                "circuit": self.breaker.state, "circuit_opens": self.breaker.opens}
+
+
+def gateway_from_env() -> LLMGateway:
+    return LLMGateway(
+        rpm=float(os.getenv("LLM_RPM", "0")),
+        tpm=float(os.getenv("LLM_TPM", "0")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+        backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "20")),
+        breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+        breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        completion_tokens=int(os.getenv("LLM_COMPLETION_TOKENS", "300")),
+        turn_deadline=float(os.getenv("LLM_TURN_DEADLINE", "8")),
+        deadline_reserve=float(os.getenv("LLM_DEADLINE_RESERVE", "0.1")),
+        shed_queue_depth=int(os.getenv("LLM_SHED_QUEUE_DEPTH", "256")),
+    )
+
+
+# One lock per user_id with a turn running or waiting; dropped once nobody holds a reference
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def session_lock(user_id: str) -> asyncio.Lock:
+    """`async with session_lock(user_id):` around a whole turn keeps one user's turns in order."""
+    lock = _session_locks.get(user_id)
+    if lock is None:
+        lock = _session_locks[user_id] = asyncio.Lock()
+    return lock
@@ -0,0 +1,110 @@
+"""Chat model construction shared by app.py and app_LangGraph_workflow.py.
+
+LLM_PROVIDER picks the backend. "openai" (the default) builds ChatOpenAI.
+"fake" builds the offline FakeChatModel from fake_llm.py, for load tests and
+benchmarks with no network access or API quota. The fake reads
+FAKE_LLM_LATENCY (a LatencyModel spec such as "0.2" or "lognormal:0.3,0.5"),
+FAKE_LLM_SEED, and FAKE_LLM_MAX_CONCURRENT / FAKE_LLM_FAILURE_RATE to
+simulate provider 429s. Either way the model reports to metrics through usage_callback().
+Calls routed by model_routes are also counted per route and model, in the
+metrics and in route_usage (served at /api/routes).
+"""
+import os
+import time
+from typing import Dict, Tuple
+
+from metrics import LLM_CALLS, LLM_ROUTE_SECONDS, LLM_ROUTE_TOKENS, LLM_SECONDS, LLM_TOKENS
+from model_routes import ROUTE_KEY
+
+# (route, model) -> calls, errors, seconds and tokens, for /api/routes
+route_usage: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+
+def _route_counters(route: str, model: str) -> Dict[str, float]:
+    counters = route_usage.get((route, model))
+    if counters is None:
+        counters = route_usage[(route, model)] = {"calls": 0, "errors": 0, "seconds": 0.0, "prompt_tokens": 0,
+                                                  "completion_tokens": 0}
+    return counters
+
+
+def route_stats() -> list:
+    return [{"route": route, "model": model, **counters,
+             "avg_ms": round(counters["seconds"] / counters["calls"] * 1000, 1) if counters["calls"] else 0.0}
+            for (route, model), counters in sorted(route_usage.items())]
+
+_usage_callback = None
+
+
+def usage_callback():
+    """Shared callback handler that feeds LLM latency, call and token counts into metrics."""
+    global _usage_callback
+    if _usage_callback is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class UsageMetrics(BaseCallbackHandler):
+            # Called on the event loop thread instead of an executor: the work is a few dict updates
+            run_inline = True
+
+            def __init__(self):
+                self.started = {}
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None,
+                                    **kwargs):
+                params = invocation_params or {}
+                route = (metadata or {}).get(ROUTE_KEY, "unrouted")
+                model = str(params.get("model") or params.get("model_name") or "unknown")
+                self.started[run_id] = (time.perf_counter(), route, model)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                start, route, model = self.started.pop(run_id, (None, "unrouted", "unknown"))
+                counters = _route_counters(route, model)
+                counters["calls"] += 1
+                if start is not None:
+                    elapsed = time.perf_counter() - start
+                    LLM_SECONDS.observe(elapsed)
+                    LLM_ROUTE_SECONDS.observe(elapsed, route=route, model=model)
+                    counters["seconds"] += elapsed
+                LLM_CALLS.inc(outcome="ok")
+                for generations in response.generations:
+                    for generation in generations:
+                        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                        if usage:
+                            LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+                            # Provider-side prompt cache hits, part of the prompt count above
+                            cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+                            LLM_TOKENS.inc(cached or 0, kind="cached_prompt")
+                            LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+                            LLM_ROUTE_TOKENS.inc(usage.get("input_tokens", 0), route=route, model=model, kind="prompt")
+                            LLM_ROUTE_TOKENS.inc(usage.get("output_tokens", 0), route=route, model=model,
+                                                 kind="completion")
+                            counters["prompt_tokens"] += usage.get("input_tokens", 0)
+                            counters["completion_tokens"] += usage.get("output_tokens", 0)
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                _, route, model = self.started.pop(run_id, (None, "unrouted", "unknown"))
+                _route_counters(route, model)["errors"] += 1
+                LLM_CALLS.inc(outcome="error")
+
+        _usage_callback = UsageMetrics()
+    return _usage_callback
+
+
+def create_llm(model: str = "gpt-4o", temperature: float = 0.7):
+    provider = os.getenv("LLM_PROVIDER", "openai")
+    if provider == "fake":
+        from fake_llm import FakeChatModel, LatencyModel
+        latency = LatencyModel(os.getenv("FAKE_LLM_LATENCY", "0.2"), seed=int(os.getenv("FAKE_LLM_SEED", "0")))
+        max_concurrent = os.getenv("FAKE_LLM_MAX_CONCURRENT")
+        return FakeChatModel(latency_model=latency, callbacks=[usage_callback()],
+                             max_concurrent=int(max_concurrent) if max_concurrent else None,
+                             failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")))
+    if provider == "openai":
+        # Imported here so callers that never build a model (or use the fake) skip the cost
+        import openai
+        from langchain_openai import ChatOpenAI
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        # stream_usage so streamed replies report token counts too; retries are left to llm_gateway
+        return ChatOpenAI(model=model, temperature=temperature, stream_usage=True, max_retries=0,
+                          callbacks=[usage_callback()])
+    raise ValueError(f"Unknown LLM_PROVIDER {provider!r}")
@@ -0,0 +1,105 @@
+"""Replies made without the LLM, for turns that can't wait for it.
+
+The apps use these when a turn's deadline runs out, when the gateway sheds
+load, and when the LLM is unavailable (see llm_gateway). The reply matches
+the turn's phase:
+
+- while the profile is incomplete, a templated question about the next
+  missing piece (interests, dislikes, lifestyle)
+- once suggesting, the ranker's best hobby for the profile that hasn't been
+  suggested yet, in a templated sentence
+
+The user's message still updates the profile: local_extraction picks out
+catalogue hobbies and the ranker's lexicon words for interests and dislikes,
+and takes the fast extractor's best guess for lifestyle and intent even
+below its confidence threshold.
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+from hobby_ranking import ATTRIBUTE_DISLIKES, CATEGORY_LEXICON
+
+QUESTIONS = {
+    "greeting": "Hi! I'm HobbyMentor, and I'd love to help you discover some amazing new hobbies. "
+                "What kinds of things do you enjoy doing in your free time?",
+    "interests": "I'd love to hear more about you. What do you enjoy doing in your free time, and what helps you relax?",
+    "dislikes": "{ack}Is there anything you'd rather avoid in a hobby, like noise, crowds, cost or being outdoors?",
+    "lifestyle": "Got it. How much free time do you have in a typical week, and do you prefer doing things "
+                 "on your own or with other people?",
+    "suggesting": "Thanks, that gives me a good picture of you. Ready for a first hobby idea?",
+}
+# Rotated by the number of hobbies suggested so far, so repeated fallbacks don't read the same
+SUGGESTIONS = (
+    "How about {hobby}? It's one of my {category} picks, and it fits what you've told me so far. "
+    "Does that sound like something you'd enjoy?",
+    "Here's another idea: {hobby}, from my {category} picks. I think it suits what you're looking for. What do you think?",
+    "You might like {hobby}. It's among my {category} picks and matches your preferences. "
+    "Want to give it a try, or shall I suggest something else?",
+)
+NO_SUGGESTION = ("I've suggested everything I have that fits you so far. "
+                 "Tell me a bit more about what you enjoy and I'll look again?")
+
+_WORD = re.compile(r"[a-z][a-z\-]*")
+_INTEREST_WORDS = {word for words in CATEGORY_LEXICON.values() for word in words}
+_DISLIKE_WORDS = _INTEREST_WORDS | {word for words in ATTRIBUTE_DISLIKES.values() for word in words}
+
+
+def _keywords(message: str, vocabulary: set) -> List[str]:
+    found = []
+    for word in _WORD.findall(message.lower()):
+        for form in (word, word[:-1] if word.endswith("s") else None):
+            if form in vocabulary:
+                if word not in found:
+                    found.append(word)
+                break
+    return found
+
+
+def local_extraction(phase: str, message: str, catalogue=None, extractor=None) -> dict:
+    """The extraction dict for `phase` from local rules only; empty if nothing was recognised."""
+    if not message.strip():
+        return {}
+    if phase in ("interests", "dislikes"):
+        hobbies = [hobby for hobby, _ in catalogue.matcher.match(message)] if catalogue is not None else []
+        words = _keywords(message, _INTEREST_WORDS if phase == "interests" else _DISLIKE_WORDS)
+        items = hobbies + [word for word in words if not any(word in hobby for hobby in hobbies)]
+        return {phase: items} if items else {}
+    if extractor is not None:
+        guess, _ = extractor.classify(phase, message)
+        return guess or {}
+    return {}
+
+
+def _joined(items: Sequence[str]) -> str:
+    items = list(items)[:3]
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def local_question(topic: str, interests: Sequence[str] = ()) -> str:
+    """Templated question for `topic`: greeting, interests, dislikes, lifestyle or suggesting."""
+    if not interests:
+        return QUESTIONS[topic].format(ack="Thanks! ")
+    joined = _joined(interests)
+    return QUESTIONS[topic].format(ack=f"Thanks! {joined[:1].upper()}{joined[1:]} - that's a great place to start. ")
+
+
+def local_suggestion(catalogue, interests: Sequence[str], dislikes: Sequence[str], lifestyle: Dict[str, str],
+                     suggested: Sequence[str]) -> str:
+    """Suggest the best-ranked hobby for the profile that isn't in `suggested`."""
+    best = catalogue.ranker.rank(interests, dislikes, lifestyle, exclude=suggested, k=1)
+    if not best:
+        return NO_SUGGESTION
+    hobby, category, _ = best[0]
+    return SUGGESTIONS[len(suggested) % len(SUGGESTIONS)].format(hobby=hobby, category=category)
+
+
+def next_topic(phase: str, interests: Sequence[str], dislikes: Sequence[str],
+               lifestyle: Optional[Dict[str, str]]) -> str:
+    """What app.py's reply for this phase should be about: the phase itself until its answer is in, then the next."""
+    if phase == "interests" and interests:
+        return "dislikes"
+    if phase == "dislikes" and dislikes:
+        return "lifestyle"
+    if phase == "lifestyle" and lifestyle:
+        return "suggesting"
+    return phase
@@ -0,0 +1,226 @@
+"""Lightweight request metrics in the Prometheus text format.
+
+Counters and histograms live in plain dicts keyed by label values, so an
+update costs one dict lookup and one bisect. `span(name)` times a block of
+code into the hobbymentor_span_seconds histogram. Inside a request it also
+records the timing for the Server-Timing header. MetricsMiddleware times
+whole requests and adds that header when SERVER_TIMING=1. METRICS_ENABLED=0
+turns all of it into no-ops.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Latency buckets in seconds, from fast local work up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if ENABLED:
+            key = tuple(labels[name] for name in self.labelnames)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in self.values.items()]
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        if ENABLED:
+            self.values[tuple(labels[name] for name in self.labelnames)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if ENABLED:
+            key = tuple(labels[name] for name in self.labelnames)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "hobbymentor_request_seconds", "HTTP request latency by route", ("method", "route", "status")))
+SPAN_SECONDS = registry.register(Histogram(
+    "hobbymentor_span_seconds", "Time spent in each step of a turn", ("span",)))
+LLM_SECONDS = registry.register(Histogram(
+    "hobbymentor_llm_call_seconds", "Latency of individual LLM calls"))
+LLM_CALLS = registry.register(Counter("hobbymentor_llm_calls_total", "LLM calls by outcome", ("outcome",)))
+LLM_TOKENS = registry.register(Counter("hobbymentor_llm_tokens_total", "LLM tokens from provider usage", ("kind",)))
+LLM_ROUTE_SECONDS = registry.register(Histogram(
+    "hobbymentor_llm_route_seconds", "Latency of LLM calls by model route and model", ("route", "model")))
+LLM_ROUTE_TOKENS = registry.register(Counter(
+    "hobbymentor_llm_route_tokens_total", "LLM tokens by model route, model and kind", ("route", "model", "kind")))
+PHASE_TRANSITIONS = registry.register(Counter(
+    "hobbymentor_phase_transitions_total", "Conversation phase changes", ("from_phase", "to_phase")))
+ERRORS = registry.register(Counter("hobbymentor_errors_total", "Handled errors by location", ("where",)))
+LLM_QUEUE_DEPTH = registry.register(Gauge(
+    "hobbymentor_llm_queue_depth", "LLM calls waiting in the gateway for a rate-limit or concurrency slot"))
+LLM_QUEUE_SECONDS = registry.register(Histogram(
+    "hobbymentor_llm_queue_wait_seconds", "Time LLM calls waited in the gateway before being sent"))
+LLM_IN_FLIGHT = registry.register(Gauge("hobbymentor_llm_in_flight", "LLM calls currently being sent"))
+LLM_RETRIES = registry.register(Counter("hobbymentor_llm_retries_total", "LLM call retries by reason", ("reason",)))
+LLM_CIRCUIT_OPEN = registry.register(Gauge(
+    "hobbymentor_llm_circuit_open", "1 while the gateway's circuit breaker is rejecting LLM calls"))
+WS_CONNECTIONS = registry.register(Gauge("hobbymentor_ws_connections", "Open /ws/chat WebSocket connections"))
+SPECULATIONS = registry.register(Counter(
+    "hobbymentor_speculations_total", "Speculative next-suggestion generations by outcome", ("outcome",)))
+SPECULATION_WASTED_TOKENS = registry.register(Counter(
+    "hobbymentor_speculation_wasted_tokens_total", "Estimated tokens spent on discarded speculative generations"))
+DEGRADED_TURNS = registry.register(Counter(
+    "hobbymentor_degraded_turns_total", "Turns answered with a local reply instead of the LLM, by reason", ("reason",)))
+
+# (name, seconds) for the current request, read by MetricsMiddleware for Server-Timing
+_timings: ContextVar[Optional[list]] = ContextVar("server_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_error(where: str):
+    ERRORS.inc(where=where)
+
+
+def record_degraded(reason: str):
+    DEGRADED_TURNS.inc(reason=reason)
+
+
+def record_transition(from_phase: str, to_phase: str):
+    if from_phase != to_phase:
+        PHASE_TRANSITIONS.inc(from_phase=from_phase, to_phase=to_phase)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no response buffering, so SSE streams are unaffected).
+
+    Server-Timing can only carry spans that finished before the response
+    headers went out; for streamed replies that is parsing and session lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if SERVER_TIMING:
+                    total = ("total", time.perf_counter() - start)
+                    header = server_timing(timings + [total]).encode("latin-1")
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            # Route templates ("/api/status/{user_id}") keep the label set bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                    route="unmatched" if route is None else route.path or "/", status=str(status[0]))
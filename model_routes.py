@@ -0,0 +1,116 @@
+"""Which model, temperature, token cap and timeout each chain uses.
+
+Every chain has a route name. app.py uses conversation, fused, summary and
+extraction. app_LangGraph_workflow.py uses greeting, interests, dislikes,
+lifestyle and suggestion for its replies, and extract_interests,
+extract_dislikes and extract_lifestyle for extraction. The routing table is
+JSON, read from the file named by the MODEL_ROUTES environment variable
+(default model_routes.json next to this file):
+
+    {"default": {"model": "gpt-4o", "temperature": 0.7},
+     "extract*": {"model": "gpt-4o-mini", "temperature": 0, "max_tokens": 150,
+                  "timeout": 10, "structured_output": true}}
+
+Keys are route names or fnmatch patterns. A route's settings are "default",
+overlaid with every matching pattern (shorter patterns first), then the exact
+name. Without the file every route gets gpt-4o at 0.7, the old behaviour.
+
+Routes don't create clients. ModelRouter.model() binds the route's settings onto
+the app's one chat model as call arguments (model, temperature, max_tokens,
+timeout), so all routes share its connection pool and callbacks. With
+"structured_output", the call also sends the chain's JSON schema as a strict
+response_format, and the provider returns schema-valid JSON instead of free
+text for JsonOutputParser to dig through. Each model call is tagged with its
+route, and llm_provider's usage callback reports latency and tokens per route
+and model.
+"""
+import fnmatch
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_ROUTE = {"model": "gpt-4o", "temperature": 0.7, "max_tokens": None, "timeout": None,
+                 "structured_output": False}
+ROUTES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_routes.json")
+# Metadata key the usage callback reads the route from
+ROUTE_KEY = "llm_route"
+
+
+def load_routes(path: Optional[str]) -> Dict[str, dict]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        routes = json.load(f)
+    for name, settings in routes.items():
+        unknown = set(settings) - set(DEFAULT_ROUTE)
+        if unknown:
+            raise ValueError(f"Unknown settings {sorted(unknown)} for model route {name!r} in {path}")
+    return routes
+
+
+class ModelRouter:
+    def __init__(self, routes: Optional[Dict[str, dict]] = None):
+        self.routes = routes or {}
+
+    def route(self, name: str) -> dict:
+        settings = dict(DEFAULT_ROUTE)
+        settings.update(self.routes.get("default", {}))
+        patterns = sorted((key for key in self.routes if key not in ("default", name)
+                           and any(c in key for c in "*?[") and fnmatch.fnmatchcase(name, key)), key=len)
+        for key in patterns:
+            settings.update(self.routes[key])
+        settings.update(self.routes.get(name, {}))
+        return settings
+
+    def model(self, name: str, llm, schema: Optional[dict] = None):
+        """`llm` bound to route `name`'s settings; `schema` is sent as the response format if the route asks for it."""
+        settings = self.route(name)
+        kwargs: Dict[str, Any] = {"model": settings["model"], "temperature": settings["temperature"]}
+        if settings["max_tokens"]:
+            kwargs["max_tokens"] = settings["max_tokens"]
+        if settings["timeout"]:
+            kwargs["timeout"] = settings["timeout"]
+        if schema is not None and settings["structured_output"]:
+            kwargs["response_format"] = {"type": "json_schema", "json_schema": {"name": name, "strict": True,
+                                                                                "schema": schema}}
+        return llm.bind(**kwargs).with_config(metadata={ROUTE_KEY: name})
+
+    def table(self, names) -> Dict[str, dict]:
+        return {name: self.route(name) for name in names}
+
+
+def router_from_env() -> ModelRouter:
+    return ModelRouter(load_routes(os.getenv("MODEL_ROUTES", ROUTES_PATH)))
+
+
+def json_schema(properties: Dict[str, dict], always: Iterable[str] = ()) -> dict:
+    """A strict-mode object schema: every property required, each nullable (nothing to report) unless in `always`."""
+    return {"type": "object", "additionalProperties": False, "required": list(properties),
+            "properties": {key: _strict(value, key not in always) for key, value in properties.items()}}
+
+
+def _strict(schema: dict, nullable: bool) -> dict:
+    if schema.get("type") == "object":
+        schema = json_schema(schema["properties"])
+    if nullable:
+        schema = {**schema, "type": [schema["type"], "null"]}
+        if "enum" in schema:
+            schema["enum"] = schema["enum"] + [None]
+    return schema
+
+
+def drop_nulls(value: Any) -> Any:
+    """Structured output has every key, with null for "nothing said"; free-text extraction left those keys out."""
+    if isinstance(value, dict):
+        return {key: drop_nulls(item) for key, item in value.items() if item is not None}
+    return value
+
+
+LIFESTYLE_SCHEMA = {"type": "object", "properties": {
+    "energy": {"type": "string", "enum": ["high", "medium", "low"]},
+    "time": {"type": "string", "enum": ["lots", "some", "little"]},
+    "social": {"type": "string", "enum": ["social", "solo", "both"]},
+}}
+ITEMS_SCHEMA = {"type": "array", "items": {"type": "string"}}
+INTENT_SCHEMA = {"type": "string", "enum": ["wants_more", "satisfied", "asking_question"]}
+STRING_SCHEMA = {"type": "string"}
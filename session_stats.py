@@ -0,0 +1,131 @@
+"""Aggregate stats across sessions, kept up to date as turns happen.
+
+app.py updates a SessionStats on every session creation and removal, phase
+change, new interest or dislike, and new hobby suggestion. Each update is
+O(1). /api/stats reads the counters directly, never scanning sessions, so a
+query costs the same at 1k or 1M sessions.
+
+Free-text interests and dislikes have unbounded vocabularies, so they go
+into a Space-Saving sketch (Metwally et al.). It tracks at most `capacity`
+values, and any value whose true count is above total / capacity is
+guaranteed to be among them. A reported count overestimates the true count
+by at most the reported "error". Suggested hobbies and categories come from
+the hobby catalogue, so plain counters are exact and bounded by its size.
+
+Counts are per process, since the process start. With several workers
+sharing the SQLite session store, each worker reports the sessions it has
+created and updated.
+"""
+import heapq
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+PHASES = ("greeting", "interests", "dislikes", "lifestyle", "suggesting")
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in bounded memory; every update is O(1)."""
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        # value -> [count, error]
+        self.entries: Dict[str, list] = {}
+        # count -> values with that count; with min_count this finds a value to replace in O(1)
+        self.buckets: Dict[int, set] = {}
+        self.min_count = 0
+        self.total = 0
+
+    def _move(self, value: str, old: int, new: int):
+        if old:
+            bucket = self.buckets[old]
+            bucket.discard(value)
+            if not bucket:
+                del self.buckets[old]
+                if self.min_count == old:
+                    self.min_count = new
+        self.buckets.setdefault(new, set()).add(value)
+        if not self.min_count or new < self.min_count:
+            self.min_count = new
+
+    def add(self, value: str):
+        self.total += 1
+        entry = self.entries.get(value)
+        if entry is not None:
+            entry[0] += 1
+            self._move(value, entry[0] - 1, entry[0])
+            return
+        if len(self.entries) < self.capacity:
+            self.entries[value] = [1, 0]
+            self._move(value, 0, 1)
+            return
+        # Replace a value with the minimum count; the newcomer inherits that count as its error
+        floor = self.min_count
+        evicted = self.buckets[floor].pop()
+        if not self.buckets[floor]:
+            del self.buckets[floor]
+            self.min_count = floor + 1
+        del self.entries[evicted]
+        self.entries[value] = [floor + 1, floor]
+        self._move(value, 0, floor + 1)
+
+    def top(self, n: int) -> List[dict]:
+        # O(capacity log n), independent of how many values were added
+        best = heapq.nlargest(n, self.entries.items(), key=lambda item: item[1][0])
+        return [{"value": value, "count": count, "error": error} for value, (count, error) in best]
+
+
+class SessionStats:
+    def __init__(self, capacity: int = 200):
+        self.phases = Counter({phase: 0 for phase in PHASES})
+        self.interests = SpaceSaving(capacity)
+        self.dislikes = SpaceSaving(capacity)
+        self.hobbies: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.counters = {"sessions_created": 0, "sessions_removed": 0, "suggestions": 0}
+
+    def session_created(self, phase: str = "greeting"):
+        self.phases[phase] += 1
+        self.counters["sessions_created"] += 1
+
+    def session_removed(self, phase: Optional[str]):
+        # Sessions from before this process started (SQLite store) were never counted
+        if phase is not None and self.phases[phase] > 0:
+            self.phases[phase] -= 1
+        self.counters["sessions_removed"] += 1
+
+    def phase_changed(self, old: str, new: str):
+        if self.phases[old] > 0:
+            self.phases[old] -= 1
+        self.phases[new] += 1
+
+    def add_interests(self, keys: Iterable[str]):
+        for key in keys:
+            self.interests.add(key)
+
+    def add_dislikes(self, keys: Iterable[str]):
+        for key in keys:
+            self.dislikes.add(key)
+
+    def suggested(self, hobby: str, category: str):
+        self.hobbies[hobby] += 1
+        self.categories[category] += 1
+        self.counters["suggestions"] += 1
+
+    def snapshot(self, n: int = 10) -> dict:
+        return {
+            "sessions_by_phase": dict(self.phases),
+            "sessions": sum(self.phases.values()),
+            **self.counters,
+            "top_interests": self.interests.top(n),
+            "top_dislikes": self.dislikes.top(n),
+            "top_hobbies": [{"value": h, "count": c} for h, c in self.hobbies.most_common(n)],
+            "top_categories": [{"value": c, "count": k} for c, k in self.categories.most_common(n)],
+            "sketch": {"capacity": self.interests.capacity, "interests_seen": self.interests.total,
+                       "dislikes_seen": self.dislikes.total},
+        }
+
+
+def stats_from_env() -> SessionStats:
+    """SESSION_STATS_CAPACITY (default 200) values tracked per free-text sketch."""
+    return SessionStats(int(os.getenv("SESSION_STATS_CAPACITY", "200")))
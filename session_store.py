@@ -0,0 +1,310 @@
+"""Session storage shared by app.py and app_LangGraph_workflow.py.
+
+Both stores evict idle sessions instead of keeping them forever. The in-memory
+store also caps the session count and an approximate memory budget. The SQLite
+store lets several uvicorn workers, or Mangum cold starts, share sessions
+through one database file.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class SessionStore:
+    """Interface for session backends.
+
+    `get` and `get_or_create` count as a use of the session; `peek` is a
+    read-only lookup that never creates a session and never refreshes its TTL.
+    """
+
+    def __init__(self, on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.on_evict = on_evict
+        self.counters = {"hits": 0, "misses": 0, "created": 0, "expired": 0, "evicted_capacity": 0, "evicted_memory": 0}
+
+    def get(self, user_id: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def peek(self, user_id: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def version(self, user_id: str) -> Optional[Any]:
+        """Cheap token for the stored copy, None when there is none; it changes when the copy is replaced or removed."""
+        raise NotImplementedError
+
+    def put(self, user_id: str, session: Any):
+        raise NotImplementedError
+
+    def delete(self, user_id: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def get_or_create(self, user_id: str, factory: Callable[[str], Any]) -> Any:
+        session = self.get(user_id)
+        if session is None:
+            session = factory(user_id)
+            self.counters["created"] += 1
+            self.put(user_id, session)
+        return session
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "sessions": len(self)}
+
+    def _evicted(self, user_id: str, session: Any, reason: str):
+        self.counters[reason] += 1
+        if self.on_evict:
+            self.on_evict(user_id, session)
+
+
+def approximate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Rough deep size in bytes of a session made of dicts, lists, sets, strings and slotted objects."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approximate_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(approximate_size(getattr(obj, slot), seen) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+class InMemorySessionStore(SessionStore):
+    """LRU-ordered dict with idle TTL, a session-count cap and an approximate byte budget."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_sessions: Optional[int] = None,
+                 max_bytes: Optional[int] = None, size_of: Callable[[Any], int] = approximate_size,
+                 on_evict: Optional[Callable[[str, Any], None]] = None, clock: Callable[[], float] = time.monotonic):
+        super().__init__(on_evict)
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.clock = clock
+        self.total_bytes = 0
+        # user_id -> [session, last_access, size]; least recently used first
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - last_access > self.ttl_seconds
+
+    def _remove(self, user_id: str, reason: Optional[str] = None):
+        session, _, size = self._entries.pop(user_id)
+        self.total_bytes -= size
+        if reason:
+            self._evicted(user_id, session, reason)
+
+    def get(self, user_id: str) -> Optional[Any]:
+        entry = self._entries.get(user_id)
+        now = self.clock()
+        if entry is not None and self._expired(entry[1], now):
+            self._remove(user_id, "expired")
+            entry = None
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        entry[1] = now
+        self._entries.move_to_end(user_id)
+        return entry[0]
+
+    def peek(self, user_id: str) -> Optional[Any]:
+        entry = self._entries.get(user_id)
+        if entry is None or self._expired(entry[1], self.clock()):
+            return None
+        return entry[0]
+
+    def version(self, user_id: str) -> Optional[Any]:
+        # Writes put back the same object, so only a reset or an eviction changes it
+        session = self.peek(user_id)
+        return None if session is None else id(session)
+
+    def put(self, user_id: str, session: Any):
+        size = self.size_of(session) if self.max_bytes is not None else 0
+        if user_id in self._entries:
+            self.total_bytes -= self._entries[user_id][2]
+        self._entries[user_id] = [session, self.clock(), size]
+        self._entries.move_to_end(user_id)
+        self.total_bytes += size
+        self._enforce_limits(keep=user_id)
+
+    def delete(self, user_id: str) -> bool:
+        if user_id not in self._entries:
+            return False
+        self._remove(user_id)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _enforce_limits(self, keep: str):
+        # Idle TTL means the least recently used entries are also the first to expire
+        now = self.clock()
+        while self._entries:
+            user_id, (_, last_access, _) = next(iter(self._entries.items()))
+            if user_id == keep or not self._expired(last_access, now):
+                break
+            self._remove(user_id, "expired")
+
+        while self.max_sessions is not None and len(self._entries) > self.max_sessions:
+            self._remove(next(iter(self._entries)), "evicted_capacity")
+
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest, "evicted_memory")
+
+    def stats(self) -> Dict[str, int]:
+        return {**super().stats(), "bytes": self.total_bytes}
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions serialized into a SQLite table so several processes can share them.
+
+    `dumps`/`loads` convert a session to and from a JSON string. Counters are per
+    process. Reads skip expired rows straight away; the sweep that deletes
+    expired rows and trims the table to the session cap runs every
+    `enforce_every` writes, so the table can exceed the cap by that many rows.
+
+    Calls are synchronous and run on the event loop, so a write waiting on
+    another process's write lock gives up after `busy_timeout` seconds
+    (sqlite3.OperationalError) instead of stalling every request for 30.
+    """
+
+    def __init__(self, path: str, dumps: Callable[[Any], str], loads: Callable[[str], Any], table: str = "sessions",
+                 ttl_seconds: Optional[float] = None, max_sessions: Optional[int] = None,
+                 on_evict: Optional[Callable[[str, Any], None]] = None, clock: Callable[[], float] = time.time,
+                 busy_timeout: float = 1.0, enforce_every: int = 64):
+        super().__init__(on_evict)
+        self.dumps = dumps
+        self.loads = loads
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.table = table
+        self.enforce_every = max(1, enforce_every)
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - last_access > self.ttl_seconds
+
+    def _load(self, user_id: str):
+        with self._lock:
+            row = self._conn.execute(f"SELECT data, last_access FROM {self.table} WHERE user_id = ?", (user_id,)).fetchone()
+        return row
+
+    def get(self, user_id: str) -> Optional[Any]:
+        row = self._load(user_id)
+        now = self.clock()
+        if row is not None and self._expired(row[1], now):
+            self._evict_rows([(user_id, row[0])], "expired")
+            row = None
+        if row is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        with self._lock:
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE user_id = ?", (now, user_id))
+        return self.loads(row[0])
+
+    def peek(self, user_id: str) -> Optional[Any]:
+        row = self._load(user_id)
+        if row is None or self._expired(row[1], self.clock()):
+            return None
+        return self.loads(row[0])
+
+    def version(self, user_id: str) -> Optional[Any]:
+        # Every write and every get moves last_access, so this also changes after this process's own put
+        with self._lock:
+            row = self._conn.execute(f"SELECT last_access FROM {self.table} WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None or self._expired(row[0], self.clock()):
+            return None
+        return row[0]
+
+    def put(self, user_id: str, session: Any):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (user_id, data, last_access) VALUES (?, ?, ?)",
+                (user_id, self.dumps(session), self.clock())
+            )
+        self._puts += 1
+        if self._puts % self.enforce_every == 0:
+            self._enforce_limits()
+
+    def delete(self, user_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(f"DELETE FROM {self.table} WHERE user_id = ?", (user_id,)).rowcount > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict_rows(self, rows, reason: str):
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE user_id = ?", [(user_id,) for user_id, _ in rows])
+        for user_id, data in rows:
+            self._evicted(user_id, self.loads(data) if self.on_evict else None, reason)
+
+    def _enforce_limits(self):
+        if self.ttl_seconds is not None:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT user_id, data FROM {self.table} WHERE last_access < ?", (self.clock() - self.ttl_seconds,)
+                ).fetchall()
+            if rows:
+                self._evict_rows(rows, "expired")
+        if self.max_sessions is not None:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT user_id, data FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_sessions,)
+                ).fetchall()
+            if rows:
+                self._evict_rows(rows, "evicted_capacity")
+
+
+def _env_number(name: str, cast: Callable[[str], Any], default: Optional[Any]) -> Optional[Any]:
+    # An empty value switches the limit off
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return cast(value) if value else None
+
+
+def store_from_env(dumps: Callable[[Any], str], loads: Callable[[str], Any],
+                   size_of: Callable[[Any], int] = approximate_size,
+                   on_evict: Optional[Callable[[str, Any], None]] = None, table: str = "sessions") -> SessionStore:
+    """Build the store selected by SESSION_BACKEND ("memory" or "sqlite").
+
+    Limits come from SESSION_TTL_SECONDS (default 1 hour), SESSION_MAX_COUNT
+    (default 10,000) and SESSION_MAX_BYTES (default 256 MiB, in-memory store
+    only); the SQLite file is SESSION_DB_PATH, its lock wait SESSION_DB_TIMEOUT
+    (default 1 second) and its limits are swept every SESSION_SWEEP_EVERY
+    writes (default 64).
+    """
+    ttl_seconds = _env_number("SESSION_TTL_SECONDS", float, 3600.0)
+    max_sessions = _env_number("SESSION_MAX_COUNT", int, 10_000)
+    if os.getenv("SESSION_BACKEND", "memory") == "sqlite":
+        return SqliteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"), dumps, loads, table=table,
+                                  ttl_seconds=ttl_seconds, max_sessions=max_sessions, on_evict=on_evict,
+                                  busy_timeout=float(os.getenv("SESSION_DB_TIMEOUT", "1")),
+                                  enforce_every=int(os.getenv("SESSION_SWEEP_EVERY", "64")))
+    return InMemorySessionStore(ttl_seconds=ttl_seconds, max_sessions=max_sessions,
+                                max_bytes=_env_number("SESSION_MAX_BYTES", int, 256 * 1024 * 1024), size_of=size_of, on_evict=on_evict)
@@ -0,0 +1,126 @@
+"""Speculative pre-generation of the next reply.
+
+After a suggestion goes out, the most likely next message is "another
+one". Speculator runs that next call in the background. If the real next
+message turns out to want more, the reply is already there (or on its way).
+Any other message discards it, cancelling the call if it is still running.
+
+Speculation is extra LLM spend, so it is budgeted per process. There is a cap
+on speculative calls in flight and a tokens-per-minute bucket; when either is
+exhausted, speculation is skipped rather than queued. Hits, misses, skips and
+the tokens spent on discarded speculations are counted, both in stats() and
+in the Prometheus metrics.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from context_budget import count_tokens
+from llm_gateway import TokenBucket
+from metrics import SPECULATION_WASTED_TOKENS, SPECULATIONS
+
+
+class Speculation:
+    __slots__ = ("task", "version", "prompt_tokens")
+
+    def __init__(self, task: asyncio.Task, version: int, prompt_tokens: int):
+        self.task = task
+        self.version = version
+        self.prompt_tokens = prompt_tokens
+
+
+class Speculator:
+    def __init__(self, max_in_flight: int = 8, tokens_per_minute: float = 20_000, max_pending: int = 1000):
+        self.max_in_flight = max_in_flight
+        self.budget = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_pending = max_pending
+        # key -> Speculation, oldest first; at most one per key
+        self.pending: "OrderedDict[str, Speculation]" = OrderedDict()
+        self.counters = {"started": 0, "hits": 0, "misses": 0, "skipped_budget": 0, "failed": 0, "wasted_tokens": 0}
+
+    def _count(self, outcome: str):
+        self.counters[outcome] += 1
+        SPECULATIONS.inc(outcome=outcome)
+
+    def in_flight(self) -> int:
+        return sum(not s.task.done() for s in self.pending.values())
+
+    def start(self, key: str, version: int, call: Callable[[], Awaitable[str]], prompt_tokens: int,
+              completion_tokens: int = 150) -> bool:
+        """Run `call()` in the background for `key` at state `version`, if the budget allows."""
+        current = self.pending.get(key)
+        if current is not None and current.version == version:
+            return True
+        self.discard(key)
+        if self.in_flight() >= self.max_in_flight or (
+                self.budget is not None and self.budget.take(prompt_tokens + completion_tokens) > 0):
+            self._count("skipped_budget")
+            return False
+        task = asyncio.get_running_loop().create_task(call())
+        self.pending[key] = Speculation(task, version, prompt_tokens)
+        self._count("started")
+        while len(self.pending) > self.max_pending:
+            _, oldest = self.pending.popitem(last=False)
+            self._waste(oldest)
+        return True
+
+    def _waste(self, speculation: Speculation):
+        wasted = speculation.prompt_tokens
+        task = speculation.task
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None:
+            wasted += count_tokens(task.result())
+        self._count("misses")
+        self.counters["wasted_tokens"] += wasted
+        SPECULATION_WASTED_TOKENS.inc(wasted)
+
+    def discard(self, key: str):
+        speculation = self.pending.pop(key, None)
+        if speculation is not None:
+            self._waste(speculation)
+
+    def has(self, key: str) -> bool:
+        return key in self.pending
+
+    async def take(self, key: str, version: int, wanted: bool) -> Optional[str]:
+        """The speculative reply for `key` if it is `wanted` and still matches `version`; otherwise discard it."""
+        speculation = self.pending.pop(key, None)
+        if speculation is None:
+            return None
+        if not wanted or speculation.version != version:
+            self._waste(speculation)
+            return None
+        try:
+            # Shielded, so cancelling the caller doesn't look like the speculation being cancelled
+            result = await asyncio.shield(speculation.task)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The turn itself was cancelled (deadline, disconnect): nobody will use the reply
+                self._waste(speculation)
+                raise
+            self._count("failed")
+            return None
+        except Exception as e:
+            print(f"Speculative generation failed: {e}")
+            self._count("failed")
+            return None
+        self._count("hits")
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        decided = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "pending": len(self.pending), "in_flight": self.in_flight(),
+                "hit_rate": round(self.counters["hits"] / decided, 4) if decided else 0.0}
+
+
+def speculator_from_env() -> Optional[Speculator]:
+    """None unless SPECULATIVE_SUGGESTIONS=1; budget from SPECULATION_MAX_IN_FLIGHT (default 8)
+    and SPECULATION_TPM (default 20,000 tokens per minute, 0 = unlimited)."""
+    if os.getenv("SPECULATIVE_SUGGESTIONS", "0") != "1":
+        return None
+    return Speculator(
+        max_in_flight=int(os.getenv("SPECULATION_MAX_IN_FLIGHT", "8")),
+        tokens_per_minute=float(os.getenv("SPECULATION_TPM", "20000")),
+    )
@@ -0,0 +1,204 @@
+"""Static frontend serving with precompressed variants, strong ETags and API compression.
+
+Build step: `python static_assets.py [directory]` writes `<file>.gz` and, if
+the optional `brotli` package is installed, `<file>.br` next to each
+compressible file, plus a manifest (.precompressed.json) of the content hash
+each variant was built from. Run it after editing static/ and commit the
+output: the deploy (vercel.json) has no build step, and the apps don't
+compress anything at startup.
+
+PrecompressedStaticFiles is a drop-in StaticFiles that:
+- picks the .br or .gz variant the client accepts (Accept-Encoding),
+  falling back to the plain file when none is present or the manifest says
+  it was built from other content. Hashes, not mtimes, because a git
+  checkout gives every file a fresh mtime
+- sends a strong ETag, a content hash per encoding, so If-None-Match gives
+  a 304 when the content is unchanged
+- sends Cache-Control. HTML gets "no-cache", so the browser revalidates each
+  load and gets a bodiless 304. Other assets are cached for STATIC_MAX_AGE
+  seconds (default 3600).
+
+ApiCompressionMiddleware gzips /api/ and /metrics responses of at least
+API_COMPRESSION_MIN_BYTES (default 1024). It leaves static files alone,
+since they are precompressed, as well as SSE and NDJSON streams, which must
+reach the client chunk by chunk.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+API_COMPRESSION_MIN_BYTES = int(os.getenv("API_COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSIBLE = (".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map")
+# Below this a compressed variant saves less than its headers cost
+MIN_PRECOMPRESS_BYTES = 256
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Variant path (relative to the static directory) -> content hash of the file it was built from
+MANIFEST = ".precompressed.json"
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def _relative(path: str, directory: str) -> str:
+    return os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def read_manifest(directory: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory: str) -> int:
+    """Write missing or stale .gz/.br variants under `directory`; returns how many were written."""
+    manifest = read_manifest(directory)
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(COMPRESSIBLE) or os.path.getsize(path) < MIN_PRECOMPRESS_BYTES:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = content_digest(data)
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                variant = path + suffix
+                key = _relative(variant, directory)
+                if os.path.exists(variant) and manifest.get(key) == digest:
+                    continue
+                with open(variant, "wb") as f:
+                    f.write(_compress(data, encoding))
+                manifest[key] = digest
+                written += 1
+    if written:
+        with open(os.path.join(directory, MANIFEST), "w") as f:
+            json.dump(dict(sorted(manifest.items())), f, indent=1)
+            f.write("\n")
+    return written
+
+
+def accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *args, max_age: int = STATIC_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+        # full path -> ((mtime_ns, size), digest); files only change on deploy, so this stays small
+        self._digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._manifest: Tuple[Optional[Tuple[int, int]], Dict[str, str]] = (None, {})
+
+    def _digest(self, full_path: str, stat_result: os.stat_result) -> str:
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._digests.get(full_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(full_path, "rb") as f:
+            digest = content_digest(f.read())
+        self._digests[full_path] = (key, digest)
+        return digest
+
+    def _built_from(self) -> Dict[str, str]:
+        """The manifest, re-read only when the file changes."""
+        directory = os.path.realpath(str(self.directory))
+        try:
+            stat_result = os.stat(os.path.join(directory, MANIFEST))
+            key = (stat_result.st_mtime_ns, stat_result.st_size)
+        except OSError:
+            key = None
+        if key != self._manifest[0]:
+            self._manifest = (key, read_manifest(directory) if key else {})
+        return self._manifest[1]
+
+    def _variant(self, full_path: str, digest: str, scope: Scope) -> Optional[Tuple[str, str, os.stat_result]]:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        directory = os.path.realpath(str(self.directory))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            # A variant built from other content is from a previous version of the file
+            if self._built_from().get(_relative(full_path + suffix, directory)) != digest:
+                continue
+            try:
+                return encoding, full_path + suffix, os.stat(full_path + suffix)
+            except OSError:
+                continue
+        return None
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = str(full_path)
+        digest = self._digest(full_path, stat_result)
+        cache_control = "no-cache" if full_path.endswith(".html") else f"public, max-age={self.max_age}"
+        headers = {"cache-control": cache_control, "vary": "Accept-Encoding", "etag": f'"{digest}"'}
+        variant = self._variant(full_path, digest, scope)
+        if variant is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        else:
+            encoding, path, variant_stat = variant
+            headers.update({"content-encoding": encoding, "etag": f'"{digest}-{encoding}"'})
+            # media_type from the original name, not the .gz/.br one
+            response = FileResponse(path, status_code=status_code, stat_result=variant_stat, headers=headers,
+                                    media_type=mimetypes.guess_type(full_path)[0] or "text/plain")
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class ApiCompressionMiddleware:
+    """GZipMiddleware for the API routes only."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = API_COMPRESSION_MIN_BYTES,
+                 prefixes: Tuple[str, ...] = ("/api/", "/metrics")):
+        self.app = app
+        self.prefixes = prefixes
+        # Level 6: most of level 9's saving for JSON at a fraction of the CPU
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=6,
+                                   exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/x-ndjson",))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefixes):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "static"
+    count = precompress(directory)
+    print(f"Wrote {count} precompressed variant(s) in {directory}" + ("" if brotli else " (brotli not installed: gzip only)"))
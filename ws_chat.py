@@ -0,0 +1,116 @@
+"""WebSocket chat connections for /ws/chat/{user_id} in both apps.
+
+One connection carries many turns. The client sends JSON text frames:
+
+    {"message": "I love hiking", "id": 1}   a user turn; "id" is optional and echoed on its events
+    {"type": "ping"}                          answered with {"type": "pong"}
+    {"type": "pong"}                          reply to a server ping
+
+The server sends {"type": "ready", ...} once on connect. Each turn then gets
+"token" events, ending with "done" (with phase and suggested_hobbies) or
+"error". Turns may be pipelined: they queue and run one after another, in
+order.
+
+Limits:
+- backpressure: at most WS_MAX_PENDING_TURNS turns wait (default 8). While
+  the queue is full the connection stops reading, so a fast sender is slowed
+  down by TCP flow control instead of growing server memory. A send that
+  doesn't complete within WS_SEND_TIMEOUT seconds (default 10) means the
+  client stopped reading, and the connection is closed.
+- heartbeat: a {"type": "ping"} goes out every WS_HEARTBEAT seconds (default
+  20). A connection with no client frame for WS_IDLE_TIMEOUT seconds
+  (default 300) is closed.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from metrics import WS_CONNECTIONS, record_error
+
+WS_MAX_PENDING_TURNS = int(os.getenv("WS_MAX_PENDING_TURNS", "8"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+WS_HEARTBEAT = float(os.getenv("WS_HEARTBEAT", "20"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "300"))
+
+# Close codes: 1001 going away (idle), 1008 policy violation (client not reading)
+CLOSE_IDLE = 1001
+CLOSE_SLOW_CONSUMER = 1008
+
+
+class ChatConnection:
+    def __init__(self, websocket: WebSocket, turn: Callable[[str], AsyncIterator[dict]]):
+        self.websocket = websocket
+        self.turn = turn
+        self.turns: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING_TURNS)
+        self.last_seen = time.monotonic()
+        # Turn events and heartbeats come from different tasks; one frame at a time
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, event: dict):
+        async with self.send_lock:
+            await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), WS_SEND_TIMEOUT)
+
+    async def read(self):
+        while True:
+            try:
+                frame = json.loads(await self.websocket.receive_text())
+            except (ValueError, KeyError):
+                await self.send({"type": "error", "text": "Expected a JSON text frame"})
+                continue
+            self.last_seen = time.monotonic()
+            kind = frame.get("type", "message") if isinstance(frame, dict) else None
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "message":
+                # Blocks while the queue is full, which stops reading from the socket
+                await self.turns.put((frame.get("message", ""), frame.get("id")))
+            elif kind != "pong":
+                await self.send({"type": "error", "text": f"Unknown frame type: {kind}"})
+
+    async def run_turns(self):
+        while True:
+            message, turn_id = await self.turns.get()
+            async for event in self.turn(message):
+                if turn_id is not None:
+                    event = {**event, "id": turn_id}
+                await self.send(event)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT)
+            if time.monotonic() - self.last_seen > WS_IDLE_TIMEOUT:
+                await self.websocket.close(CLOSE_IDLE)
+                return
+            await self.send({"type": "ping"})
+
+
+async def serve_chat(websocket: WebSocket, turn: Callable[[str], AsyncIterator[dict]], ready: Optional[dict] = None):
+    """Accept `websocket` and run its turns through `turn(message)` until either side closes."""
+    await websocket.accept()
+    WS_CONNECTIONS.inc()
+    connection = ChatConnection(websocket, turn)
+    tasks = [asyncio.create_task(coro) for coro in (connection.read(), connection.run_turns(), connection.heartbeat())]
+    try:
+        await connection.send({"type": "ready", **(ready or {})})
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                print("Closing WebSocket: client is not reading")
+                record_error("ws_slow_consumer")
+                await websocket.close(CLOSE_SLOW_CONSUMER)
+            elif error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"Error in WebSocket chat: {error}")
+                record_error("ws_chat")
+                await websocket.close(1011)
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # Already closed
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        WS_CONNECTIONS.dec()